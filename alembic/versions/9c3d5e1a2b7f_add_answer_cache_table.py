@@ -0,0 +1,46 @@
+"""add answer cache table
+
+Revision ID: 9c3d5e1a2b7f
+Revises: 4f7f65b90b2f
+Create Date: 2025-10-06 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9c3d5e1a2b7f"
+down_revision: Union[str, Sequence[str], None] = "4f7f65b90b2f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    prompt_status = postgresql.ENUM("SUCCESS", "FAILED", "OUT_OF_CONTEXT", name="prompt_status", create_type=False)
+    op.create_table(
+        "answer_cache",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("query_hash", sa.String(length=64), nullable=False),
+        sa.Column("language", sa.String(length=8), nullable=False),
+        sa.Column("index_version", sa.Text(), nullable=False),
+        sa.Column("query", sa.Text(), nullable=False),
+        sa.Column("answer", sa.Text(), nullable=False),
+        sa.Column("sources", sa.JSON(), nullable=False),
+        sa.Column("status", prompt_status, nullable=False),
+        sa.Column("embedding", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("query_hash", "language", "index_version", name="uq_answer_cache_key"),
+    )
+    op.create_index(op.f("ix_answer_cache_id"), "answer_cache", ["id"], unique=False)
+    op.create_index(op.f("ix_answer_cache_query_hash"), "answer_cache", ["query_hash"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_answer_cache_query_hash"), table_name="answer_cache")
+    op.drop_index(op.f("ix_answer_cache_id"), table_name="answer_cache")
+    op.drop_table("answer_cache")
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+import httpx
+from sqlalchemy.orm import Session
+
+from lunbi.config import (
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_TIMEOUT_SECONDS,
+    INDEX_RELOAD_INTERVAL_SECONDS,
+    MODEL,
+    MODEL_TEMPERATURE,
+)
+from lunbi.repositories.prompt_repository import PromptRepository
+from lunbi.services.answer_cache import get_answer_cache
+from lunbi.services.article_metadata_service import ArticleMetadataService
+from lunbi.services.assistant_service import AssistantService
+from lunbi.services.embedding_cache import CachedEmbeddings, build_query_embeddings
+from lunbi.services.embeddings import current_embedding_spec
+from lunbi.services.prompt_service import PromptService
+from lunbi.services.prompt_writer import get_prompt_writer
+from lunbi.services.translation_service import TranslationService
+from lunbi.services.vector_store import IndexWatcher, VectorStoreHandle
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger("lunbi.container")
+
+
+def build_http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+class ServiceContainer:
+    """Long-lived services shared by every request of one API worker.
+
+    Created in the app lifespan and stored on ``app.state.services``. The OpenAI chat and
+    embedding clients all draw from one sync and one async keep-alive connection pool;
+    only the database session (and the `PromptService` wrapping it) is per request.
+    The vector store and models can be replaced, e.g. by fakes in benchmarks. A watcher
+    thread hot-reloads the vector store when a new index version is made current.
+    """
+
+    def __init__(
+        self,
+        http_client: httpx.Client,
+        http_async_client: httpx.AsyncClient,
+        vector_store: VectorStoreHandle | None = None,
+        chat_model: BaseChatModel | None = None,
+        translation_model: BaseChatModel | None = None,
+    ) -> None:
+        self.http_client = http_client
+        self.http_async_client = http_async_client
+        self.vector_store = vector_store or VectorStoreHandle(
+            embedding_function=build_query_embeddings(http_client=http_client, http_async_client=http_async_client),
+            embedding_spec=current_embedding_spec(),
+        )
+        self.answer_cache = get_answer_cache()
+        self.assistant_service = AssistantService(
+            vector_store=self.vector_store,
+            answer_cache=self.answer_cache,
+            chat_model=chat_model or self._chat_model(temperature=MODEL_TEMPERATURE, streaming=True),
+        )
+        self.translation_service = TranslationService(chat_model=translation_model or self._chat_model(temperature=0))
+        self.metadata_service = ArticleMetadataService()
+        self.index_watcher: IndexWatcher | None = None
+        if INDEX_RELOAD_INTERVAL_SECONDS > 0:
+            self.index_watcher = IndexWatcher(self.vector_store, INDEX_RELOAD_INTERVAL_SECONDS)
+
+    @classmethod
+    def create(cls, **overrides: Any) -> ServiceContainer:
+        timeout = httpx.Timeout(HTTP_TIMEOUT_SECONDS)
+        limits = build_http_limits()
+        return cls(
+            http_client=httpx.Client(timeout=timeout, limits=limits),
+            http_async_client=httpx.AsyncClient(timeout=timeout, limits=limits),
+            **overrides,
+        )
+
+    def _chat_model(self, temperature: float, streaming: bool = False) -> ChatOpenAI:
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            model=MODEL,
+            temperature=temperature,
+            streaming=streaming,
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+        )
+
+    def prompt_service(self, session: Session) -> PromptService:
+        return PromptService(
+            prompt_repository=PromptRepository(session),
+            assistant_service=self.assistant_service,
+            metadata_service=self.metadata_service,
+            translation_service=self.translation_service,
+            prompt_writer=get_prompt_writer(),
+        )
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Cache and writer counters keyed by component, for the metrics endpoint."""
+        stats: dict[str, dict[str, float]] = {"translation_cache": self.translation_service.stats()}
+        if isinstance(self.vector_store.embedding_function, CachedEmbeddings):
+            stats["embedding_cache"] = self.vector_store.embedding_function.stats()
+        if self.answer_cache is not None:
+            stats["answer_cache"] = self.answer_cache.stats()
+        writer = get_prompt_writer()
+        if writer is not None:
+            stats["prompt_writer"] = writer.stats()
+        return stats
+
+    async def aclose(self) -> None:
+        if self.index_watcher is not None:
+            self.index_watcher.close()
+        self.vector_store.close()
+        if isinstance(self.vector_store.embedding_function, CachedEmbeddings):
+            self.vector_store.embedding_function.close()
+        self.translation_service.close()
+        self.http_client.close()
+        await self.http_async_client.aclose()
+        logger.info("Service container closed")
+
+
+__all__ = ["ServiceContainer", "build_http_limits"]
@@ -1,19 +1,16 @@
 from __future__ import annotations
 
 import os
+import secrets
 from collections.abc import Iterator
 
-from fastapi import Depends, Header, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
-from lunbi.config import API_TOKEN
+from lunbi.api.container import ServiceContainer
+from lunbi.config import ADMIN_TOKEN, API_TOKEN
 from lunbi.database import get_session
-from lunbi.repositories.prompt_repository import PromptRepository
-from lunbi.repositories.source_repository import SourceRepository
-from lunbi.services.article_metadata_service import ArticleMetadataService
 from lunbi.services.prompt_service import PromptService
-from lunbi.services.assistant_service import AssistantService
-from lunbi.services.translation_service import TranslationService
 
 
 def require_api_token(x_lunbi_token: str | None = Header(default=None, alias="X-Lunbi-Token")) -> None:
@@ -35,18 +32,40 @@ def require_api_token(x_lunbi_token: str | None = Header(default=None, alias="X-
         )
 
 
+def require_admin_token(
+    x_lunbi_admin_token: str | None = Header(default=None, alias="X-Lunbi-Admin-Token"),
+) -> None:
+    # Operational endpoints use their own token, so API clients cannot trigger them.
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Admin token not configured",
+        )
+    if not x_lunbi_admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing admin token",
+        )
+    if not secrets.compare_digest(x_lunbi_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token",
+        )
+
+
 def get_db_session() -> Iterator[Session]:
     yield from get_session()
 
 
-def get_prompt_service(session: Session = Depends(get_db_session)) -> PromptService:
-    prompt_repository = PromptRepository(session)
-    source_repository = SourceRepository(session)
-    translation_service = TranslationService()
-    return PromptService(
-        prompt_repository=prompt_repository,
-        assistant_service=AssistantService(),
-        source_repository=source_repository,
-        metadata_service=ArticleMetadataService(repository=source_repository),
-        translation_service=translation_service,
-    )
+def get_services(request: Request) -> ServiceContainer:
+    services: ServiceContainer | None = getattr(request.app.state, "services", None)
+    if services is None:
+        raise RuntimeError("Service container is not initialised; the app lifespan has not run")
+    return services
+
+
+def get_prompt_service(
+    session: Session = Depends(get_db_session),
+    services: ServiceContainer = Depends(get_services),
+) -> PromptService:
+    return services.prompt_service(session)
@@ -0,0 +1,25 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from lunbi.api.container import ServiceContainer
+from lunbi.api.deps import get_services, require_admin_token
+from lunbi.services.vector_store import IndexMismatchError
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin_token)], include_in_schema=False)
+
+logger = logging.getLogger("lunbi.api.admin")
+
+
+@router.post("/index/reload")
+def reload_index(services: ServiceContainer = Depends(get_services)) -> dict[str, object]:
+    """Switch this worker to the index version ``current`` points to, without waiting for the watcher."""
+    handle = services.vector_store
+    try:
+        switched = handle.reload()
+    except IndexMismatchError as error:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(error)) from error
+    except Exception as error:
+        logger.exception("Index reload failed")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Index reload failed") from error
+    return {"reloaded": switched, "version": handle.version, "path": str(handle.index_path)}
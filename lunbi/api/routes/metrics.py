@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from lunbi.api.container import ServiceContainer
+from lunbi.api.deps import get_services
+from lunbi.metrics import REGISTRY, render_stats
+
+router = APIRouter(tags=["Metrics"])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics(services: ServiceContainer = Depends(get_services)) -> PlainTextResponse:
+    # Unauthenticated like "/": Prometheus scrapes it and it carries no prompt text.
+    body = REGISTRY.render() + "".join(
+        render_stats(f"lunbi_{component}", component.replace("_", " ").capitalize(), stats)
+        for component, stats in services.stats().items()
+    )
+    return PlainTextResponse(body, media_type=CONTENT_TYPE)
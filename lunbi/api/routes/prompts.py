@@ -23,7 +23,7 @@ def create_prompt(
 
 
 @router.post("/stream")
-def stream_prompt(
+async def stream_prompt(
     payload: PromptRequest,
     service: PromptService = Depends(get_prompt_service),
 ) -> StreamingResponse:
@@ -32,7 +32,7 @@ def stream_prompt(
         payload.query,
         payload.language.value,
     )
-    stream = service.stream_prompt(payload.query, payload.language.value)
+    stream = service.astream_prompt(payload.query, payload.language.value)
     headers = {"Cache-Control": "no-cache", "Connection": "keep-alive"}
     return StreamingResponse(stream, media_type="text/event-stream", headers=headers)
 
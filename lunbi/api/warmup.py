@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import text
+
+from lunbi.api.container import ServiceContainer
+from lunbi.config import (
+    WARMUP_ANSWER_CONCURRENCY,
+    WARMUP_ANSWER_SCOPE_HINTS,
+    WARMUP_RETRY_MAX_SECONDS,
+    WARMUP_STEP_TIMEOUT_SECONDS,
+)
+from lunbi.database import get_engine
+from lunbi.services.assistant_service import SCOPE_HINTS
+from lunbi.services.embedding_cache import CachedEmbeddings
+from lunbi.services.embeddings import HashingEmbeddings
+
+logger = logging.getLogger("lunbi.warmup")
+
+RETRY_BASE_SECONDS = 1.0
+
+
+class WarmupState:
+    """Progress of the startup warmup, reported by ``/ready``.
+
+    The worker is ready once every required step (index, database) succeeded. Those are retried
+    until they do, so a database that comes up late or a slow first index open only delays
+    readiness. Optional steps only speed up the first requests; their failures are logged and
+    reported.
+    """
+
+    def __init__(self) -> None:
+        self.status = "pending"
+        self.steps: dict[str, dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"status": self.status, "steps": self.steps}
+
+
+def _touch_index(services: ServiceContainer) -> dict[str, Any]:
+    """Open Chroma, load the HNSW segment with one search and load the lexical index and scope model."""
+    with services.vector_store.lease() as index:
+        return {"version": index.version, "chunks": index.warm()}
+
+
+def _fill_connection_pool() -> dict[str, Any]:
+    """Check out as many connections as the pool keeps, so none is opened on the request path."""
+    engine = get_engine()
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = []
+    try:
+        for _ in range(size):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+    return {"connections": size}
+
+
+async def _connect_providers(services: ServiceContainer) -> dict[str, Any]:
+    """Open keep-alive connections to the embeddings API on both the sync and async pools.
+
+    The chat models share those pools and host, so their first request reuses the connection.
+    """
+    embeddings = services.vector_store.embedding_function
+    if isinstance(embeddings, CachedEmbeddings):
+        # Bypass the cache; a cached vector would leave the pools cold.
+        embeddings = embeddings.wrapped
+    if embeddings is None or isinstance(embeddings, HashingEmbeddings):
+        return {"skipped": "local embeddings"}
+    await embeddings.aembed_query("warmup")
+    await asyncio.to_thread(embeddings.embed_query, "warmup")
+    return {}
+
+
+async def _answer_scope_hints(services: ServiceContainer) -> dict[str, Any]:
+    """Answer the sample prompts once so clicks on them replay from the answer cache."""
+    if services.answer_cache is None:
+        return {"skipped": "answer cache disabled"}
+    semaphore = asyncio.Semaphore(WARMUP_ANSWER_CONCURRENCY)
+
+    async def answer(hint: str) -> None:
+        async with semaphore:
+            async for _ in services.assistant_service.astream_response(hint, "en"):
+                pass
+
+    await asyncio.gather(*(answer(hint) for hint in SCOPE_HINTS))
+    return {"answers": len(SCOPE_HINTS)}
+
+
+async def _run_step(state: WarmupState, name: str, step: Callable[[], Awaitable[dict[str, Any]]]) -> bool:
+    started = time.perf_counter()
+    try:
+        details = await asyncio.wait_for(step(), WARMUP_STEP_TIMEOUT_SECONDS)
+    except Exception as exc:
+        logger.exception("Warmup step '%s' failed", name)
+        outcome: dict[str, Any] = {"status": "failed", "error": repr(exc)}
+    else:
+        outcome = {"status": "ok", **details}
+    outcome["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    state.steps[name] = outcome
+    return outcome["status"] == "ok"
+
+
+async def _run_required_step(state: WarmupState, name: str, step: Callable[[], Awaitable[dict[str, Any]]]) -> None:
+    """Run a step the worker cannot serve without until it succeeds, backing off between attempts."""
+    for attempt in itertools.count(1):
+        succeeded = await _run_step(state, name, step)
+        state.steps[name]["attempts"] = attempt
+        if succeeded:
+            return
+        delay = min(RETRY_BASE_SECONDS * 2 ** (attempt - 1), WARMUP_RETRY_MAX_SECONDS) * random.uniform(0.5, 1.0)
+        state.steps[name]["retry_in_s"] = round(delay, 1)
+        logger.warning("Retrying warmup step '%s' in %.1fs (attempt %s failed)", name, delay, attempt)
+        await asyncio.sleep(delay)
+
+
+async def warm_up(services: ServiceContainer, state: WarmupState) -> None:
+    """Run the warmup steps in the background of the lifespan; ``/ready`` turns 200 when they succeed."""
+    state.status = "warming"
+    started = time.perf_counter()
+    # Index and database are independent, and both are needed to serve a prompt.
+    # A timed-out attempt keeps running in its thread; the retry then waits on the same index or pool lock.
+    await asyncio.gather(
+        _run_required_step(state, "index", lambda: asyncio.to_thread(_touch_index, services)),
+        _run_required_step(state, "database", lambda: asyncio.to_thread(_fill_connection_pool)),
+    )
+    await _run_step(state, "providers", lambda: _connect_providers(services))
+    if WARMUP_ANSWER_SCOPE_HINTS:
+        await _run_step(state, "scope_hints", lambda: _answer_scope_hints(services))
+
+    state.status = "ready"
+    logger.info("Warmup ready in %.0fms: %s", (time.perf_counter() - started) * 1000, state.steps)
+
+
+__all__ = ["WarmupState", "warm_up"]
@@ -5,18 +5,118 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
 # File paths
 BASE_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = BASE_DIR.parent
 DATA_PATH = PROJECT_ROOT / "data" / "articles"
 CHROMA_PATH = PROJECT_ROOT / "chroma"
+CACHE_DIR = Path(os.getenv("LUNBI_CACHE_DIR", str(PROJECT_ROOT / "cache")))
 # Model settings
-EMBEDDING_MODEL = "text-embedding-3-small"
+# Embeddings come from "openai" (EMBEDDING_MODEL over the network) or "hashing" (local, CPU only). The
+# index records the provider, model and dimension that built it and refuses to open under different ones.
+EMBEDDING_PROVIDER = os.getenv("LUNBI_EMBEDDING_PROVIDER", "openai")
+EMBEDDING_MODEL = os.getenv("LUNBI_EMBEDDING_MODEL", "text-embedding-3-small")
+# 0 keeps the model's native size (768 for the hashing provider)
+EMBEDDING_DIMENSIONS = int(os.getenv("LUNBI_EMBEDDING_DIMENSIONS", "0")) or None
+# Retrieved chunks scoring below this are ignored; local embeddings score lower than OpenAI ones
+MIN_RELEVANCE_SCORE = float(os.getenv("LUNBI_MIN_RELEVANCE_SCORE", "0.5"))
+# Index chunking (create_index_db): articles are cut at headings down to CHUNK_HEADING_LEVELS ("#" title,
+# "##" sections, "###" subsections), then long sections into CHUNK_SIZE characters overlapping by
+# CHUNK_OVERLAP. Changing any of them forces a full rebuild.
+CHUNK_SIZE = int(os.getenv("LUNBI_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("LUNBI_CHUNK_OVERLAP", "100"))
+CHUNK_HEADING_LEVELS = int(os.getenv("LUNBI_CHUNK_HEADING_LEVELS", "3"))
 MODEL = "gpt-4o-mini"
 MODEL_TEMPERATURE = 0.3
 
+# How non-English queries are retrieved: "translate" (translate, then search), "direct" (search the
+# original text; the embedding model is multilingual) or "hybrid" (search the original while the
+# translation runs, then merge in results for the translation if it arrives within the timeout)
+RETRIEVAL_MODE = os.getenv("LUNBI_RETRIEVAL_MODE", "translate")
+RETRIEVAL_TRANSLATION_TIMEOUT_SECONDS = float(os.getenv("LUNBI_RETRIEVAL_TRANSLATION_TIMEOUT_SECONDS", "2.0"))
+
+# How chunks are searched: "dense" (embeddings only) or "hybrid" (embeddings and the BM25 index that
+# create_index_db stores next to Chroma, fused by reciprocal rank)
+SEARCH_MODE = os.getenv("LUNBI_SEARCH_MODE", "dense")
+# In hybrid mode, a query naming a rare keyword (an accession id such as OSD-48, a gene or species name)
+# that one chunk clearly matches is answered from BM25 alone, skipping the embedding call
+LEXICAL_FAST_PATH = _get_bool("LUNBI_LEXICAL_FAST_PATH", True)
+LEXICAL_FAST_PATH_COVERAGE = float(os.getenv("LUNBI_LEXICAL_FAST_PATH_COVERAGE", "0.8"))
+LEXICAL_FAST_PATH_MARGIN = float(os.getenv("LUNBI_LEXICAL_FAST_PATH_MARGIN", "1.5"))
+# With dense search, queries whose embedding is far from every cluster of the corpus (scope model stored
+# with the index) skip the search: no chunk could pass MIN_RELEVANCE_SCORE, so they get the fallback or
+# example prompts. Off by default: it only pays off with a margin calibrated by evaluate_scope.
+SCOPE_PRECHECK = _get_bool("LUNBI_SCOPE_PRECHECK", False)
+# 0 only skips searches that provably cannot pass MIN_RELEVANCE_SCORE (cluster radii reach every stored
+# chunk), which is rare for high-dimensional embeddings; evaluate_scope recommends a larger cutoff for the
+# deployed corpus, at the risk of turning away answerable queries it did not see
+SCOPE_MIN_MARGIN_DEGREES = float(os.getenv("LUNBI_SCOPE_MIN_MARGIN_DEGREES", "0"))
+
+# Per-stage deadlines for the streaming pipeline
+TRANSLATION_TIMEOUT_SECONDS = float(os.getenv("LUNBI_TRANSLATION_TIMEOUT_SECONDS", "10"))
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("LUNBI_RETRIEVAL_TIMEOUT_SECONDS", "10"))
+SOURCE_RESOLUTION_TIMEOUT_SECONDS = float(os.getenv("LUNBI_SOURCE_RESOLUTION_TIMEOUT_SECONDS", "2"))
+
+# Seconds between checks for a new index version under CHROMA_PATH (0 disables; reload via the admin endpoint)
+INDEX_RELOAD_INTERVAL_SECONDS = float(os.getenv("LUNBI_INDEX_RELOAD_INTERVAL_SECONDS", "30"))
+
+# Startup warmup; /ready answers 503 until the index and database are warm
+WARMUP_STEP_TIMEOUT_SECONDS = float(os.getenv("LUNBI_WARMUP_STEP_TIMEOUT_SECONDS", "60"))
+# Failed index and database steps are retried with exponential backoff capped at this many seconds
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("LUNBI_WARMUP_RETRY_MAX_SECONDS", "30"))
+# Also answer the sample prompts (SCOPE_HINTS) into the answer cache; one LLM call per hint unless the
+# shared cache tier already holds them
+WARMUP_ANSWER_SCOPE_HINTS = _get_bool("LUNBI_WARMUP_ANSWER_SCOPE_HINTS", False)
+WARMUP_ANSWER_CONCURRENCY = int(os.getenv("LUNBI_WARMUP_ANSWER_CONCURRENCY", "4"))
+
+# Shared OpenAI HTTP connection pools (one sync and one async pool per worker)
+HTTP_MAX_CONNECTIONS = int(os.getenv("LUNBI_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LUNBI_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LUNBI_HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("LUNBI_HTTP_TIMEOUT_SECONDS", "60"))
+
+# Query embedding cache; set LUNBI_EMBEDDING_CACHE_PATH to an empty value to keep it in memory only
+EMBEDDING_CACHE_SIZE = int(os.getenv("LUNBI_EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_PATH = os.getenv("LUNBI_EMBEDDING_CACHE_PATH", str(CACHE_DIR / "query_embeddings.sqlite3")) or None
+
+# Translation cache; set LUNBI_TRANSLATION_CACHE_PATH to an empty value to keep it in memory only
+TRANSLATION_CACHE_SIZE = int(os.getenv("LUNBI_TRANSLATION_CACHE_SIZE", "2048"))
+TRANSLATION_CACHE_PATH = os.getenv("LUNBI_TRANSLATION_CACHE_PATH", str(CACHE_DIR / "translations.sqlite3")) or None
+
+# Semantic answer cache
+ANSWER_CACHE_ENABLED = _get_bool("LUNBI_ANSWER_CACHE_ENABLED", True)
+# Share answers between replicas through the answer_cache table; run `alembic upgrade head` before enabling
+ANSWER_CACHE_PERSISTENT = _get_bool("LUNBI_ANSWER_CACHE_PERSISTENT", False)
+ANSWER_CACHE_SIMILARITY = float(os.getenv("LUNBI_ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("LUNBI_ANSWER_CACHE_MAX_ENTRIES", "1024"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("LUNBI_ANSWER_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+
+# Write-behind persistence of prompt records
+PROMPT_WRITE_BEHIND = _get_bool("LUNBI_PROMPT_WRITE_BEHIND", False)
+PROMPT_WRITER_BATCH_SIZE = int(os.getenv("LUNBI_PROMPT_WRITER_BATCH_SIZE", "100"))
+PROMPT_WRITER_FLUSH_SECONDS = float(os.getenv("LUNBI_PROMPT_WRITER_FLUSH_SECONDS", "1.0"))
+PROMPT_WRITER_MAX_QUEUE = int(os.getenv("LUNBI_PROMPT_WRITER_MAX_QUEUE", "10000"))
+PROMPT_ID_PREFETCH = int(os.getenv("LUNBI_PROMPT_ID_PREFETCH", "50"))
+
+# Shared md_filename -> source index; load_sources bumps the version file to force a reload. The file is
+# host-local: replicas on other hosts pick up new sources after the TTL unless it is on shared storage.
+SOURCE_INDEX_TTL_SECONDS = int(os.getenv("LUNBI_SOURCE_INDEX_TTL_SECONDS", "300"))
+SOURCE_INDEX_VERSION_PATH = Path(
+    os.getenv("LUNBI_SOURCE_INDEX_VERSION_PATH", str(CACHE_DIR / "source_index_version"))
+)
+
 # API security
 API_TOKEN = os.getenv("LUNBI_API_TOKEN")
+# Separate token for /admin endpoints (index reload); unset disables them
+ADMIN_TOKEN = os.getenv("LUNBI_ADMIN_TOKEN")
 
 # Database
 POSTGRES_USER = os.getenv("POSTGRES_USER", "lunbi")
@@ -24,10 +124,26 @@ POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "lunbi")
 POSTGRES_DB = os.getenv("POSTGRES_DB", "lunbi")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
 POSTGRES_PORT = int(os.getenv("POSTGRES_PORT", "5432"))
-DATABASE_URL = (
+# LUNBI_DATABASE_URL overrides the POSTGRES_* settings (e.g. a SQLite file for local benchmarks)
+DATABASE_URL = os.getenv("LUNBI_DATABASE_URL") or (
     f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
     f"@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 )
 # AWS credentials
 AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
 AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
+AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "eu-west-1")
+# Set for an S3-compatible store (MinIO, a local moto server); unset uses AWS
+S3_ENDPOINT_URL = os.getenv("LUNBI_S3_ENDPOINT_URL") or None
+
+# Index distribution: publish_index uploads versions under CHROMA_S3_PREFIX with a manifest, and
+# download_s3_file unpacks them into chroma/versions/<version>. CHROMA_S3_OBJECT is the older
+# single-archive layout, used when the bucket has no manifest yet.
+CHROMA_S3_BUCKET = os.getenv("CHROMA_S3_BUCKET", "lunbi")
+CHROMA_S3_PREFIX = os.getenv("CHROMA_S3_PREFIX", "chroma").strip("/")
+CHROMA_S3_OBJECT = os.getenv("CHROMA_S3_OBJECT", "chroma.zip")
+# Parallel transfers (files, and ranged parts of each file) and the part size
+INDEX_TRANSFER_CONCURRENCY = int(os.getenv("LUNBI_INDEX_TRANSFER_CONCURRENCY", "8"))
+INDEX_TRANSFER_PART_SIZE_MB = int(os.getenv("LUNBI_INDEX_TRANSFER_PART_SIZE_MB", "16"))
+# Downloaded versions kept on disk, the current one included
+INDEX_KEEP_VERSIONS = int(os.getenv("LUNBI_INDEX_KEEP_VERSIONS", "3"))
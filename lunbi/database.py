@@ -1,19 +1,47 @@
 import logging
+import threading
 from contextlib import contextmanager
-from typing import Iterator
+from typing import Any, Iterator
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from lunbi.config import DATABASE_URL
 
 logger = logging.getLogger("lunbi.db")
 
-engine = create_engine(DATABASE_URL, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
-
 Base = declarative_base()
 
+# The engine (and its DBAPI driver import) is created on first use, so scripts that never
+# touch the database do not pay for it.
+_engine: Engine | None = None
+_session_factory: sessionmaker | None = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    global _engine, _session_factory
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(DATABASE_URL, future=True)
+                _session_factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+                _engine = engine
+    return _engine
+
+
+def SessionLocal() -> Session:
+    get_engine()
+    return _session_factory()  # type: ignore[misc]
+
+
+def __getattr__(name: str) -> Any:
+    # `from lunbi.database import engine` keeps working, creating the engine at that point.
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 @contextmanager
 def session_scope() -> Iterator[Session]:
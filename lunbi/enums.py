@@ -0,0 +1,7 @@
+import enum
+
+
+class PromptStatus(str, enum.Enum):
+    SUCCESS = "success"
+    FAILED = "failed"
+    OUT_OF_CONTEXT = "outofcontext"
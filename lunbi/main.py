@@ -1,8 +1,20 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
 from logging.config import dictConfig
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
-from lunbi.api.routes import prompts
+from lunbi.api.container import ServiceContainer
+from lunbi.api.routes import admin, metrics, prompts
+from lunbi.api.warmup import WarmupState, warm_up
+from lunbi.services.answer_cache import close_answer_cache
+from lunbi.services.prompt_writer import close_prompt_writer
+
+logger = logging.getLogger("lunbi.app")
 
 LOGGING_CONFIG = {
     "version": 1,
@@ -31,16 +43,42 @@ def configure_logging() -> None:
     dictConfig(LOGGING_CONFIG)
 
 
-def create_app() -> FastAPI:
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    services = app.state.container_factory()
+    app.state.services = services
+    app.state.warmup = WarmupState()
+    # Warm up in the background so "/" answers liveness probes while "/ready" holds traffic back.
+    warmup_task = asyncio.create_task(warm_up(services, app.state.warmup))
+    yield
+    warmup_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await warmup_task
+    close_prompt_writer()
+    close_answer_cache()
+    await services.aclose()
+
+
+def create_app(container_factory: Callable[[], ServiceContainer] = ServiceContainer.create) -> FastAPI:
     configure_logging()
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
+    app.state.container_factory = container_factory
 
     app.include_router(prompts.router)
+    app.include_router(metrics.router)
+    app.include_router(admin.router)
 
     @app.get("/")
     def read_root():
         return {"status": "ok"}
 
+    @app.get("/ready")
+    def read_ready(request: Request) -> JSONResponse:
+        warmup: WarmupState | None = getattr(request.app.state, "warmup", None)
+        if warmup is None:
+            return JSONResponse({"status": "pending", "steps": {}}, status_code=503)
+        return JSONResponse(warmup.as_dict(), status_code=200 if warmup.ready else 503)
+
     return app
 
 
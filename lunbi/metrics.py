@@ -0,0 +1,277 @@
+"""Minimal in-process metrics rendered in the Prometheus text exposition format.
+
+Recording is a lock, a dict lookup and (for histograms) a bisect, so the hot path pays
+well under a microsecond per observation. Everything is per process: with several API
+workers, scrape each worker or aggregate by instance.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Mapping, TypeVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+GENERATION_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0)
+RATE_BUCKETS = (5.0, 10.0, 20.0, 40.0, 60.0, 80.0, 100.0, 150.0, 200.0, 400.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _check(self, labels: LabelValues) -> None:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(f"{line}\n" for line in self._samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._check(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._check(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        self._check(labels)
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    @contextmanager
+    def track(self, *labels: str) -> Iterator[None]:
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class _HistogramState:
+    __slots__ = ("buckets", "count", "total")
+
+    def __init__(self, size: int) -> None:
+        self.buckets = [0] * size
+        self.count = 0
+        self.total = 0.0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        labelnames: tuple[str, ...] = (),
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self._states: dict[LabelValues, _HistogramState] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        self._check(labels)
+        # Index of the first bucket whose upper bound is >= value; past the end means +Inf only.
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            state = self._states.get(labels)
+            if state is None:
+                state = self._states[labels] = _HistogramState(len(self.bounds))
+            if index < len(self.bounds):
+                state.buckets[index] += 1
+            state.count += 1
+            state.total += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels: str) -> int:
+        state = self._states.get(labels)
+        return state.count if state else 0
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            snapshot = {key: (list(state.buckets), state.count, state.total) for key, state in self._states.items()}
+        lines = []
+        for key, (buckets, count, total) in snapshot.items():
+            cumulative = 0
+            for bound, bucket in zip(self.bounds, buckets):
+                cumulative += bucket
+                labels = _labels((*self.labelnames, "le"), (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels((*self.labelnames, 'le'), (*key, '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+REGISTRY = Registry()
+
+
+def _stage_histogram(name: str, documentation: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, buckets))
+
+
+TRANSLATION_SECONDS = _stage_histogram("lunbi_translation_seconds", "Query translation latency, cache hits included.")
+EMBEDDING_SECONDS = _stage_histogram("lunbi_query_embedding_seconds", "Query embedding latency, cache hits included.")
+VECTOR_SEARCH_SECONDS = _stage_histogram("lunbi_vector_search_seconds", "Chroma similarity search latency.")
+LEXICAL_SEARCH_SECONDS = _stage_histogram("lunbi_lexical_search_seconds", "BM25 search latency.")
+TIME_TO_FIRST_TOKEN_SECONDS = _stage_histogram(
+    "lunbi_time_to_first_token_seconds",
+    "Time from starting the model stream to its first non-empty chunk.",
+    GENERATION_BUCKETS,
+)
+GENERATION_SECONDS = _stage_histogram(
+    "lunbi_generation_seconds", "Wall time of a complete model stream.", GENERATION_BUCKETS
+)
+TOKENS_PER_SECOND = _stage_histogram(
+    "lunbi_generation_tokens_per_second", "Streamed chunks per second of generation (one chunk is one token).", RATE_BUCKETS
+)
+SOURCE_RESOLUTION_SECONDS = _stage_histogram("lunbi_source_resolution_seconds", "Source metadata resolution latency.")
+PERSIST_SECONDS = _stage_histogram(
+    "lunbi_prompt_persist_seconds", "Time spent persisting a prompt on the request path (enqueue when written behind)."
+)
+PROMPTS_TOTAL = REGISTRY.register(Counter("lunbi_prompts_total", "Answered prompts by outcome.", ("status",)))
+SEARCHES_TOTAL = REGISTRY.register(
+    Counter("lunbi_searches_total", "Chunk searches by path (dense, hybrid or the lexical fast path).", ("path",))
+)
+SCOPE_CHECKS_TOTAL = REGISTRY.register(
+    Counter("lunbi_scope_checks_total", "Out-of-scope pre-checks by result (in or out).", ("result",))
+)
+STREAMS_IN_FLIGHT = REGISTRY.register(Gauge("lunbi_streams_in_flight", "Streaming responses currently being served."))
+STREAMS_IN_FLIGHT.set(0)
+INDEX_RELOADS_TOTAL = REGISTRY.register(
+    Counter("lunbi_index_reloads_total", "Index hot reloads by result (switched or failed).", ("result",))
+)
+INDEX_GENERATIONS_OPEN = REGISTRY.register(
+    Gauge("lunbi_index_generations_open", "Open index versions, the current one and any still draining requests.")
+)
+INDEX_GENERATIONS_OPEN.set(0)
+
+
+def render_stats(prefix: str, documentation: str, stats: Mapping[str, float]) -> str:
+    """Render a component's `stats()` snapshot; running totals become counters, the rest gauges."""
+    lines = []
+    for key, value in stats.items():
+        if key in {"entries", "queue_depth"} or key.endswith("_ms"):
+            name, kind = f"{prefix}_{key}", "gauge"
+        else:
+            name, kind = f"{prefix}_{key}_total", "counter"
+        lines.append(f"# HELP {name} {documentation} ({key}).\n# TYPE {name} {kind}\n{name} {_format_value(value)}\n")
+    return "".join(lines)
+
+
+__all__ = [
+    "Counter",
+    "EMBEDDING_SECONDS",
+    "GENERATION_SECONDS",
+    "Gauge",
+    "Histogram",
+    "INDEX_GENERATIONS_OPEN",
+    "INDEX_RELOADS_TOTAL",
+    "LEXICAL_SEARCH_SECONDS",
+    "PERSIST_SECONDS",
+    "PROMPTS_TOTAL",
+    "REGISTRY",
+    "Registry",
+    "SOURCE_RESOLUTION_SECONDS",
+    "SCOPE_CHECKS_TOTAL",
+    "SEARCHES_TOTAL",
+    "STREAMS_IN_FLIGHT",
+    "TIME_TO_FIRST_TOKEN_SECONDS",
+    "TOKENS_PER_SECOND",
+    "TRANSLATION_SECONDS",
+    "VECTOR_SEARCH_SECONDS",
+    "render_stats",
+]
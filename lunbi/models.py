@@ -1,16 +1,10 @@
 import datetime
-import enum
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, Text
+from sqlalchemy import JSON, Column, DateTime, Enum, ForeignKey, Integer, LargeBinary, String, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from lunbi.database import Base
-
-
-class PromptStatus(str, enum.Enum):
-    SUCCESS = "success"
-    FAILED = "failed"
-    OUT_OF_CONTEXT = "outofcontext"
+from lunbi.enums import PromptStatus
 
 
 class Source(Base):
@@ -41,3 +35,22 @@ class Prompt(Base):
 
     def __repr__(self) -> str:
         return f"<Prompt id={self.id} status={self.status}>"
+
+
+class AnswerCacheEntry(Base):
+    __tablename__ = "answer_cache"
+    __table_args__ = (UniqueConstraint("query_hash", "language", "index_version", name="uq_answer_cache_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    query_hash = Column(String(64), nullable=False, index=True)
+    language = Column(String(8), nullable=False)
+    index_version = Column(Text, nullable=False)
+    query = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    sources = Column(JSON, nullable=False, default=list)
+    status = Column(Enum(PromptStatus, name="prompt_status"), nullable=False)
+    embedding = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+    def __repr__(self) -> str:
+        return f"<AnswerCacheEntry id={self.id} language={self.language} index_version={self.index_version}>"
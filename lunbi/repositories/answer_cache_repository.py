@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import datetime
+from typing import Optional
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from lunbi.models import AnswerCacheEntry, PromptStatus
+
+
+class AnswerCacheRepository:
+    """Persistence operations for the shared (tier two) answer cache."""
+
+    def __init__(self, session: Session) -> None:
+        self._session = session
+
+    def get(
+        self,
+        query_hash: str,
+        language: str,
+        index_version: str,
+        created_after: datetime.datetime | None = None,
+    ) -> Optional[AnswerCacheEntry]:
+        stmt = select(AnswerCacheEntry).where(
+            AnswerCacheEntry.query_hash == query_hash,
+            AnswerCacheEntry.language == language,
+            AnswerCacheEntry.index_version == index_version,
+        )
+        if created_after is not None:
+            stmt = stmt.where(AnswerCacheEntry.created_at >= created_after)
+        return self._session.execute(stmt).scalar_one_or_none()
+
+    def upsert(
+        self,
+        query_hash: str,
+        language: str,
+        index_version: str,
+        query: str,
+        answer: str,
+        sources: list[str],
+        status: PromptStatus,
+        embedding: bytes,
+    ) -> AnswerCacheEntry:
+        entry = self.get(query_hash, language, index_version)
+        if entry is None:
+            entry = AnswerCacheEntry(query_hash=query_hash, language=language, index_version=index_version)
+            self._session.add(entry)
+        entry.query = query
+        entry.answer = answer
+        entry.sources = list(sources)
+        entry.status = status
+        entry.embedding = embedding
+        entry.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self._session.flush()
+        return entry
+
+    def delete_stale_versions(
+        self, retired_version: str, current_version: str, expired_before: datetime.datetime
+    ) -> int:
+        """Delete entries of `retired_version` and expired entries of any version but `current_version`."""
+        stmt = delete(AnswerCacheEntry).where(
+            AnswerCacheEntry.index_version != current_version,
+            or_(AnswerCacheEntry.index_version == retired_version, AnswerCacheEntry.created_at < expired_before),
+        )
+        return self._session.execute(stmt).rowcount or 0
@@ -1,6 +1,6 @@
 from typing import Sequence
 
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.orm import Session
 
 from lunbi.models import Prompt
@@ -11,11 +11,27 @@ class PromptRepository:
     def __init__(self, session: Session) -> None:
         self._session = session
 
+    def connect(self) -> None:
+        """Check out the session's connection ahead of the first statement."""
+        self._session.connection()
+
     def add(self, prompt: Prompt) -> Prompt:
         self._session.add(prompt)
         self._session.flush()
         return prompt
 
+    def add_many(self, prompts: Sequence[Prompt]) -> None:
+        self._session.add_all(prompts)
+        self._session.flush()
+
+    def supports_id_reservation(self) -> bool:
+        return self._session.get_bind().dialect.name == "postgresql"
+
+    def reserve_ids(self, count: int) -> list[int]:
+        """Draw `count` ids from the prompts id sequence without inserting anything (PostgreSQL only)."""
+        stmt = text("SELECT nextval(pg_get_serial_sequence('prompts', 'id')) FROM generate_series(1, :count)")
+        return list(self._session.execute(stmt, {"count": count}).scalars())
+
     def list_latest(self, limit: int = 20) -> Sequence[Prompt]:
         stmt = (
             select(Prompt)
@@ -1,13 +1,29 @@
 from __future__ import annotations
 
-from typing import Optional
+from dataclasses import dataclass
+from typing import Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import literal_column, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from lunbi.models import Source
 
 
+@dataclass(frozen=True)
+class SourceRow:
+    title: str
+    url: str
+    md_filename: str
+
+
+@dataclass
+class BulkUpsertResult:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+
 class SourceRepository:
     """Persistence operations for sources."""
 
@@ -49,3 +65,48 @@ class SourceRepository:
     def list_all(self) -> list[Source]:
         stmt = select(Source)
         return list(self._session.execute(stmt).scalars())
+
+    def list_index_rows(self) -> list[tuple[str, int, str, str]]:
+        """(md_filename, id, title, url) for every source, without loading ORM objects."""
+        stmt = select(Source.md_filename, Source.id, Source.title, Source.url)
+        return list(self._session.execute(stmt).tuples())
+
+    def supports_bulk_upsert(self) -> bool:
+        return self._session.get_bind().dialect.name == "postgresql"
+
+    def bulk_upsert(self, rows: Sequence[SourceRow]) -> BulkUpsertResult:
+        """Upsert many sources keyed on md_filename with one INSERT ... ON CONFLICT DO UPDATE.
+
+        Rows must have unique md_filename and url values. Rows whose URL already belongs to a
+        different md_filename are renamed one by one through `upsert`, matching its semantics.
+        """
+        result = BulkUpsertResult()
+        if not rows:
+            return result
+
+        stmt = select(Source.url, Source.md_filename).where(Source.url.in_([row.url for row in rows]))
+        owners = dict(self._session.execute(stmt).tuples().all())
+        moved = [row for row in rows if owners.get(row.url, row.md_filename) != row.md_filename]
+        batch = [row for row in rows if owners.get(row.url, row.md_filename) == row.md_filename]
+
+        for row in moved:
+            self.upsert(title=row.title, url=row.url, md_filename=row.md_filename)
+            result.updated += 1
+
+        if batch:
+            insert_stmt = pg_insert(Source).values(
+                [{"title": row.title, "url": row.url, "md_filename": row.md_filename} for row in batch]
+            )
+            excluded = insert_stmt.excluded
+            upsert_stmt = insert_stmt.on_conflict_do_update(
+                index_elements=[Source.md_filename],
+                set_={"title": excluded.title, "url": excluded.url},
+                where=or_(Source.title.is_distinct_from(excluded.title), Source.url.is_distinct_from(excluded.url)),
+            ).returning(literal_column("(xmax = 0)").label("inserted"))
+            # xmax is 0 only for freshly inserted tuples; rows skipped by the WHERE clause are not returned.
+            returned = self._session.execute(upsert_stmt).scalars().all()
+            created = sum(1 for inserted in returned if inserted)
+            result.created += created
+            result.updated += len(returned) - created
+            result.unchanged += len(batch) - len(returned)
+        return result
@@ -0,0 +1,396 @@
+"""Drive `/prompts` and `/prompts/stream` concurrently and report throughput and latency percentiles.
+
+By default the API runs in-process under uvicorn with deterministic fakes: a hashed
+embedding model and a streaming chat model with configurable first-token and per-token
+latency, a throwaway Chroma index and a SQLite database (``--database-url`` points it at
+a local Postgres instead). Nothing leaves the machine. Pass ``--url`` to load an already
+running server instead. Results are written as JSON tagged with the current commit so
+runs can be compared with ``--compare``.
+"""
+
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_RESULTS_DIR = PROJECT_ROOT / "cache" / "benchmarks"
+ENDPOINTS = {"prompt": "/prompts", "stream": "/prompts/stream"}
+WORDS = "microgravity bone density astronaut cardiovascular plant root radiation immune muscle orbit".split()
+TOPICS = [
+    "bone loss in long-duration spaceflight",
+    "plant growth under simulated microgravity",
+    "immune dysregulation in astronauts",
+    "cardiovascular deconditioning after missions",
+    "radiation damage to cellular DNA",
+    "muscle atrophy countermeasures in orbit",
+]
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Chat model whose answer is derived from a hash of the prompt, streamed word by word."""
+
+    first_token_latency: float = 0.2
+    token_latency: float = 0.01
+    tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _tokens(self, messages: list[BaseMessage]) -> list[str]:
+        digest = hashlib.sha256("".join(str(message.content) for message in messages).encode("utf-8")).digest()
+        return [WORDS[digest[index % len(digest)] % len(WORDS)] + " " for index in range(self.tokens)]
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.first_token_latency + self.tokens * self.token_latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._tokens(messages))))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.first_token_latency + self.tokens * self.token_latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._tokens(messages))))])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for token in self._tokens(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            time.sleep(self.token_latency)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for token in self._tokens(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            await asyncio.sleep(self.token_latency)
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    """Hash-seeded vectors (identical text, identical vector) behind a simulated network delay."""
+
+    latency: float = 0.02
+
+    def embed_query(self, text: str) -> list[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        await asyncio.sleep(self.latency)
+        return super().embed_query(text)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {}
+    return {
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "mean": statistics.fmean(samples),
+        "max": max(samples),
+    }
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_documents(count: int) -> list[tuple[str, str]]:
+    """(md_filename, text) pairs for the throwaway index; queries reuse the texts so they hit."""
+    return [
+        (f"bench_article_{index:04d}.md", f"Findings on {TOPICS[index % len(TOPICS)]}, study {index}.")
+        for index in range(count)
+    ]
+
+
+def configure_environment(args: argparse.Namespace, workdir: Path) -> None:
+    # lunbi.config reads the environment once at import, so this runs before any lunbi import.
+    os.environ["LUNBI_DATABASE_URL"] = args.database_url or f"sqlite:///{workdir / 'bench.sqlite3'}"
+    os.environ["LUNBI_CACHE_DIR"] = str(workdir / "cache")
+    os.environ.setdefault("LUNBI_API_TOKEN", "bench")
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ["LUNBI_RETRIEVAL_MODE"] = args.retrieval_mode
+    os.environ["LUNBI_ANSWER_CACHE_ENABLED"] = "true" if args.answer_cache else "false"
+    if args.write_behind:
+        os.environ["LUNBI_PROMPT_WRITE_BEHIND"] = "true"
+
+
+def prepare_app(args: argparse.Namespace, workdir: Path, documents: list[tuple[str, str]]) -> Any:
+    from langchain_chroma import Chroma
+    from langchain_core.documents import Document
+
+    from lunbi.api.container import ServiceContainer
+    from lunbi.database import Base, get_engine, session_scope
+    from lunbi.main import create_app
+    from lunbi.models import Source
+    from lunbi.services.vector_store import VectorStoreHandle
+
+    Base.metadata.create_all(get_engine())
+    with session_scope() as session:
+        if not session.query(Source).filter(Source.md_filename == documents[0][0]).first():
+            session.add_all(
+                Source(title=text, url=f"https://example.org/{name}", md_filename=name) for name, text in documents
+            )
+
+    embeddings = FakeEmbeddings(size=args.dimensions, latency=args.embedding_latency)
+    chroma_dir = workdir / "chroma"
+    Chroma.from_documents(
+        [Document(page_content=text, metadata={"source": f"data/articles/{name}"}) for name, text in documents],
+        embeddings,
+        persist_directory=str(chroma_dir),
+    )
+
+    def container_factory() -> ServiceContainer:
+        return ServiceContainer.create(
+            vector_store=VectorStoreHandle(persist_directory=chroma_dir, embedding_function=embeddings),
+            chat_model=FakeStreamingChatModel(
+                first_token_latency=args.first_token_latency, token_latency=args.token_latency, tokens=args.tokens
+            ),
+            translation_model=FakeStreamingChatModel(first_token_latency=args.translation_latency, tokens=8),
+        )
+
+    app = create_app(container_factory)
+    # Per-request INFO logs would dominate the run's output and its CPU profile.
+    for name in ("lunbi", "httpx"):
+        logging.getLogger(name).setLevel(args.log_level)
+    return app
+
+
+class InProcessServer:
+    """Runs the app under uvicorn on a background thread bound to a free local port."""
+
+    def __init__(self, app: Any) -> None:
+        import uvicorn
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> None:
+        self._thread.start()
+        deadline = time.monotonic() + 30
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("In-process server failed to start")
+            time.sleep(0.05)
+        # Measure warm workers only, as a load balancer gated on /ready would.
+        while httpx.get(f"{self.url}/ready").status_code != 200:
+            if time.monotonic() > deadline:
+                raise RuntimeError("In-process server did not become ready")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=30)
+
+
+async def send(client: httpx.AsyncClient, endpoint: str, payload: dict[str, str]) -> tuple[float, float]:
+    """Total latency and time to first body byte of one request, in milliseconds."""
+    started = time.perf_counter()
+    first_byte: float | None = None
+    async with client.stream("POST", ENDPOINTS[endpoint], json=payload) as response:
+        response.raise_for_status()
+        body = b""
+        async for chunk in response.aiter_raw():
+            if first_byte is None and chunk:
+                first_byte = time.perf_counter()
+            body += chunk
+    finished = time.perf_counter()
+    if endpoint == "stream" and not body.endswith(b"data: [DONE]\n\n"):
+        raise RuntimeError("Stream ended without the [DONE] terminator")
+    return (finished - started) * 1000, ((first_byte or finished) - started) * 1000
+
+
+async def run_endpoint(
+    url: str, token: str, endpoint: str, warmup: list[str], queries: list[str], args: argparse.Namespace
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    first_bytes: list[float] = []
+    errors: list[str] = []
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for query in queries:
+        queue.put_nowait(query)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {"X-Lunbi-Token": token}
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits, timeout=args.timeout) as client:
+        for query in warmup:
+            await send(client, endpoint, {"query": query, "language": args.language})
+
+        async def worker() -> None:
+            while not queue.empty():
+                query = queue.get_nowait()
+                try:
+                    total, first = await send(client, endpoint, {"query": query, "language": args.language})
+                except Exception as exc:  # noqa: BLE001 - every failure is reported, none aborts the run
+                    errors.append(f"{type(exc).__name__}: {exc}")
+                    continue
+                latencies.append(total)
+                first_bytes.append(first)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result: dict[str, Any] = {
+        "requests": len(queries),
+        "errors": len(errors),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "ttft_ms": summarize(first_bytes),
+    }
+    if errors:
+        result["error_samples"] = sorted(set(errors))[:5]
+    return result
+
+
+def report(results: dict[str, dict[str, Any]], baseline: dict[str, Any] | None) -> None:
+    for endpoint, result in results.items():
+        latency, ttft = result["latency_ms"], result["ttft_ms"]
+        line = f"{endpoint:>7}: {result['throughput_rps']:.1f} req/s errors={result['errors']}"
+        if latency:
+            line += (
+                f" total p50={latency['p50']:.0f}ms p95={latency['p95']:.0f}ms p99={latency['p99']:.0f}ms"
+                f" ttft p50={ttft['p50']:.0f}ms p95={ttft['p95']:.0f}ms p99={ttft['p99']:.0f}ms"
+            )
+        print(line)
+        previous = (baseline or {}).get("results", {}).get(endpoint)
+        if previous and latency and previous.get("latency_ms"):
+            deltas = [f"throughput {result['throughput_rps'] / previous['throughput_rps'] - 1:+.1%}"]
+            for metric in ("latency_ms", "ttft_ms"):
+                for pct in ("p50", "p95", "p99"):
+                    before = previous[metric][pct]
+                    deltas.append(f"{metric[:-3]} {pct} {result[metric][pct] / before - 1:+.1%}" if before else "")
+            print(f"{'':>9}vs {baseline['commit']}: " + ", ".join(item for item in deltas if item))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), default=["stream", "prompt"])
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured sequential requests per endpoint")
+    parser.add_argument("--language", choices=["en", "pl"], default="en")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--url", help="Load an already running server instead of the in-process fake app")
+    parser.add_argument("--token", default=os.getenv("LUNBI_API_TOKEN", "bench"), help="API token for --url")
+    parser.add_argument("--database-url", help="SQLAlchemy URL for the in-process app (default: temporary SQLite)")
+    parser.add_argument("--documents", type=int, default=200, help="Articles in the throwaway index")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--translation-latency", type=float, default=0.15)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--retrieval-mode", choices=["translate", "direct", "hybrid"], default="translate")
+    parser.add_argument("--answer-cache", action="store_true", help="Enable the answer cache (off so every request generates)")
+    parser.add_argument("--write-behind", action="store_true", help="Persist prompts through the write-behind queue")
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the in-process app")
+    parser.add_argument("--output", type=Path, help=f"Result file (default: {DEFAULT_RESULTS_DIR}/load_<commit>_<time>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier result file to print relative changes against")
+    args = parser.parse_args()
+
+    documents = build_documents(args.documents)
+    baseline = json.loads(args.compare.read_text(encoding="utf-8")) if args.compare else None
+
+    with tempfile.TemporaryDirectory(prefix="lunbi-bench-") as tmp:
+        server: InProcessServer | None = None
+        url, token = args.url, args.token
+        if url is None:
+            workdir = Path(tmp)
+            configure_environment(args, workdir)
+            server = InProcessServer(prepare_app(args, workdir, documents))
+            server.start()
+            url, token = server.url, os.environ["LUNBI_API_TOKEN"]
+
+        results: dict[str, dict[str, Any]] = {}
+        try:
+            for position, endpoint in enumerate(args.endpoints):
+                # Each request asks about an indexed article, so retrieval finds a source; the start
+                # is shifted per endpoint so one pass does not replay the queries of the previous one.
+                start = position * len(documents) // len(args.endpoints)
+                queries = [documents[(start + index) % len(documents)][1] for index in range(args.warmup + args.requests)]
+                print(f"{endpoint}: {args.requests} requests at concurrency {args.concurrency} against {url}")
+                results[endpoint] = asyncio.run(
+                    run_endpoint(url, token, endpoint, queries[: args.warmup], queries[args.warmup :], args)
+                )
+        finally:
+            if server is not None:
+                server.stop()
+
+    commit = current_commit()
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    summary = {
+        "commit": commit,
+        "timestamp": timestamp,
+        "config": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "results": results,
+    }
+    report(results, baseline)
+
+    output = args.output or DEFAULT_RESULTS_DIR / f"load_{commit}_{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Measure per-request service construction against the lifespan service container.
+
+Runs entirely offline: chat completions are answered by a local keep-alive HTTP server,
+which also counts how many TCP connections each strategy opens.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from lunbi.api.container import ServiceContainer
+from lunbi.repositories.prompt_repository import PromptRepository
+from lunbi.services.answer_cache import AnswerCache
+from lunbi.services.article_metadata_service import ArticleMetadataService
+from lunbi.services.assistant_service import AssistantService
+from lunbi.services.prompt_service import PromptService
+from lunbi.services.translation_service import TranslationService
+
+
+class FakeChatServer:
+    """Minimal OpenAI-compatible `/v1/chat/completions` endpoint that counts connections."""
+
+    def __init__(self, latency: float) -> None:
+        self.connections = 0
+        lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                # Headers and body go out in separate writes; without this, Nagle adds ~40ms per reply.
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with lock:
+                    server.connections += 1
+
+            def do_POST(self) -> None:  # noqa: N802 - http.server naming
+                self.rfile.read(int(self.headers.get("Content-Length", "0")))
+                if latency:
+                    time.sleep(latency)
+                body = json.dumps(
+                    {
+                        "id": "chatcmpl-bench",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": "gpt-4o-mini",
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": "translated"},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                    }
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - http.server signature
+                return
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(label: str, samples: list[float], connections: int | None = None) -> None:
+    line = (
+        f"{label:>22}: p50={percentile(samples, 50):.3f}ms "
+        f"p99={percentile(samples, 99):.3f}ms mean={statistics.fmean(samples):.3f}ms"
+    )
+    if connections is not None:
+        line += f" connections={connections}"
+    print(line)
+
+
+def measure(build: Callable[[], PromptService], requests: int, call: bool) -> list[float]:
+    samples = []
+    for index in range(requests):
+        started = time.perf_counter()
+        service = build()
+        if call:
+            # A distinct query per request so the translation cache never short-circuits the call.
+            service._translation_service.translate(f"Jak grawitacja wpływa na kości? ({index})", "en", "pl")
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the fake server sleeps per completion")
+    args = parser.parse_args()
+
+    server = FakeChatServer(args.latency)
+    os.environ["OPENAI_API_BASE"] = server.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    session = Session()
+    container = ServiceContainer.create()
+    answer_cache = AnswerCache(persistent=False)
+
+    def per_request() -> PromptService:
+        # What get_prompt_service did before the container: fresh OpenAI clients on every request.
+        return PromptService(
+            prompt_repository=PromptRepository(session),
+            assistant_service=AssistantService(vector_store=container.vector_store, answer_cache=answer_cache),
+            metadata_service=ArticleMetadataService(),
+            translation_service=TranslationService(cache_path=None),
+        )
+
+    def from_container() -> PromptService:
+        return container.prompt_service(session)
+
+    try:
+        print(f"Building services for {args.requests} requests")
+        report("per-request build", measure(per_request, args.requests, call=False))
+        report("container build", measure(from_container, args.requests, call=False))
+
+        print(f"Building services and making one chat call for {args.requests} requests")
+        before = server.connections
+        samples = measure(per_request, args.requests, call=True)
+        report("per-request build+call", samples, server.connections - before)
+        before = server.connections
+        samples = measure(from_container, args.requests, call=True)
+        report("container build+call", samples, server.connections - before)
+    finally:
+        asyncio.run(container.aclose())
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compare per-request Chroma reopening with the shared vector store handle."""
+
+import argparse
+import statistics
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from lunbi.services.vector_store import VectorStoreHandle
+
+QUERIES = [
+    "How does microgravity affect the human cardiovascular system?",
+    "What changes occur in astronaut bone density during long missions?",
+    "Explain plant root growth in reduced gravity environments.",
+    "Describe immune system adaptations to spaceflight.",
+    "What are the impacts of space radiation on cellular DNA?",
+]
+
+
+def build_synthetic_index(path: Path, documents: int, embedding: DeterministicFakeEmbedding) -> None:
+    docs = [
+        Document(page_content=f"Synthetic space biology passage {index}", metadata={"source": f"doc_{index}.md"})
+        for index in range(documents)
+    ]
+    Chroma.from_documents(docs, embedding, persist_directory=str(path))
+    print(f"Built synthetic index with {documents} documents at {path}")
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run(label: str, search: Callable[[str], None], requests: int, concurrency: int) -> None:
+    def timed(index: int) -> float:
+        start = time.perf_counter()
+        search(QUERIES[index % len(QUERIES)])
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        latencies = list(pool.map(timed, range(requests)))
+        elapsed = time.perf_counter() - started
+
+    print(
+        f"{label:>8}: p50={percentile(latencies, 50):.2f}ms "
+        f"p99={percentile(latencies, 99):.2f}ms "
+        f"mean={statistics.fmean(latencies):.2f}ms "
+        f"throughput={requests / elapsed:.1f} req/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--persist-directory", type=Path, help="Existing index to query; a synthetic one is built when omitted")
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    embedding = DeterministicFakeEmbedding(size=args.dimensions)
+    # Fake vectors are not normalised, so langchain warns about out-of-range relevance scores.
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.persist_directory
+        if path is None:
+            path = Path(tmp_dir) / "chroma"
+            build_synthetic_index(path, args.documents, embedding)
+
+        def reopen_search(query: str) -> None:
+            db = Chroma(persist_directory=str(path), embedding_function=embedding)
+            db.similarity_search_with_relevance_scores(query, k=3)
+
+        handle = VectorStoreHandle(persist_directory=path, embedding_function=embedding)
+
+        def shared_search(query: str) -> None:
+            handle.get().similarity_search_with_relevance_scores(query, k=3)
+
+        print(f"Running {args.requests} searches at concurrency {args.concurrency}")
+        run("reopen", reopen_search, args.requests, args.concurrency)
+        run("shared", shared_search, args.requests, args.concurrency)
+        handle.close()
+
+
+if __name__ == "__main__":
+    main()
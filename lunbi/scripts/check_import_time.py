@@ -0,0 +1,99 @@
+"""Fail when importing the API or the CLI entry points gets slower than its budget.
+
+Each entry point is imported in a fresh interpreter under ``python -X importtime``; the best
+of ``--runs`` cumulative times is compared with its budget. Budgets carry headroom over the
+times measured when they were set, and ``--scale`` stretches them for slower CI machines.
+Modules that must stay deferred (the OpenAI client, chromadb, SQLAlchemy for scripts that do
+not need them) are checked as well, which catches regressions independently of machine speed.
+"""
+
+import argparse
+import subprocess
+import sys
+from typing import NamedTuple
+
+
+class Budget(NamedTuple):
+    milliseconds: float
+    deferred: tuple[str, ...] = ()
+
+
+HEAVY_PROVIDERS = ("langchain_openai", "openai", "langchain_chroma", "chromadb", "langchain_community")
+
+BUDGETS = {
+    # Worker startup: uvicorn imports the app before the lifespan builds services.
+    "lunbi.main": Budget(1800, HEAVY_PROVIDERS),
+    "lunbi.scripts.ask_question": Budget(800, (*HEAVY_PROVIDERS, "sqlalchemy")),
+    "lunbi.scripts.evaluate_scope": Budget(900, (*HEAVY_PROVIDERS, "sqlalchemy")),
+    "lunbi.scripts.download_s3_file": Budget(1000, (*HEAVY_PROVIDERS, "sqlalchemy")),
+    "lunbi.scripts.publish_index": Budget(1000, (*HEAVY_PROVIDERS, "sqlalchemy")),
+}
+
+
+def measure(module: str) -> tuple[float, set[str]]:
+    """Cumulative import time of `module` in milliseconds and every module it imported."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = 0.0
+    imported: set[str] = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|", 2)
+        name = name.strip()
+        if not total.strip().isdigit():
+            continue
+        imported.add(name)
+        if name == module:
+            cumulative = int(total) / 1000
+    return cumulative, imported
+
+
+class ImportCheck(NamedTuple):
+    module: str
+    milliseconds: float
+    limit: float
+    eager: tuple[str, ...]
+
+    @property
+    def within_budget(self) -> bool:
+        return self.milliseconds <= self.limit
+
+    @property
+    def ok(self) -> bool:
+        return self.within_budget and not self.eager
+
+
+def check(module: str, runs: int = 3, scale: float = 1.0) -> ImportCheck:
+    """Import `module` `runs` times; the fastest run counts, a deferred module imported in any run is eager."""
+    budget = BUDGETS[module]
+    samples = [measure(module) for _ in range(runs)]
+    best = min(milliseconds for milliseconds, _ in samples)
+    eager = tuple(sorted(name for name in budget.deferred if any(name in imported for _, imported in samples)))
+    return ImportCheck(module, best, budget.milliseconds * scale, eager)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS), help="Entry points to check (default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="Imports per module; the fastest counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget, e.g. 2 on slow CI runners")
+    args = parser.parse_args()
+
+    failures = 0
+    for module in args.modules:
+        result = check(module, args.runs, args.scale)
+        failures += not result.ok
+        line = f"{'ok' if result.ok else 'FAIL':>4} {module}: {result.milliseconds:.0f}ms (budget {result.limit:.0f}ms)"
+        if result.eager:
+            line += f", imports {', '.join(result.eager)} eagerly"
+        print(line)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Header-aware Markdown chunking, exact-duplicate removal and chunk statistics for index builds."""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from bisect import bisect_right
+from dataclasses import asdict, dataclass
+from typing import Any, Iterable
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from lunbi.scripts.embedding_scheduler import estimate_tokens
+
+BREADCRUMB_SEPARATOR = " > "
+# Upper bounds (estimated tokens) of the histogram buckets in the stats report; the last one is open.
+TOKEN_BUCKETS = (32, 64, 128, 256, 512, 1024)
+HISTOGRAM_WIDTH = 40
+
+# ATX headings as section_to_markdown writes them: "#" for the title, "##" for sections, deeper for subsections.
+_HEADING_PATTERN = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class ChunkingSettings:
+    """How articles are cut into chunks; recorded in the index manifest, a change forces a full rebuild."""
+
+    chunk_size: int
+    chunk_overlap: int
+    heading_levels: int
+
+    def __post_init__(self) -> None:
+        if self.chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if not 0 <= self.chunk_overlap < self.chunk_size:
+            raise ValueError("chunk_overlap must be at least 0 and smaller than chunk_size")
+        if not 1 <= self.heading_levels <= 6:
+            raise ValueError("heading_levels must be between 1 and 6")
+
+    @property
+    def key(self) -> str:
+        return f"md{self.heading_levels}:{self.chunk_size}/{self.chunk_overlap}"
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"strategy": "markdown-headers", **asdict(self)}
+
+
+@dataclass(frozen=True)
+class Section:
+    start: int
+    text: str
+    headings: tuple[str, ...]
+
+
+def split_sections(text: str, heading_levels: int) -> list[Section]:
+    """Cut `text` at every heading up to `heading_levels` deep, each section keeping its breadcrumb.
+
+    A section starts with its own heading line, so the heading stays searchable. Sections holding
+    nothing but a heading (a section whose content is all in subsections) are dropped; their title
+    lives on in the breadcrumbs of the subsections.
+    """
+    starts = [0]
+    breadcrumbs: list[tuple[str, ...]] = [()]
+    trail: list[tuple[int, str]] = []
+    for match in _HEADING_PATTERN.finditer(text):
+        level = len(match.group(1))
+        if level > heading_levels:
+            continue
+        trail = [(depth, title) for depth, title in trail if depth < level]
+        trail.append((level, match.group(2).strip()))
+        starts.append(match.start())
+        breadcrumbs.append(tuple(title for _, title in trail))
+
+    sections = []
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else len(text)
+        body = text[start:end]
+        content = body.partition("\n")[2] if index else body
+        if not content.strip():
+            continue
+        sections.append(Section(start=start, text=body, headings=breadcrumbs[index]))
+    return sections
+
+
+class MarkdownChunker:
+    """Splits Markdown articles section by section, then cuts long sections to `chunk_size` characters.
+
+    Chunks never straddle a heading, so overlap only has to bridge cuts inside one section and can
+    be far smaller than with plain recursive splitting. Each chunk carries `start_index` (its offset
+    in the article) and `headings`, the breadcrumb of the section it came from.
+    """
+
+    def __init__(self, settings: ChunkingSettings) -> None:
+        self.settings = settings
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap,
+            length_function=len,
+            add_start_index=True,
+        )
+
+    def split_document(self, doc: Document) -> list[Document]:
+        chunks = []
+        for section in split_sections(doc.page_content, self.settings.heading_levels):
+            metadata = {**doc.metadata, "headings": BREADCRUMB_SEPARATOR.join(section.headings)}
+            # Only the body is cut; its first piece is extended back over the heading line (so it may pass
+            # chunk_size by that much) instead of the heading ending up as a chunk of its own.
+            body_start = len(section.text.partition("\n")[0]) if section.headings else 0
+            pieces = self._splitter.create_documents([section.text[body_start:]], metadatas=[metadata])
+            for number, piece in enumerate(pieces):
+                offset = body_start + piece.metadata["start_index"]
+                if number == 0:
+                    piece.page_content = section.text[: offset + len(piece.page_content)]
+                    offset = 0
+                piece.metadata["start_index"] = section.start + offset
+                chunks.append(piece)
+        return chunks
+
+    def split_documents(self, docs: Iterable[Document]) -> list[Document]:
+        return [chunk for doc in docs for chunk in self.split_document(doc)]
+
+
+def chunk_digest(text: str) -> str:
+    """Key of a chunk's text for exact-duplicate detection; surrounding whitespace does not count."""
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class ChunkStats:
+    chunks: int
+    duplicates: int
+    tokens: int
+    token_counts: tuple[int, ...]
+
+    @classmethod
+    def collect(cls, chunks: list[Document], duplicates: int = 0) -> ChunkStats:
+        counts = tuple(sorted(estimate_tokens(chunk.page_content) for chunk in chunks))
+        return cls(chunks=len(chunks), duplicates=duplicates, tokens=sum(counts), token_counts=counts)
+
+    def percentile(self, share: float) -> int:
+        if not self.token_counts:
+            return 0
+        return self.token_counts[min(len(self.token_counts) - 1, int(share * len(self.token_counts)))]
+
+    def histogram(self) -> list[tuple[str, int]]:
+        bounds = [0, *TOKEN_BUCKETS]
+        totals = [0] * len(bounds)
+        for count in self.token_counts:
+            totals[bisect_right(TOKEN_BUCKETS, count - 1)] += 1
+        labels = [f"{low + 1}-{high}" for low, high in zip(bounds, TOKEN_BUCKETS)]
+        labels.append(f">{TOKEN_BUCKETS[-1]}")
+        return list(zip(labels, totals))
+
+    def report(self, model: str, price_per_million: float | None) -> str:
+        lines = [
+            f"Chunks to embed: {self.chunks} ({self.duplicates} exact duplicates dropped)",
+            f"Estimated tokens: {self.tokens} "
+            f"(p50 {self.percentile(0.5)}, p95 {self.percentile(0.95)}, max {self.percentile(1.0)} per chunk)",
+            "Tokens per chunk:",
+        ]
+        histogram = self.histogram()
+        peak = max((total for _, total in histogram), default=0) or 1
+        label_width = max(len(label) for label, _ in histogram)
+        for label, total in histogram:
+            bar = "#" * round(HISTOGRAM_WIDTH * total / peak)
+            lines.append(f"  {label:>{label_width}} | {total:>7} {bar}")
+        if price_per_million is None:
+            lines.append(f"Estimated embedding cost: unknown for {model}; pass --price-per-million")
+        else:
+            cost = self.tokens / 1_000_000 * price_per_million
+            lines.append(f"Estimated embedding cost: ${cost:.4f} at ${price_per_million}/1M tokens ({model})")
+        return "\n".join(lines)
+
+
+__all__ = [
+    "ChunkStats",
+    "ChunkingSettings",
+    "MarkdownChunker",
+    "Section",
+    "chunk_digest",
+    "split_sections",
+]
@@ -1,53 +1,438 @@
+import argparse
+import hashlib
+import json
+import math
 import os
 import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator
 
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.document_loaders import DirectoryLoader
+import numpy as np
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import Embeddings
 from dotenv import load_dotenv
 
-from lunbi.config import DATA_PATH, CHROMA_PATH
+from lunbi.config import (
+    CACHE_DIR,
+    CHROMA_PATH,
+    CHUNK_HEADING_LEVELS,
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    DATA_PATH,
+    INDEX_KEEP_VERSIONS,
+)
+from lunbi.scripts.chunking import ChunkingSettings, ChunkStats, MarkdownChunker, chunk_digest
+from lunbi.scripts.embedding_scheduler import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_TOKENS_PER_MINUTE,
+    EmbeddingCheckpoint,
+    EmbeddingScheduler,
+)
+from lunbi.services.embeddings import EmbeddingSpec, build_embeddings, current_embedding_spec
+from lunbi.services.index_distribution import activate, prune_versions
+from lunbi.services.lexical_index import LEXICAL_INDEX_FILENAME, LexicalIndex
+from lunbi.services.scope_model import SCOPE_MODEL_FILENAME, ScopeModel
+from lunbi.services.vector_store import (
+    CURRENT_LINK,
+    INDEX_FILENAME,
+    MANIFEST_FILENAME,
+    VERSIONS_DIRNAME,
+    read_index_manifest,
+    recorded_embedding,
+    resolve_index_path,
+    write_index_version,
+)
 
 load_dotenv()
 
+CHECKPOINT_PATH = CACHE_DIR / "index_checkpoint.sqlite3"
+UPSERT_BATCH_SIZE = 500
+READ_BATCH_SIZE = 5000
+# Chunk vectors sampled for the scope model's clustering
+SCOPE_SAMPLE_SIZE = 20000
+# USD per million input tokens, for the cost estimate in the chunk stats report
+EMBEDDING_PRICES_PER_MILLION_TOKENS = {
+    "text-embedding-3-small": 0.02,
+    "text-embedding-3-large": 0.13,
+    "text-embedding-ada-002": 0.10,
+}
 
-def load_documents() -> list[Document]:
-    loader = DirectoryLoader(str(DATA_PATH), glob="*.md")
-    docs = loader.load()
+
+def load_documents(paths: Iterable[Path] | None = None) -> list[Document]:
+    # Articles are read as raw Markdown: the chunker splits on the headings a document loader would strip.
+    if paths is None:
+        paths = sorted(DATA_PATH.glob("*.md"))
+    docs = [Document(page_content=path.read_text(encoding="utf-8"), metadata={"source": str(path)}) for path in paths]
     print(f"Loaded {len(docs)} docs from {DATA_PATH}.")
     return docs
 
 
-def split_text(docs: list[Document]) -> list[Document]:
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=500,
-        length_function=len,
-        add_start_index=True
-    )
-    chunks = text_splitter.split_documents(docs)
+def split_text(docs: list[Document], chunker: MarkdownChunker) -> list[Document]:
+    chunks = chunker.split_documents(docs)
     print(f"Split {len(docs)} docs into {len(chunks)} chunks.")
     return chunks
 
 
-def save_to_chroma(chunks: list[Document]) -> None:
-    if os.path.exists(CHROMA_PATH):
-        shutil.rmtree(CHROMA_PATH)
+def embedding_price(spec: EmbeddingSpec, override: float | None = None) -> float | None:
+    if override is not None:
+        return override
+    if spec.provider == "hashing":
+        return 0.0
+    return EMBEDDING_PRICES_PER_MILLION_TOKENS.get(spec.model)
+
+
+def print_chunk_stats(chunks: list[Document], duplicates: int, spec: EmbeddingSpec, price: float | None) -> None:
+    print(ChunkStats.collect(chunks, duplicates).report(spec.model, embedding_price(spec, price)))
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def scan_articles() -> dict[str, str]:
+    """Map every markdown filename under DATA_PATH to the SHA-256 of its content."""
+    return {path.name: file_digest(path) for path in sorted(DATA_PATH.glob("*.md"))}
+
+
+def save_manifest(
+    index_dir: Path,
+    files: dict[str, dict[str, Any]],
+    spec: EmbeddingSpec,
+    dimensions: int | None,
+    settings: ChunkingSettings,
+) -> None:
+    # The actual vector size is recorded so the API can refuse to query with mismatched embeddings.
+    embedding = {**spec.as_dict(), "dimensions": dimensions or spec.dimensions}
+    manifest = {"embedding": embedding, "splitter": settings.as_dict(), "files": files}
+    (index_dir / MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def assign_chunk_ids(
+    chunks: list[Document], digests: dict[str, str], stored: dict[str, str] | None = None
+) -> tuple[list[Document], list[str], dict[str, dict[str, Any]]]:
+    """Give chunks stable ids derived from their file and its content hash, dropping exact duplicates.
+
+    `stored` maps the text digest of chunks already in the index to their ids. A chunk whose text is
+    stored or was kept earlier in `chunks` is dropped; when the kept copy belongs to another file, the
+    dropping file lists its id under "duplicate_of" so it is re-chunked if that copy is ever deleted.
+    """
+    seen = dict(stored or {})
+    kept: list[Document] = []
+    ids: list[str] = []
+    files: dict[str, dict[str, Any]] = {}
+    for chunk in chunks:
+        filename = Path(chunk.metadata["source"]).name
+        digest = digests[filename]
+        entry = files.setdefault(filename, {"sha256": digest, "chunk_ids": []})
+        text_digest = chunk_digest(chunk.page_content)
+        original = seen.get(text_digest)
+        if original is not None:
+            if not original.startswith(f"{filename}:"):
+                duplicate_of = entry.setdefault("duplicate_of", [])
+                if original not in duplicate_of:
+                    duplicate_of.append(original)
+            continue
+        chunk_id = f"{filename}:{digest[:16]}:{len(entry['chunk_ids'])}"
+        seen[text_digest] = chunk_id
+        entry["chunk_ids"].append(chunk_id)
+        kept.append(chunk)
+        ids.append(chunk_id)
+    for filename, digest in digests.items():
+        files.setdefault(filename, {"sha256": digest, "chunk_ids": []})
+    return kept, ids, files
+
+
+def with_dependents(previous: dict[str, dict[str, Any]], digests: dict[str, str], affected: set[str]) -> set[str]:
+    """Add the unchanged files that dropped a duplicate of a chunk about to be deleted, transitively."""
+    affected = set(affected)
+    while True:
+        stale = {chunk_id for name in affected for chunk_id in previous.get(name, {}).get("chunk_ids", [])}
+        dependents = {
+            name
+            for name, entry in previous.items()
+            if name in digests and name not in affected and not stale.isdisjoint(entry.get("duplicate_of", ()))
+        }
+        if not dependents:
+            return affected
+        affected |= dependents
+
 
-    Chroma.from_documents(
-        chunks,
-        OpenAIEmbeddings(model="text-embedding-3-small"),
-        persist_directory=str(CHROMA_PATH)
+def build_index_embeddings(spec: EmbeddingSpec) -> Embeddings:
+    # Retries and batching are owned by EmbeddingScheduler; chunks are far below the model's
+    # context window, so raw text is sent instead of tiktoken token ids.
+    return build_embeddings(spec, max_retries=0, check_embedding_ctx_length=False)
+
+
+def open_chroma(index_dir: Path, spec: EmbeddingSpec) -> Chroma:
+    return Chroma(persist_directory=str(index_dir), embedding_function=build_index_embeddings(spec))
+
+
+def release_chroma(db: Chroma) -> None:
+    # Chroma keeps one client per directory for the life of the process; stop it before the directory moves.
+    db._client.clear_system_cache()
+
+
+@contextmanager
+def staged_build() -> Iterator[Path]:
+    """Empty directory beside the index versions that a build writes into; removed if the build fails."""
+    staging = CHROMA_PATH / VERSIONS_DIRNAME / f".build-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        yield staging
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def copy_index(source: Path, staging: Path) -> None:
+    """Copy the served index into `staging` for an incremental update; it is never changed in place."""
+
+    def ignore(directory: str, names: list[str]) -> set[str]:
+        # An index built before versions were used lives directly in CHROMA_PATH, next to them.
+        if Path(directory) != source:
+            return set()
+        return {name for name in names if name in {VERSIONS_DIRNAME, CURRENT_LINK} or name.startswith(".")}
+
+    shutil.copytree(source, staging, ignore=ignore, dirs_exist_ok=True)
+
+
+def install_build(staging: Path) -> str:
+    """Move a finished build to ``versions/<version>`` and switch ``current`` to it atomically.
+
+    Running workers keep serving the previous version until they reload; it is pruned like a
+    downloaded one, once more than INDEX_KEEP_VERSIONS versions are on disk.
+    """
+    flat = CHROMA_PATH / INDEX_FILENAME
+    version = write_index_version(staging)
+    target = CHROMA_PATH / VERSIONS_DIRNAME / version
+    os.rename(staging, target)
+    activate(CHROMA_PATH, target)
+    removed = prune_versions(CHROMA_PATH, INDEX_KEEP_VERSIONS)
+    if removed:
+        print(f"Removed old index versions {', '.join(removed)}.")
+    if flat.exists():
+        print(f"{CHROMA_PATH} now serves versions/{version}; the index files directly under it are unused.")
+    return version
+
+
+def build_scheduler(
+    spec: EmbeddingSpec,
+    settings: ChunkingSettings,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+    tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+) -> EmbeddingScheduler:
+    return EmbeddingScheduler(
+        build_index_embeddings(spec),
+        # Chunk ids are reused across chunking settings, so checkpointed vectors are only valid under the same ones.
+        checkpoint=EmbeddingCheckpoint(CHECKPOINT_PATH, model_name=f"{spec.key}:{settings.key}"),
+        batch_size=batch_size,
+        concurrency=concurrency,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
     )
-    print(f"Saved {len(chunks)} to {CHROMA_PATH}.")
 
 
-def main() -> None:
+def upsert_chunks(db: Chroma, chunks: list[Document], ids: list[str], scheduler: EmbeddingScheduler) -> int | None:
+    """Embed and store `chunks`; returns the vector dimension (None when there was nothing to embed)."""
+    vectors = scheduler.embed(ids, [chunk.page_content for chunk in chunks])
+    for start in range(0, len(chunks), UPSERT_BATCH_SIZE):
+        end = start + UPSERT_BATCH_SIZE
+        db._collection.upsert(
+            ids=ids[start:end],
+            embeddings=vectors[start:end],
+            metadatas=[chunk.metadata for chunk in chunks[start:end]],
+            documents=[chunk.page_content for chunk in chunks[start:end]],
+        )
+    return len(vectors[0]) if vectors else None
+
+
+def iter_stored_chunks(db: Chroma) -> Iterable[tuple[str, str]]:
+    offset = 0
+    while True:
+        batch = db._collection.get(include=["documents"], limit=READ_BATCH_SIZE, offset=offset)
+        if not batch["ids"]:
+            return
+        yield from zip(batch["ids"], batch["documents"])
+        offset += len(batch["ids"])
+
+
+def save_lexical_index(db: Chroma, index_dir: Path) -> int:
+    """Rebuild the BM25 index from every stored chunk; corpus statistics change with any update."""
+    index = LexicalIndex.build(iter_stored_chunks(db))
+    index.save(index_dir / LEXICAL_INDEX_FILENAME)
+    return len(index)
+
+
+def iter_stored_vectors(db: Chroma, total: int) -> Iterable[np.ndarray]:
+    for offset in range(0, total, READ_BATCH_SIZE):
+        batch = db._collection.get(include=["embeddings"], limit=READ_BATCH_SIZE, offset=offset)
+        yield np.asarray(batch["embeddings"], dtype=np.float32)
+
+
+def save_scope_model(db: Chroma, index_dir: Path) -> int:
+    """Cluster the stored vectors into the out-of-scope pre-check model; returns its cluster count."""
+    total = db._collection.count()
+    if not total:
+        (index_dir / SCOPE_MODEL_FILENAME).unlink(missing_ok=True)
+        return 0
+    step = math.ceil(total / SCOPE_SAMPLE_SIZE)
+    model = ScopeModel.build(np.concatenate([batch[::step] for batch in iter_stored_vectors(db, total)]))
+    if step > 1:
+        # Centroids come from a sample, but the radii must reach every chunk for the pre-check to be safe.
+        model = model.covering(iter_stored_vectors(db, total))
+    model.save(index_dir / SCOPE_MODEL_FILENAME)
+    return model.clusters
+
+
+def save_sidecars(db: Chroma, index_dir: Path) -> None:
+    chunks = save_lexical_index(db, index_dir)
+    clusters = save_scope_model(db, index_dir)
+    print(f"Saved the lexical index ({chunks} chunks) and scope model ({clusters} clusters).")
+
+
+def save_to_chroma(
+    chunks: list[Document],
+    digests: dict[str, str],
+    spec: EmbeddingSpec,
+    scheduler: EmbeddingScheduler,
+    settings: ChunkingSettings,
+    price: float | None = None,
+) -> None:
+    kept, ids, files = assign_chunk_ids(chunks, digests)
+    print_chunk_stats(kept, len(chunks) - len(kept), spec, price)
+    with staged_build() as staging:
+        db = open_chroma(staging, spec)
+        dimensions = upsert_chunks(db, kept, ids, scheduler)
+        save_sidecars(db, staging)
+        save_manifest(staging, files, spec, dimensions, settings)
+        release_chroma(db)
+        version = install_build(staging)
+    print(f"Saved {len(kept)} to {CHROMA_PATH / VERSIONS_DIRNAME / version} (version {version}).")
+
+
+def build_full(
+    spec: EmbeddingSpec, scheduler: EmbeddingScheduler, chunker: MarkdownChunker, price: float | None = None
+) -> None:
+    digests = scan_articles()
     docs = load_documents()
-    chunks = split_text(docs)
-    save_to_chroma(chunks)
+    chunks = split_text(docs, chunker)
+    save_to_chroma(chunks, digests, spec, scheduler, chunker.settings, price)
+
+
+def report_only(spec: EmbeddingSpec, chunker: MarkdownChunker, price: float | None = None) -> None:
+    """Chunk every article as a full rebuild would and print the stats, without embedding anything."""
+    chunks = split_text(load_documents(), chunker)
+    kept, _, _ = assign_chunk_ids(chunks, scan_articles())
+    print_chunk_stats(kept, len(chunks) - len(kept), spec, price)
+
+
+def build_incremental(
+    spec: EmbeddingSpec, scheduler: EmbeddingScheduler, chunker: MarkdownChunker, price: float | None = None
+) -> None:
+    served = resolve_index_path(CHROMA_PATH)
+    manifest = read_index_manifest(served)
+    if (
+        manifest is None
+        or manifest.get("splitter") != chunker.settings.as_dict()
+        or not spec.matches(recorded_embedding(manifest))
+    ):
+        print("No compatible index manifest found; running a full rebuild.")
+        build_full(spec, scheduler, chunker, price)
+        return
+
+    previous: dict[str, dict[str, Any]] = manifest["files"]
+    digests = scan_articles()
+    changed = sorted(name for name, digest in digests.items() if previous.get(name, {}).get("sha256") != digest)
+    removed = sorted(name for name in previous if name not in digests)
+    sidecars = all((served / name).exists() for name in (LEXICAL_INDEX_FILENAME, SCOPE_MODEL_FILENAME))
+    if not changed and not removed and sidecars:
+        print(f"Index at {served} is up to date ({len(digests)} files).")
+        return
+
+    # Files that dropped a duplicate of a chunk about to be deleted are re-chunked so the text stays indexed.
+    dependents = sorted(with_dependents(previous, digests, set(changed) | set(removed)) - set(changed) - set(removed))
+    rechunked = sorted(changed + dependents)
+    with staged_build() as staging:
+        copy_index(served, staging)
+        db = open_chroma(staging, spec)
+        stale_ids = [chunk_id for name in rechunked + removed for chunk_id in previous.get(name, {}).get("chunk_ids", [])]
+        if stale_ids:
+            db.delete(ids=stale_ids)
+
+        files = {name: entry for name, entry in previous.items() if name in digests and name not in rechunked}
+        dimensions = recorded_embedding(manifest).get("dimensions")
+        if rechunked:
+            chunks = split_text(load_documents(DATA_PATH / name for name in rechunked), chunker)
+            stored = {chunk_digest(text): chunk_id for chunk_id, text in iter_stored_chunks(db)}
+            kept, ids, changed_files = assign_chunk_ids(chunks, {name: digests[name] for name in rechunked}, stored)
+            print_chunk_stats(kept, len(chunks) - len(kept), spec, price)
+            dimensions = upsert_chunks(db, kept, ids, scheduler) or dimensions
+            files.update(changed_files)
+        else:
+            kept = []
+
+        save_sidecars(db, staging)
+        save_manifest(staging, files, spec, dimensions, chunker.settings)
+        release_chroma(db)
+        version = install_build(staging)
+    print(
+        f"Updated {served} into versions/{version}: {len(changed)} new or changed files and {len(dependents)} "
+        f"dependent files ({len(kept)} chunks), {len(removed)} removed files, {len(stale_ids)} stale chunks deleted."
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or update the Chroma index from local articles")
+    parser.add_argument("--full", action="store_true", help="Rebuild the index from scratch instead of updating a copy of it")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Chunks per embedding request")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Embedding requests in flight")
+    parser.add_argument("--requests-per-minute", type=int, default=DEFAULT_REQUESTS_PER_MINUTE)
+    parser.add_argument("--tokens-per-minute", type=int, default=DEFAULT_TOKENS_PER_MINUTE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Maximum characters per chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP, help="Characters shared by cut chunks")
+    parser.add_argument("--heading-levels", type=int, default=CHUNK_HEADING_LEVELS, help="Deepest heading to split on")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Chunk every article and print the stats report without embedding or touching the index",
+    )
+    parser.add_argument(
+        "--price-per-million", type=float, default=None, help="Embedding price in USD per million tokens"
+    )
+    args = parser.parse_args()
+
+    try:
+        settings = ChunkingSettings(args.chunk_size, args.chunk_overlap, args.heading_levels)
+    except ValueError as error:
+        parser.error(str(error))
+    chunker = MarkdownChunker(settings)
+    spec = current_embedding_spec()
+    if args.dry_run:
+        report_only(spec, chunker, args.price_per_million)
+        return
+
+    print(f"Embedding with {spec.describe()}")
+    scheduler = build_scheduler(
+        spec,
+        settings,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+    )
+    if args.full:
+        build_full(spec, scheduler, chunker, args.price_per_million)
+    else:
+        build_incremental(spec, scheduler, chunker, args.price_per_million)
+    # The index now holds every vector; the checkpoint is only needed to resume a failed run.
+    scheduler.discard_checkpoint()
 
 
 if __name__ == "__main__":
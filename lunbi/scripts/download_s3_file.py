@@ -1,100 +1,71 @@
-"""Download the Chroma index from S3 when it is missing locally."""
+"""Download the published Chroma index from S3 unless the current version is already here.
 
-import shutil
-import sys
-import tempfile
-import zipfile
-from pathlib import Path
-
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
-
-from lunbi.config import CHROMA_PATH, AWS_SECRET_KEY, AWS_ACCESS_KEY
-
-BUCKET_NAME = "lunbi"
-OBJECT_KEY = "chroma.zip"
-REGION = "eu-west-1"
-INDEX_FILENAME = "chroma.sqlite3"
-
-
-def chroma_exists() -> bool:
-    index_path = CHROMA_PATH / INDEX_FILENAME
-    return index_path.exists()
-
-
-def download_zip(target_path: Path) -> None:
-    try:
-        session = boto3.Session(
-            region_name=REGION,
-            aws_access_key_id=AWS_ACCESS_KEY,
-            aws_secret_access_key=AWS_SECRET_KEY,
-        )
-        client = session.client("s3")
-        client.download_file(BUCKET_NAME, OBJECT_KEY, str(target_path))
-    except (BotoCoreError, ClientError) as error:
-        raise RuntimeError(f"Failed to download s3://{BUCKET_NAME}/{OBJECT_KEY}: {error}") from error
-
-
-def _clear_directory(path: Path) -> None:
-    if not path.exists():
-        return
-    for entry in path.iterdir():
-        if entry.is_dir():
-            shutil.rmtree(entry)
-        else:
-            entry.unlink()
-
-
-def _copy_contents(source: Path, destination: Path) -> None:
-    destination.mkdir(parents=True, exist_ok=True)
-    for entry in source.iterdir():
-        target = destination / entry.name
-        if entry.is_dir():
-            shutil.copytree(entry, target, dirs_exist_ok=True)
-        else:
-            shutil.copy2(entry, target)
+The bucket's manifest names the published version. When ``chroma/current`` already points at it,
+nothing is downloaded; otherwise the files go straight into ``chroma/versions/<version>``, are
+checked against the manifest's SHA-256 digests and ``current`` is switched to them atomically, so
+a running or starting API never sees a half-written index. Buckets without a manifest fall back
+to the single ``chroma.zip`` archive, versioned by its ETag.
+"""
 
+import argparse
+import sys
 
-def extract_zip(zip_path: Path, destination: Path) -> None:
-    _clear_directory(destination)
-    destination.mkdir(parents=True, exist_ok=True)
-    try:
-        with zipfile.ZipFile(zip_path) as archive, tempfile.TemporaryDirectory() as tmp_dir:
-            archive.extractall(tmp_dir)
-            staging = Path(tmp_dir)
-            candidates = [item for item in staging.iterdir() if item.name != "__MACOSX"]
-            if len(candidates) == 1 and candidates[0].is_dir():
-                source = candidates[0]
-            else:
-                source = staging
-            _copy_contents(source, destination)
-    except zipfile.BadZipFile as error:
-        shutil.rmtree(destination, ignore_errors=True)
-        raise RuntimeError(f"Invalid zip archive at {zip_path}") from error
-    except Exception:
-        shutil.rmtree(destination, ignore_errors=True)
-        raise
-    index_path = destination / INDEX_FILENAME
-    if not index_path.exists():
-        shutil.rmtree(destination, ignore_errors=True)
-        raise RuntimeError(f"Extraction did not produce {index_path}")
+from lunbi.config import CHROMA_PATH, CHROMA_S3_BUCKET, CHROMA_S3_OBJECT, CHROMA_S3_PREFIX, INDEX_KEEP_VERSIONS
+from lunbi.services.index_distribution import (
+    DistributionError,
+    activate,
+    archive_version,
+    current_version_dir,
+    download_archive,
+    download_version,
+    fetch_manifest,
+    installed_version,
+    matches_manifest,
+    prune_versions,
+    s3_client,
+)
+
+
+def sync(force: bool, keep: int) -> str:
+    client = s3_client()
+    current = current_version_dir(CHROMA_PATH)
+    manifest = fetch_manifest(client, CHROMA_S3_BUCKET, CHROMA_S3_PREFIX)
+    if manifest is not None:
+        version = manifest["version"]
+        source = f"s3://{CHROMA_S3_BUCKET}/{CHROMA_S3_PREFIX}"
+        if not force and current is not None and matches_manifest(current, manifest):
+            return f"Index version {version} is current; skipping download."
+        target = download_version(manifest, CHROMA_PATH, client, CHROMA_S3_BUCKET, CHROMA_S3_PREFIX)
+    else:
+        version = archive_version(client, CHROMA_S3_BUCKET, CHROMA_S3_OBJECT)
+        source = f"s3://{CHROMA_S3_BUCKET}/{CHROMA_S3_OBJECT}"
+        if not force and current is not None and installed_version(current) == version:
+            return f"Index {version} is current; skipping download."
+        target = download_archive(client, CHROMA_S3_BUCKET, CHROMA_S3_OBJECT, CHROMA_PATH, version)
+
+    activate(CHROMA_PATH, target)
+    removed = prune_versions(CHROMA_PATH, keep)
+    message = f"Downloaded {version} from {source} to {target} and made it current"
+    if removed:
+        message += f"; removed {', '.join(removed)}"
+    return message + "."
 
 
 def main() -> int:
-    if chroma_exists():
-        print(f"Found {CHROMA_PATH / INDEX_FILENAME}; skipping download.")
-        return 0
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Download even if the version is already current (into a new directory, then switch to it)",
+    )
+    parser.add_argument("--keep", type=int, default=INDEX_KEEP_VERSIONS, help="Version directories to keep on disk")
+    args = parser.parse_args()
 
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        zip_path = Path(tmp_dir) / OBJECT_KEY
-        try:
-            download_zip(zip_path)
-            extract_zip(zip_path, CHROMA_PATH)
-        except RuntimeError as error:
-            print(str(error), file=sys.stderr)
-            return 1
-
-    print(f"Downloaded and extracted s3://{BUCKET_NAME}/{OBJECT_KEY} to {CHROMA_PATH}")
+    try:
+        print(sync(args.force, max(1, args.keep)))
+    except DistributionError as error:
+        print(str(error), file=sys.stderr)
+        return 1
     return 0
 
 
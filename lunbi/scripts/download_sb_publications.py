@@ -1,16 +1,30 @@
 # SB - Space Biology
+import argparse
+import json
 import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
+from urllib.parse import urlparse
 import csv
 
 import bs4
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from lunbi.config import DATA_PATH, PROJECT_ROOT
 
 BASE_DIR = Path(__file__).resolve().parent
 SRC_FILE = "SB_publication_PMC.csv"
 CSV_PATH = PROJECT_ROOT / "data" / SRC_FILE
+RAW_HTML_PATH = PROJECT_ROOT / "data" / "raw_html"
+MANIFEST_PATH = RAW_HTML_PATH / ".download_manifest.json"
+DEFAULT_PARSER = "html.parser"
+REQUEST_TIMEOUT = 30
 
 NEW_BASE_URL = "https://pmc.ncbi.nlm.nih.gov/articles/{article_id}/"
 headers = {
@@ -40,21 +54,23 @@ def section_to_markdown(section: dict, level: int = 1) -> str:
     Returns:
     - string with Markdown content
     """
-    md = ""
+    parts: list[str] = []
+    _append_section_markdown(section, level, parts)
+    return "".join(parts)
 
+
+def _append_section_markdown(section: dict, level: int, parts: list[str]) -> None:
     # Add section headers
     for header in section.get("headers", []):
-        md += f"{'#' * level + "#"} {header}\n\n"
+        parts.append(f"{'#' * (level + 1)} {header}\n\n")
 
     # Add paragraphs
     for para in section.get("paragraphs", []):
-        md += f"{para}\n\n"
+        parts.append(f"{para}\n\n")
 
     # Recurse into subsections
     for subsec in section.get("subsections", []):
-        md += section_to_markdown(subsec, level=level + 1)
-
-    return md
+        _append_section_markdown(subsec, level + 1, parts)
 
 
 def parse_section(section: bs4.element.Tag) -> dict:
@@ -91,37 +107,242 @@ def parse_section(section: bs4.element.Tag) -> dict:
 
 
 
-def main() -> None:
+def render_article_parts(title: str, html: str, parser: str = DEFAULT_PARSER) -> list[str]:
+    # Parse HTML; only the <article> subtree is needed, so skip building the rest of the page
+    soup = bs4.BeautifulSoup(html, parser, parse_only=bs4.SoupStrainer("article"))
+    article = soup.find("article")
+    metadata, content = article.find_all("section", recursive=False)
+    body = content.find("section", recursive=False, class_='body')
+    sections = body.find_all("section", recursive=False)
+
+    # To python dict
+    parsed_sections = [parse_section(section) for section in sections]
+
+    # To markdown
+    parts = ["# " + title.title() + "\n\n"]
+    for section in parsed_sections:
+        parts.append("\n")
+        _append_section_markdown(section, 1, parts)
+    return parts
+
+
+def render_article(title: str, html: str, parser: str = DEFAULT_PARSER) -> str:
+    return "".join(render_article_parts(title, html, parser))
+
+
+def render_file(title: str, raw_path: str, md_path: str, parser: str = DEFAULT_PARSER) -> str:
+    """Convert one cached HTML page to markdown; runs inside the render process pool."""
+    html = Path(raw_path).read_text(encoding="utf-8")
+    parts = render_article_parts(title, html, parser)
+    with open(md_path, "w", encoding="utf-8") as md_file:
+        md_file.writelines(parts)
+    return title
+
+
+def resolve_parser(name: str) -> str:
+    if name != "auto":
+        return name
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return "html.parser"
+    return "lxml"
+
+
+class HostThrottle:
+    """Caps in-flight requests per host and spaces request starts to a polite rate."""
+
+    def __init__(self, max_concurrency: int, requests_per_second: float) -> None:
+        self._max_concurrency = max_concurrency
+        self._interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._semaphores: dict[str, threading.Semaphore] = {}
+        self._next_start: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.Semaphore(self._max_concurrency))
+        with semaphore:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start + self._interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+def build_session(pool_size: int, retries: int) -> requests.Session:
+    retry = Retry(
+        total=retries,
+        backoff_factor=1.0,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def load_manifest() -> dict[str, dict[str, str]]:
+    if not MANIFEST_PATH.exists():
+        return {}
+    return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+
+
+def save_manifest(manifest: dict[str, dict[str, str]]) -> None:
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def article_paths(title: str) -> tuple[Path, Path]:
+    stem = to_snake_case(title)
+    return RAW_HTML_PATH / f"{stem}.html", DATA_PATH / f"{stem}.md"
+
+
+def download_article(
+    session: requests.Session,
+    throttle: HostThrottle,
+    title: str,
+    url: str,
+    cached: dict[str, str] | None,
+) -> tuple[str, dict[str, str] | None]:
+    """Fetch one article into the raw HTML cache, skipping it when the server reports it unchanged."""
+    article_id = url.strip("/").split("/")[-1]
+    url = NEW_BASE_URL.format(article_id=article_id)
+    raw_path, md_path = article_paths(title)
+
+    conditional_headers = {}
+    if cached and raw_path.exists():
+        if cached.get("etag"):
+            conditional_headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            conditional_headers["If-Modified-Since"] = cached["last_modified"]
+
+    with throttle.slot(url):
+        response = session.get(url, headers=conditional_headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        return "unchanged", cached
+    response.raise_for_status()
+
+    raw_path.write_text(response.text, encoding="utf-8")
+
+    entry = {"filename": md_path.name}
+    if response.headers.get("ETag"):
+        entry["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        entry["last_modified"] = response.headers["Last-Modified"]
+    return "downloaded", entry
+
+
+def read_rows() -> list[tuple[str, str]]:
     with CSV_PATH.open(newline="", encoding="utf-8") as csv_file:
         reader = csv.reader(csv_file)
         next(reader)  # skip header
-        for title, url in reader:
-            article_id = url.strip("/").split("/")[-1]
-            url = NEW_BASE_URL.format(article_id=article_id)
-            response = requests.get(url, headers=headers)
-
-            # Parse HTML
-            soup = bs4.BeautifulSoup(response.text, "html.parser")
-            article = soup.find("article")
-            metadata, content = article.find_all("section", recursive=False)
-            body = content.find("section", recursive=False, class_='body')
-            sections = body.find_all("section", recursive=False)
-
-            # To python dict
-            parsed_sections = [parse_section(section) for section in sections]
-
-            # To markdown
-            text = "# " + title.title() + "\n\n"
-            for section in parsed_sections:
-                text += "\n"
-                text += section_to_markdown(section)
-
-            filename = to_snake_case(title) + '.md'
-            path = DATA_PATH / filename
-            with open(path, "w", encoding="utf-8") as md_file:
-                md_file.write(text)
-
-            print(f"Downloaded article {title.title()}")
+        return [(title, url) for title, url in reader]
+
+
+def fetch(rows: list[tuple[str, str]], workers: int, per_host: int, rate: float, retries: int) -> set[str]:
+    """Network stage: refresh the raw HTML cache and return titles whose HTML changed."""
+    RAW_HTML_PATH.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+    session = build_session(pool_size=max(workers, per_host), retries=retries)
+    throttle = HostThrottle(per_host, rate)
+    counts = {"downloaded": 0, "unchanged": 0, "failed": 0}
+    changed: set[str] = set()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(download_article, session, throttle, title, url, manifest.get(url)): (title, url)
+                for title, url in rows
+            }
+            for future in as_completed(futures):
+                title, url = futures[future]
+                try:
+                    outcome, entry = future.result()
+                except Exception as error:
+                    counts["failed"] += 1
+                    print(f"Failed to download {title.title()}: {error}")
+                    continue
+                counts[outcome] += 1
+                if entry is not None:
+                    manifest[url] = entry
+                if outcome == "downloaded":
+                    changed.add(title)
+                    print(f"Downloaded article {title.title()}")
+    finally:
+        save_manifest(manifest)
+        session.close()
+
+    print(
+        f"Fetch finished: {counts['downloaded']} downloaded, {counts['unchanged']} unchanged, {counts['failed']} failed."
+    )
+    return changed
+
+
+def render(rows: list[tuple[str, str]], workers: int | None, parser: str, only: set[str] | None = None) -> None:
+    """Conversion stage: turn cached HTML into markdown across a process pool."""
+    DATA_PATH.mkdir(parents=True, exist_ok=True)
+    jobs = []
+    for title, _ in rows:
+        raw_path, md_path = article_paths(title)
+        if not raw_path.exists():
+            continue
+        if only is not None and title not in only and md_path.exists():
+            continue
+        jobs.append((title, str(raw_path), str(md_path)))
+
+    rendered = 0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_file, title, raw, md, parser): title for title, raw, md in jobs}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                rendered += 1
+            except Exception as error:
+                failed += 1
+                print(f"Failed to convert {futures[future].title()}: {error}")
+    print(f"Render finished: {rendered} converted, {failed} failed (parser={parser}).")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Download Space Biology publications as markdown")
+    parser.add_argument(
+        "stage",
+        nargs="?",
+        choices=["all", "fetch", "render"],
+        default="all",
+        help="fetch: refresh raw HTML only; render: rebuild all markdown from cached HTML; all: both",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Articles fetched in parallel")
+    parser.add_argument("--per-host", type=int, default=3, help="Maximum concurrent requests per host")
+    parser.add_argument("--rate", type=float, default=3.0, help="Maximum request starts per second per host")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--render-workers", type=int, default=None, help="Conversion processes (default: all cores)")
+    parser.add_argument(
+        "--parser",
+        choices=["auto", "html.parser", "lxml"],
+        default=DEFAULT_PARSER,
+        help="BeautifulSoup backend; auto picks lxml when it is installed",
+    )
+    args = parser.parse_args()
+
+    rows = read_rows()
+    html_parser = resolve_parser(args.parser)
+    if args.stage == "render":
+        render(rows, args.render_workers, html_parser)
+        return
+
+    changed = fetch(rows, args.workers, args.per_host, args.rate, args.retries)
+    if args.stage == "all":
+        render(rows, args.render_workers, html_parser, only=changed)
 
 
 if __name__ == "__main__":
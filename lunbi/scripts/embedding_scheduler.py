@@ -0,0 +1,208 @@
+"""Concurrent, rate-limited and resumable document embedding for index builds."""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+
+from lunbi.services.caching import SqliteCache
+
+logger = logging.getLogger("lunbi.embedding_scheduler")
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 3000
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_MAX_RETRIES = 8
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_CAP_SECONDS = 60.0
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English prose; good enough for budgeting.
+    return max(1, len(text) // 4)
+
+
+class RateLimiter:
+    """Token bucket refilled continuously up to a per-minute budget."""
+
+    def __init__(self, per_minute: float) -> None:
+        self._capacity = float(per_minute)
+        self._available = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> None:
+        amount = min(float(amount), self._capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._available = min(self._capacity, self._available + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._available >= amount:
+                    self._available -= amount
+                    return
+                wait = (amount - self._available) / self._rate
+            time.sleep(wait)
+
+
+class EmbeddingCheckpoint:
+    """Vectors of already-embedded chunks, keyed by chunk id, so an interrupted build can resume."""
+
+    def __init__(self, path: Path | str, model_name: str) -> None:
+        self._path = Path(path)
+        self._model_name = model_name
+        self._store = SqliteCache(self._path, table="chunk_embeddings")
+
+    def _key(self, chunk_id: str) -> str:
+        return f"{self._model_name}:{chunk_id}"
+
+    def get(self, chunk_id: str) -> list[float] | None:
+        raw = self._store.get(self._key(chunk_id))
+        return array("f", raw).tolist() if raw is not None else None
+
+    def put(self, chunk_id: str, vector: list[float]) -> None:
+        self._store.put(self._key(chunk_id), array("f", vector).tobytes())
+
+    def discard(self) -> None:
+        self._store.close()
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{self._path}{suffix}").unlink(missing_ok=True)
+
+
+def _transport_errors() -> tuple[type[Exception], ...]:
+    # Imported on the first failure only; the clients are already loaded by then.
+    errors: list[type[Exception]] = [ConnectionError, TimeoutError]
+    try:
+        import httpx
+
+        errors.append(httpx.TransportError)
+    except ImportError:
+        pass
+    try:
+        import openai
+
+        errors.append(openai.APIConnectionError)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors and dropped connections; anything else is a bug or a bad request."""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, _transport_errors())
+
+
+def _retry_after(error: Exception) -> float | None:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class EmbeddingScheduler:
+    """Embeds documents in concurrent batches under request and token budgets.
+
+    Failed batches are retried with full-jitter exponential backoff (honouring
+    `Retry-After` when the provider sends one). Each finished batch is written to the
+    checkpoint, so re-running after an interruption only embeds what is missing.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        checkpoint: EmbeddingCheckpoint | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ) -> None:
+        self._embeddings = embeddings
+        self._checkpoint = checkpoint
+        self._batch_size = batch_size
+        self._concurrency = concurrency
+        self._request_limiter = RateLimiter(requests_per_minute)
+        self._token_limiter = RateLimiter(tokens_per_minute)
+        self._max_retries = max_retries
+
+    def discard_checkpoint(self) -> None:
+        if self._checkpoint is not None:
+            self._checkpoint.discard()
+            self._checkpoint = None
+
+    def embed(self, ids: list[str], texts: list[str]) -> list[list[float]]:
+        vectors: dict[str, list[float]] = {}
+        pending: list[tuple[str, str]] = []
+        for chunk_id, text in zip(ids, texts):
+            cached = self._checkpoint.get(chunk_id) if self._checkpoint else None
+            if cached is not None:
+                vectors[chunk_id] = cached
+            else:
+                pending.append((chunk_id, text))
+        if vectors:
+            print(f"Resuming from checkpoint: {len(vectors)} of {len(ids)} chunks already embedded.")
+
+        batches = [pending[start : start + self._batch_size] for start in range(0, len(pending), self._batch_size)]
+        started = time.perf_counter()
+        done = 0
+        with ThreadPoolExecutor(max_workers=self._concurrency, thread_name_prefix="embed") as pool:
+            futures = [pool.submit(self._embed_batch, batch) for batch in batches]
+            try:
+                for future in as_completed(futures):
+                    for chunk_id, vector in future.result():
+                        vectors[chunk_id] = vector
+                        done += 1
+                    elapsed = time.perf_counter() - started
+                    print(f"Embedded {done}/{len(pending)} chunks ({done / elapsed if elapsed else 0:.1f} chunks/s)")
+            except BaseException:
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+
+        elapsed = time.perf_counter() - started
+        if pending:
+            print(f"Embedded {len(pending)} chunks in {elapsed:.1f}s ({len(pending) / elapsed:.1f} chunks/s).")
+        return [vectors[chunk_id] for chunk_id in ids]
+
+    def _embed_batch(self, batch: list[tuple[str, str]]) -> list[tuple[str, list[float]]]:
+        texts = [text for _, text in batch]
+        tokens = sum(estimate_tokens(text) for text in texts)
+        for attempt in range(self._max_retries + 1):
+            self._request_limiter.acquire()
+            self._token_limiter.acquire(tokens)
+            try:
+                vectors = self._embeddings.embed_documents(texts)
+                break
+            except Exception as error:
+                if attempt >= self._max_retries or not _is_retryable(error):
+                    raise
+                delay = _retry_after(error)
+                if delay is None:
+                    delay = random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt))
+                logger.warning("Embedding batch failed (%s); retrying in %.1fs", error, delay)
+                time.sleep(delay)
+
+        results = list(zip((chunk_id for chunk_id, _ in batch), vectors))
+        if self._checkpoint is not None:
+            for chunk_id, vector in results:
+                self._checkpoint.put(chunk_id, vector)
+        return results
+
+
+__all__ = ["EmbeddingCheckpoint", "EmbeddingScheduler", "RateLimiter", "estimate_tokens"]
@@ -0,0 +1,120 @@
+"""Compare recall and latency of the retrieval modes on a labeled non-English query set.
+
+Each line of the dataset is a JSON object with the query text and the markdown filenames
+that answer it, e.g. ``{"query": "Jak ...?", "relevant": ["some_article.md"]}``. The script
+queries the local Chroma index with the configured embeddings and real OpenAI translations;
+caches are bypassed so latencies reflect cold requests. ``--search-mode hybrid`` adds the
+BM25 index (and its keyword fast path) to every mode.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+from lunbi.config import CHROMA_PATH, PROJECT_ROOT
+from lunbi.services.assistant_service import SEARCH_K, SEARCH_MODES, AssistantService
+from lunbi.services.embeddings import build_embeddings, current_embedding_spec
+from lunbi.services.prompt_service import RETRIEVAL_MODES
+from lunbi.services.translation_service import TranslationService
+from lunbi.services.vector_store import VectorStoreHandle
+
+load_dotenv()
+
+DEFAULT_DATASET = PROJECT_ROOT / "data" / "eval" / "retrieval_pl.jsonl"
+
+
+def load_dataset(path: Path) -> list[dict[str, Any]]:
+    with path.open(encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def retrieve(
+    mode: str,
+    query: str,
+    language: str,
+    assistant: AssistantService,
+    translator: TranslationService,
+    pool: concurrent.futures.ThreadPoolExecutor,
+) -> list[str]:
+    """Mirror of `PromptService._plan_query` followed by the assistant's search."""
+    if mode == "translate":
+        results = assistant.retrieve(translator.translate(query, "en", language))  # type: ignore[arg-type]
+    elif mode == "direct":
+        results = assistant.retrieve(query)
+    else:
+        translation = pool.submit(translator.translate, query, "en", language)
+        results = assistant.retrieve(query, translation=translation)
+    return [Path(doc.metadata.get("source", "")).name for doc, _ in results]
+
+
+def score(retrieved: list[str], relevant: set[str]) -> tuple[float, float]:
+    """Recall and reciprocal rank of the first relevant file within the retrieved list."""
+    unique = list(dict.fromkeys(retrieved))
+    recall = len(relevant.intersection(unique)) / len(relevant)
+    rank = next((position for position, name in enumerate(unique, start=1) if name in relevant), None)
+    return recall, 1 / rank if rank else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dataset", type=Path, default=DEFAULT_DATASET)
+    parser.add_argument("--language", default="pl")
+    parser.add_argument("--modes", nargs="+", choices=RETRIEVAL_MODES, default=list(RETRIEVAL_MODES))
+    parser.add_argument("--search-mode", choices=SEARCH_MODES, default="dense")
+    parser.add_argument("--output", type=Path, help="Write per-mode summaries as JSON")
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.dataset)
+    spec = current_embedding_spec()
+    handle = VectorStoreHandle(persist_directory=CHROMA_PATH, embedding_function=build_embeddings(spec), embedding_spec=spec)
+    assistant = AssistantService(vector_store=handle, answer_cache=None, search_mode=args.search_mode)
+    translator = TranslationService(cache_size=0, cache_path=None)
+    handle.get()
+
+    summaries: dict[str, dict[str, float]] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="translate") as pool:
+        for mode in args.modes:
+            recalls: list[float] = []
+            reciprocal_ranks: list[float] = []
+            latencies: list[float] = []
+            for item in dataset:
+                started = time.perf_counter()
+                retrieved = retrieve(mode, item["query"], args.language, assistant, translator, pool)
+                latencies.append((time.perf_counter() - started) * 1000)
+                recall, reciprocal_rank = score(retrieved, set(item["relevant"]))
+                recalls.append(recall)
+                reciprocal_ranks.append(reciprocal_rank)
+
+            summaries[mode] = {
+                f"recall@{SEARCH_K}": statistics.fmean(recalls),
+                "mrr": statistics.fmean(reciprocal_ranks),
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "mean_ms": statistics.fmean(latencies),
+            }
+
+    print(f"{len(dataset)} queries from {args.dataset} ({spec.describe()}, {args.search_mode} search)")
+    for mode, summary in summaries.items():
+        print(
+            f"{mode:>9}: recall@{SEARCH_K}={summary[f'recall@{SEARCH_K}']:.3f} mrr={summary['mrr']:.3f} "
+            f"p50={summary['p50_ms']:.0f}ms p95={summary['p95_ms']:.0f}ms"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(summaries, indent=2), encoding="utf-8")
+    handle.close()
+
+
+if __name__ == "__main__":
+    main()
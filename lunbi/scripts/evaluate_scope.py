@@ -0,0 +1,149 @@
+"""Compare the out-of-scope pre-check with the MIN_RELEVANCE_SCORE decision it short-circuits.
+
+The baseline is today's behavior: search the top SEARCH_K chunks and treat the query as out of
+scope when the best relevance is below MIN_RELEVANCE_SCORE. The pre-check decides from the scope
+model stored with the index. For each ``--min-margin`` cutoff (LUNBI_SCOPE_MIN_MARGIN_DEGREES) the
+report shows how many out-of-scope queries skip the search and how many answerable queries the
+pre-check would wrongly turn away, then recommends the largest cutoff that turns none away. The
+latency of both decisions is reported as well.
+
+Each line of the dataset is a JSON object such as ``{"query": "What's the weather?", "in_scope": false}``;
+``in_scope`` is optional and adds accuracy against those labels. Without a dataset, the scope hints
+(in scope) and a few everyday questions (out of scope) are used.
+"""
+
+import argparse
+import json
+import math
+import statistics
+import time
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+from lunbi.config import CHROMA_PATH, MIN_RELEVANCE_SCORE
+from lunbi.services.assistant_service import SCOPE_HINTS, SEARCH_K
+from lunbi.services.embeddings import build_embeddings, current_embedding_spec
+from lunbi.services.vector_store import VectorStoreHandle
+
+load_dotenv()
+
+OFF_TOPIC_QUERIES = [
+    "What's the weather in Warsaw tomorrow?",
+    "Give me a recipe for pierogi.",
+    "Who won the last football world cup?",
+    "How do I reset my router password?",
+    "Recommend a good thriller movie.",
+    "What is the capital of Australia?",
+    "How do I write a for loop in JavaScript?",
+    "What are the best stocks to buy this year?",
+    "Jaka będzie jutro pogoda w Krakowie?",
+    "Tell me a joke about cats.",
+]
+
+
+def load_dataset(path: Path | None) -> list[dict[str, Any]]:
+    if path is None:
+        return [{"query": query, "in_scope": True} for query in SCOPE_HINTS] + [
+            {"query": query, "in_scope": False} for query in OFF_TOPIC_QUERIES
+        ]
+    with path.open(encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path)
+    parser.add_argument("--min-margin", type=float, nargs="+", default=[0.0, 5.0, 10.0, 15.0, 20.0], help="Degrees")
+    parser.add_argument("--output", type=Path, help="Write per-cutoff summaries as JSON")
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.dataset)
+    spec = current_embedding_spec()
+    handle = VectorStoreHandle(persist_directory=CHROMA_PATH, embedding_function=build_embeddings(spec), embedding_spec=spec)
+    db = handle.get()
+    scope = handle.scope()
+    if scope is None:
+        raise SystemExit(f"No scope model in {CHROMA_PATH}; rebuild the index with create_index_db")
+    relevance_fn = db._select_relevance_score_fn()
+
+    embeddings = db.embeddings.embed_documents([item["query"] for item in dataset])
+    answerable: list[bool] = []
+    margins: list[float] = []
+    search_ms: list[float] = []
+    precheck_ms: list[float] = []
+    for embedding in embeddings:
+        started = time.perf_counter()
+        results = db.similarity_search_by_vector_with_relevance_scores(embedding, k=SEARCH_K)
+        search_ms.append((time.perf_counter() - started) * 1000)
+        top_score = max((relevance_fn(distance) for _, distance in results), default=0.0)
+        answerable.append(top_score >= MIN_RELEVANCE_SCORE)
+
+        started = time.perf_counter()
+        margins.append(math.degrees(scope.margin(embedding, MIN_RELEVANCE_SCORE)))
+        precheck_ms.append((time.perf_counter() - started) * 1000)
+
+    labels = [item.get("in_scope") for item in dataset]
+    labeled = [index for index, label in enumerate(labels) if label is not None]
+    baseline_out = answerable.count(False)
+    # Just below the smallest margin of a query the search answers (floored to a tenth of a degree).
+    answerable_margins = [margin for margin, passes in zip(margins, answerable) if passes]
+    recommended = max(0.0, math.floor(min(answerable_margins) * 10) / 10) if answerable_margins else 0.0
+
+    summaries: dict[str, dict[str, float]] = {}
+    for cutoff in sorted({*args.min_margin, recommended}):
+        rejected = [margin < cutoff for margin in margins]
+        summary: dict[str, float] = {
+            "skipped_searches": sum(rejected),
+            "skipped_share_of_baseline_out": sum(r and not a for r, a in zip(rejected, answerable)) / baseline_out
+            if baseline_out
+            else 0.0,
+            "wrongly_rejected": sum(r and a for r, a in zip(rejected, answerable)),
+        }
+        if labeled:
+            # With the pre-check in front, a query is answered only if it passes both checks.
+            summary["accuracy"] = statistics.fmean(
+                (answerable[index] and not rejected[index]) == labels[index] for index in labeled
+            )
+        summaries[f"{cutoff:g}"] = summary
+
+    print(f"{len(dataset)} queries, {scope.clusters} clusters over {scope.chunks} chunks ({spec.describe()})")
+    print(
+        f"baseline (top-{SEARCH_K} search, MIN_RELEVANCE_SCORE={MIN_RELEVANCE_SCORE}): "
+        f"{baseline_out} out of scope, p50={percentile(search_ms, 50):.2f}ms p95={percentile(search_ms, 95):.2f}ms"
+    )
+    if labeled:
+        accuracy = statistics.fmean(answerable[index] == labels[index] for index in labeled)
+        print(f"baseline accuracy against labels: {accuracy:.3f}")
+    print(f"pre-check: p50={percentile(precheck_ms, 50):.3f}ms p95={percentile(precheck_ms, 95):.3f}ms")
+    for cutoff, summary in summaries.items():
+        line = (
+            f"min margin {cutoff:>4}°: skipped {summary['skipped_searches']:.0f} searches "
+            f"({summary['skipped_share_of_baseline_out']:.0%} of baseline out-of-scope), "
+            f"wrongly rejected {summary['wrongly_rejected']:.0f}"
+        )
+        if "accuracy" in summary:
+            line += f", accuracy {summary['accuracy']:.3f}"
+        print(line)
+    print(f"recommended LUNBI_SCOPE_MIN_MARGIN_DEGREES={recommended:g} (largest cutoff that rejects no answerable query)")
+    if args.output:
+        report = {
+            "baseline_out": baseline_out,
+            "search_p50_ms": percentile(search_ms, 50),
+            "precheck_p50_ms": percentile(precheck_ms, 50),
+            "recommended_min_margin_degrees": recommended,
+            "min_margin": summaries,
+        }
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    handle.close()
+
+
+if __name__ == "__main__":
+    main()
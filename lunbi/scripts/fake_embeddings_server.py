@@ -0,0 +1,105 @@
+"""Serve deterministic OpenAI-compatible embeddings locally for index-build testing.
+
+Point the index build at it with
+``OPENAI_API_BASE=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python -m lunbi.scripts.create_index_db``.
+"""
+
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+
+def fake_vector(value: Any, dimensions: int) -> list[float]:
+    seed = hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).digest()
+    raw = b"".join(hashlib.sha256(seed + index.to_bytes(4, "big")).digest() for index in range((dimensions * 4 + 31) // 32))
+    values = [(byte - 127.5) / 127.5 for byte in raw[:dimensions]]
+    norm = sum(item * item for item in values) ** 0.5 or 1.0
+    return [item / norm for item in values]
+
+
+def build_handler(dimensions: int, latency: float, rate_limit_every: int) -> type[BaseHTTPRequestHandler]:
+    counter = itertools.count(1)
+    lock = threading.Lock()
+
+    class FakeEmbeddingsHandler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:  # noqa: N802 - http.server naming
+            if not self.path.rstrip("/").endswith("/embeddings"):
+                self._reply(404, {"error": {"message": "not found"}})
+                return
+            with lock:
+                request_number = next(counter)
+            if rate_limit_every and request_number % rate_limit_every == 0:
+                self._reply(429, {"error": {"message": "rate limited", "type": "rate_limit_exceeded"}}, {"Retry-After": "0.2"})
+                return
+
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+            inputs = payload.get("input", [])
+            if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                inputs = [inputs]
+            if latency:
+                time.sleep(latency)
+
+            data = []
+            for index, item in enumerate(inputs):
+                vector = fake_vector(item, dimensions)
+                if payload.get("encoding_format") == "base64":
+                    embedding: Any = base64.b64encode(struct.pack(f"<{dimensions}f", *vector)).decode("ascii")
+                else:
+                    embedding = vector
+                data.append({"object": "embedding", "index": index, "embedding": embedding})
+            tokens = sum(len(json.dumps(item)) // 4 for item in inputs)
+            self._reply(
+                200,
+                {
+                    "object": "list",
+                    "data": data,
+                    "model": payload.get("model", "fake"),
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                },
+            )
+
+        def _reply(self, status: int, body: dict[str, Any], headers: dict[str, str] | None = None) -> None:
+            encoded = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - http.server signature
+            return
+
+    return FakeEmbeddingsHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local fake OpenAI embeddings endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds to sleep per request")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with HTTP 429")
+    args = parser.parse_args()
+
+    handler = build_handler(args.dimensions, args.latency, args.rate_limit_every)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Fake embeddings server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
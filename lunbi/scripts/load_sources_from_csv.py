@@ -3,62 +3,104 @@
 import argparse
 import csv
 import logging
+from itertools import islice
 from pathlib import Path
+from typing import Iterable, Iterator
 
 from lunbi.database import session_scope
-from lunbi.repositories.source_repository import SourceRepository
-from lunbi.services.article_metadata_service import to_snake_case
+from lunbi.repositories.source_repository import SourceRepository, SourceRow
+from lunbi.services.article_metadata_service import bump_source_index_version, to_snake_case
 
 logger = logging.getLogger("lunbi.load_sources")
 
+DEFAULT_CHUNK_SIZE = 1000
 
-def load_sources(csv_path: Path) -> None:
+
+def _resolve_columns(fieldnames: Iterable[str] | None) -> tuple[str, str]:
+    title_key = None
+    url_key = None
+    for field in fieldnames or []:
+        lowered = field.lower().lstrip("﻿")
+        if lowered == "title":
+            title_key = field
+        elif lowered in {"link", "url"}:
+            url_key = field
+    if title_key is None or url_key is None:
+        raise ValueError("CSV must contain Title and Link columns")
+    return title_key, url_key
+
+
+def _chunks(reader: Iterator[dict[str, str]], size: int) -> Iterator[list[dict[str, str]]]:
+    while chunk := list(islice(reader, size)):
+        yield chunk
+
+
+def load_sources(csv_path: Path, bulk: bool = True, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
     csv_path = csv_path.expanduser().resolve()
     logger.info("Loading sources from %s", csv_path)
 
     created = 0
     updated = 0
+    unchanged = 0
     skipped = 0
 
     with csv_path.open(encoding="utf-8-sig", newline="") as handle, session_scope() as session:
         reader = csv.DictReader(handle)
-        title_key = None
-        url_key = None
-        for field in reader.fieldnames or []:
-            lowered = field.lower().lstrip("﻿")
-            if lowered == "title":
-                title_key = field
-            elif lowered in {"link", "url"}:
-                url_key = field
-        if title_key is None or url_key is None:
-            raise ValueError("CSV must contain Title and Link columns")
+        title_key, url_key = _resolve_columns(reader.fieldnames)
 
         repository = SourceRepository(session)
-
-        for row in reader:
-            title = (row.get(title_key) or "").strip()
-            url = (row.get(url_key) or "").strip()
-            if not title or not url:
-                skipped += 1
+        if bulk and not repository.supports_bulk_upsert():
+            logger.warning("Bulk upsert needs PostgreSQL; falling back to row-by-row import")
+            bulk = False
+
+        for chunk in _chunks(reader, chunk_size):
+            rows: dict[str, SourceRow] = {}
+            for row in chunk:
+                title = (row.get(title_key) or "").strip()
+                url = (row.get(url_key) or "").strip()
+                if not title or not url:
+                    continue
+                md_filename = f"{to_snake_case(title)}.md"
+                rows.pop(md_filename, None)
+                rows[md_filename] = SourceRow(title=title, url=url, md_filename=md_filename)
+
+            # A statement may touch each key only once, so keep the last row per filename and per URL;
+            # incomplete rows and superseded duplicates are reported as skipped.
+            batch = list({row.url: row for row in rows.values()}.values())
+            skipped += len(chunk) - len(batch)
+
+            if bulk:
+                result = repository.bulk_upsert(batch)
+                created += result.created
+                updated += result.updated
+                unchanged += result.unchanged
                 continue
 
-            md_filename = f"{to_snake_case(title)}.md"
-
-            existing = repository.get_by_md_filename(md_filename)
-            snapshot = None
-            if existing:
-                snapshot = (existing.title, existing.url)
-
-            source = repository.upsert(title=title, url=url, md_filename=md_filename)
-            if existing is None:
-                created += 1
-            elif snapshot != (source.title, source.url):
-                updated += 1
-
+            for source_row in batch:
+                existing = repository.get_by_md_filename(source_row.md_filename)
+                snapshot = None
+                if existing:
+                    snapshot = (existing.title, existing.url)
+
+                source = repository.upsert(
+                    title=source_row.title,
+                    url=source_row.url,
+                    md_filename=source_row.md_filename,
+                )
+                if existing is None:
+                    created += 1
+                elif snapshot != (source.title, source.url):
+                    updated += 1
+                else:
+                    unchanged += 1
+
+    version = bump_source_index_version()
+    logger.info("Source index version bumped to %s; API workers will reload their source maps", version)
     logger.info(
-        "Source import finished -> created: %s, updated: %s, skipped: %s",
+        "Source import finished -> created: %s, updated: %s, unchanged: %s, skipped: %s",
         created,
         updated,
+        unchanged,
         skipped,
     )
 
@@ -66,8 +108,10 @@ def load_sources(csv_path: Path) -> None:
 def main() -> None:
     parser = argparse.ArgumentParser(description="Load sources into the database")
     parser.add_argument("csv_path", type=Path)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="CSV rows per upsert statement")
+    parser.add_argument("--row-by-row", action="store_true", help="Upsert each row individually instead of in bulk")
     args = parser.parse_args()
-    load_sources(args.csv_path)
+    load_sources(args.csv_path, bulk=not args.row_by_row, chunk_size=args.chunk_size)
 
 
 if __name__ == "__main__":
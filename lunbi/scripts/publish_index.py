@@ -0,0 +1,43 @@
+"""Publish the local Chroma index to S3 as a new version for download_s3_file.
+
+Every file of the index is uploaded under ``<prefix>/<version>/`` (large files as parallel
+multipart uploads), then ``<prefix>/manifest.json`` is replaced to point at the new version. The
+version is the marker create_index_db writes, so rebuild or update the index before publishing.
+"""
+
+import argparse
+import sys
+
+from lunbi.config import CHROMA_PATH, CHROMA_S3_BUCKET, CHROMA_S3_PREFIX
+from lunbi.services.index_distribution import DistributionError, fetch_manifest, publish_index, s3_client
+from lunbi.services.vector_store import read_index_version, resolve_index_path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="Upload even if the bucket already serves this version")
+    args = parser.parse_args()
+
+    index_dir = resolve_index_path(CHROMA_PATH)
+    version = read_index_version(index_dir)
+    client = s3_client()
+    try:
+        published = fetch_manifest(client, CHROMA_S3_BUCKET, CHROMA_S3_PREFIX)
+        if not args.force and published is not None and published["version"] == version:
+            print(f"s3://{CHROMA_S3_BUCKET}/{CHROMA_S3_PREFIX} already serves {version}; nothing to publish.")
+            return 0
+        manifest = publish_index(index_dir, client, CHROMA_S3_BUCKET, CHROMA_S3_PREFIX)
+    except DistributionError as error:
+        print(str(error), file=sys.stderr)
+        return 1
+
+    size = sum(entry["size"] for entry in manifest["files"])
+    print(
+        f"Published {version} ({len(manifest['files'])} files, {size / 1024 / 1024:.1f} MiB) "
+        f"to s3://{CHROMA_S3_BUCKET}/{CHROMA_S3_PREFIX}."
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
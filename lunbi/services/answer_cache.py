@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import datetime
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Iterator, Sequence
+
+import numpy as np
+
+from lunbi.config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_PERSISTENT,
+    ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_TTL_SECONDS,
+)
+from lunbi.enums import PromptStatus
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+    from lunbi.repositories.answer_cache_repository import AnswerCacheRepository
+
+logger = logging.getLogger("lunbi.answer_cache")
+
+CACHEABLE_STATUSES = {PromptStatus.SUCCESS, PromptStatus.OUT_OF_CONTEXT}
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def hash_query(text: str) -> str:
+    return hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+
+
+def _unit_vector(embedding: Sequence[float] | np.ndarray) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    query: str
+    answer: str
+    sources: tuple[str, ...]
+    status: PromptStatus
+
+
+@dataclass
+class _Entry:
+    answer: CachedAnswer
+    language: str
+    vector: np.ndarray
+    expires_at: float
+
+
+class AnswerCache:
+    """Two-tier semantic cache of generated answers keyed by query embedding and language.
+
+    Tier one is a per-process LRU matched by cosine similarity. Tier two is the shared
+    ``answer_cache`` table matched by the hash of the normalised query, so replicas can
+    reuse each other's answers. Entries are scoped to the index version that produced them.
+
+    ``generation`` orders the opened index versions of this process (see ``IndexGeneration``).
+    Requests still draining on a version that a newer generation replaced neither read nor
+    write the cache, so they cannot move it back to their version.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS,
+        persistent: bool = ANSWER_CACHE_PERSISTENT,
+        session_factory: Callable[[], AbstractContextManager[Session]] | None = None,
+    ) -> None:
+        self._similarity_threshold = similarity_threshold
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._session_factory = session_factory
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+        self._matrices: dict[str, tuple[list[tuple[str, str]], np.ndarray]] = {}
+        self._index_version: str | None = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="answer-cache") if persistent else None
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def lookup(
+        self,
+        query: str,
+        language: str,
+        embedding: Sequence[float],
+        index_version: str,
+        generation: int = 0,
+    ) -> CachedAnswer | None:
+        vector = _unit_vector(embedding)
+        with self._lock:
+            if not self._sync_version(index_version, generation):
+                self.misses += 1
+                return None
+            cached = self._lookup_memory(language, vector)
+            if cached is not None:
+                self.memory_hits += 1
+                return cached
+
+        if self._writer is not None:
+            cached = self._lookup_shared(query, language, index_version)
+            if cached is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                return cached
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(
+        self,
+        query: str,
+        language: str,
+        embedding: Sequence[float],
+        index_version: str,
+        answer: str,
+        sources: Sequence[str],
+        status: PromptStatus,
+        generation: int = 0,
+    ) -> None:
+        if status not in CACHEABLE_STATUSES or not answer:
+            return
+        vector = _unit_vector(embedding)
+        cached = CachedAnswer(query=query, answer=answer, sources=tuple(sources), status=status)
+        with self._lock:
+            if not self._sync_version(index_version, generation):
+                return
+            self._insert(hash_query(query), language, cached, vector)
+
+        if self._writer is not None:
+            self._writer.submit(self._store_shared, cached, language, vector, index_version)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+
+    def _sync_version(self, index_version: str, generation: int) -> bool:
+        """Whether `index_version` is the current version, switching to it if it comes from a newer generation."""
+        if self._index_version == index_version:
+            self._generation = max(self._generation, generation)
+            return True
+        if generation < self._generation:
+            return False
+        previous = self._index_version
+        if previous is not None:
+            logger.info(
+                "Index version changed (%s -> %s); dropping %s cached answers",
+                previous,
+                index_version,
+                len(self._entries),
+            )
+            if self._writer is not None:
+                self._writer.submit(self._prune_shared, previous, index_version)
+        self._entries.clear()
+        self._matrices.clear()
+        self._index_version = index_version
+        self._generation = generation
+        return True
+
+    def _lookup_memory(self, language: str, vector: np.ndarray) -> CachedAnswer | None:
+        keys, matrix = self._matrix_for(language)
+        if not keys:
+            return None
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        if float(similarities[best]) < self._similarity_threshold:
+            return None
+        key = keys[best]
+        entry = self._entries[key]
+        if entry.expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.answer
+
+    def _matrix_for(self, language: str) -> tuple[list[tuple[str, str]], np.ndarray]:
+        cached = self._matrices.get(language)
+        if cached is None:
+            keys = [key for key, entry in self._entries.items() if entry.language == language]
+            vectors = [self._entries[key].vector for key in keys]
+            matrix = np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+            cached = (keys, matrix)
+            self._matrices[language] = cached
+        return cached
+
+    def _insert(self, query_hash: str, language: str, cached: CachedAnswer, vector: np.ndarray) -> None:
+        key = (language, query_hash)
+        self._entries.pop(key, None)
+        self._entries[key] = _Entry(
+            answer=cached,
+            language=language,
+            vector=vector,
+            expires_at=time.monotonic() + self._ttl_seconds,
+        )
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        self._matrices.clear()
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        self._entries.pop(key, None)
+        self._matrices.clear()
+
+    @contextmanager
+    def _repository(self) -> Iterator[AnswerCacheRepository]:
+        # SQLAlchemy and the models are imported on first use of the shared tier.
+        from lunbi.repositories.answer_cache_repository import AnswerCacheRepository
+
+        if self._session_factory is None:
+            from lunbi.database import session_scope
+
+            self._session_factory = session_scope
+        with self._session_factory() as session:
+            yield AnswerCacheRepository(session)
+
+    def _lookup_shared(self, query: str, language: str, index_version: str) -> CachedAnswer | None:
+        query_hash = hash_query(query)
+        created_after = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=self._ttl_seconds)
+        try:
+            with self._repository() as repository:
+                entry = repository.get(query_hash, language, index_version, created_after)
+                if entry is None:
+                    return None
+                cached = CachedAnswer(
+                    query=entry.query,
+                    answer=entry.answer,
+                    sources=tuple(entry.sources or []),
+                    status=entry.status,
+                )
+                vector = np.frombuffer(entry.embedding, dtype=np.float32).copy()
+        except Exception:
+            logger.warning("Shared answer cache lookup failed", exc_info=True)
+            return None
+
+        with self._lock:
+            if self._index_version == index_version:
+                self._insert(query_hash, language, cached, vector)
+        return cached
+
+    def _store_shared(self, cached: CachedAnswer, language: str, vector: np.ndarray, index_version: str) -> None:
+        try:
+            with self._repository() as repository:
+                repository.upsert(
+                    query_hash=hash_query(cached.query),
+                    language=language,
+                    index_version=index_version,
+                    query=cached.query,
+                    answer=cached.answer,
+                    sources=list(cached.sources),
+                    status=cached.status,
+                    embedding=vector.astype(np.float32).tobytes(),
+                )
+        except Exception:
+            logger.warning("Shared answer cache write failed", exc_info=True)
+
+    def _prune_shared(self, retired_version: str, current_version: str) -> None:
+        # Other workers may still serve the retired version for a reload interval, or already serve a
+        # newer one, so only the version this worker left and entries past their TTL are deleted.
+        expired_before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=self._ttl_seconds)
+        try:
+            with self._repository() as repository:
+                removed = repository.delete_stale_versions(retired_version, current_version, expired_before)
+            logger.info("Pruned %s shared cache entries from previous index versions", removed)
+        except Exception:
+            logger.warning("Shared answer cache prune failed", exc_info=True)
+
+
+_shared_cache: AnswerCache | None = None
+_shared_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache | None:
+    """Return the process-wide answer cache, or None when caching is disabled."""
+    global _shared_cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = AnswerCache()
+    return _shared_cache
+
+
+def close_answer_cache() -> None:
+    global _shared_cache
+    with _shared_lock:
+        cache, _shared_cache = _shared_cache, None
+    if cache is not None:
+        cache.close()
+
+
+__all__ = [
+    "AnswerCache",
+    "CachedAnswer",
+    "close_answer_cache",
+    "get_answer_cache",
+    "hash_query",
+    "normalize_query",
+]
@@ -1,47 +1,176 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, NamedTuple
 
+from lunbi.config import SOURCE_INDEX_TTL_SECONDS, SOURCE_INDEX_VERSION_PATH
+from lunbi.database import session_scope
 from lunbi.repositories.source_repository import SourceRepository
 
+logger = logging.getLogger("lunbi.article_metadata")
+
+# How often the version file is re-read; between checks lookups touch neither disk nor the database.
+VERSION_CHECK_SECONDS = 1.0
+
 
 @dataclass(frozen=True)
 class ArticleMetadata:
     title: str
     url: str
     path: Path
+    source_id: int | None = None
+
+
+class SourceRef(NamedTuple):
+    id: int
+    title: str
+    url: str
+
+
+def read_source_index_version(path: Path = SOURCE_INDEX_VERSION_PATH) -> int:
+    try:
+        return int(path.read_text(encoding="utf-8").strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_source_index_version(path: Path = SOURCE_INDEX_VERSION_PATH) -> int:
+    """Increment the version counter so every worker reading `path` reloads its source index.
+
+    The counter is a file, so only workers that see the same filesystem notice the bump; others
+    reload once their index is older than SOURCE_INDEX_TTL_SECONDS.
+    """
+    version = read_source_index_version(path) + 1
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(str(version), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return version
+
+
+def load_source_refs() -> dict[str, SourceRef]:
+    with session_scope() as session:
+        rows = SourceRepository(session).list_index_rows()
+    return {md_filename: SourceRef(source_id, title, url) for md_filename, source_id, title, url in rows}
+
+
+class SourceIndex:
+    """Process-wide md_filename -> (id, title, url) map loaded with a single query.
+
+    The map is reloaded when it is older than `ttl_seconds` or when the version counter
+    in `version_path` moves (see `bump_source_index_version`). The counter is host-local
+    unless `version_path` is on shared storage. Lookups in between are plain dict reads.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], dict[str, SourceRef]] = load_source_refs,
+        ttl_seconds: float = SOURCE_INDEX_TTL_SECONDS,
+        version_path: Path = SOURCE_INDEX_VERSION_PATH,
+    ) -> None:
+        self._loader = loader
+        self._ttl_seconds = ttl_seconds
+        self._version_path = version_path
+        self._refs: dict[str, SourceRef] = {}
+        self._version: int | None = None
+        self._loaded_at: float | None = None
+        self._checked_at = 0.0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    @property
+    def version(self) -> int | None:
+        return self._version
+
+    def get(self, md_filename: str) -> SourceRef | None:
+        return self._mapping().get(md_filename)
+
+    def items(self) -> Iterable[tuple[str, SourceRef]]:
+        return self._mapping().items()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _is_fresh(self, now: float) -> bool:
+        return self._loaded_at is not None and now - self._loaded_at < self._ttl_seconds
+
+    def _mapping(self) -> dict[str, SourceRef]:
+        now = time.monotonic()
+        if self._is_fresh(now) and now - self._checked_at < VERSION_CHECK_SECONDS:
+            return self._refs
+
+        with self._lock:
+            now = time.monotonic()
+            if now < self._retry_at:
+                return self._refs
+            version = read_source_index_version(self._version_path)
+            self._checked_at = now
+            if self._is_fresh(now) and version == self._version:
+                return self._refs
+            try:
+                refs = self._loader()
+            except Exception:
+                # Keep serving the previous map and back off instead of querying on every request.
+                logger.exception("Failed to load the source index")
+                self._retry_at = now + VERSION_CHECK_SECONDS
+                return self._refs
+            self._refs = refs
+            self._version = version
+            self._loaded_at = now
+            self.loads += 1
+            logger.info("Loaded %s sources into the source index (version %s)", len(refs), version)
+            return refs
+
+
+_shared_index: SourceIndex | None = None
+_shared_lock = threading.Lock()
+
+
+def get_source_index() -> SourceIndex:
+    global _shared_index
+    if _shared_index is None:
+        with _shared_lock:
+            if _shared_index is None:
+                _shared_index = SourceIndex()
+    return _shared_index
 
 
 class ArticleMetadataService:
-    """Maps markdown filenames to article titles and URLs using the database."""
+    """Maps markdown filenames to article titles and URLs using the shared source index."""
 
-    def __init__(self, repository: SourceRepository) -> None:
-        self._repository = repository
-        self._cache: dict[str, ArticleMetadata] = {}
+    def __init__(self, index: SourceIndex | None = None) -> None:
+        self._index = index or get_source_index()
 
     def refresh(self) -> None:
-        self._cache = self._load_mapping()
+        self._index.invalidate()
 
     def get_metadata_for_path(self, path: Path | str) -> ArticleMetadata | None:
-        if not self._cache:
-            self.refresh()
         filename = Path(path).name
-        return self._cache.get(filename)
+        ref = self._index.get(filename)
+        if ref is None:
+            return None
+        return ArticleMetadata(title=ref.title, url=ref.url, path=Path(filename), source_id=ref.id)
 
-    def get_all_metadata(self) -> Iterable[ArticleMetadata]:
-        if not self._cache:
-            self.refresh()
-        return self._cache.values()
+    def resolve(self, paths: Iterable[Path | str]) -> ArticleMetadata | None:
+        """Metadata for the first of `paths` that names a known source."""
+        for path in paths:
+            metadata = self.get_metadata_for_path(path)
+            if metadata is not None:
+                return metadata
+        return None
 
-    def _load_mapping(self) -> dict[str, ArticleMetadata]:
-        mapping: dict[str, ArticleMetadata] = {}
-        for source in self._repository.list_all():
-            mapping[source.md_filename] = ArticleMetadata(
-                title=source.title,
-                url=source.url,
-                path=Path(source.md_filename),
-            )
-        return mapping
+    def get_all_metadata(self) -> Iterable[ArticleMetadata]:
+        return [
+            ArticleMetadata(title=ref.title, url=ref.url, path=Path(md_filename), source_id=ref.id)
+            for md_filename, ref in self._index.items()
+        ]
 
 
 def to_snake_case(text: str) -> str:
@@ -52,4 +181,12 @@ def to_snake_case(text: str) -> str:
     return slug.strip("_")
 
 
-__all__ = ["ArticleMetadata", "ArticleMetadataService", "to_snake_case"]
+__all__ = [
+    "ArticleMetadata",
+    "ArticleMetadataService",
+    "SourceIndex",
+    "SourceRef",
+    "bump_source_index_version",
+    "get_source_index",
+    "to_snake_case",
+]
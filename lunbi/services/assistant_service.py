@@ -1,16 +1,45 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
 import logging
-from typing import Any, Iterable
+import math
+import re
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable
 
 from dotenv import load_dotenv
-from langchain_chroma import Chroma
+from langchain_core.documents import Document
 from langchain_core.messages import AIMessageChunk
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
-from lunbi.config import CHROMA_PATH
-from lunbi.models import PromptStatus
+from lunbi.config import (
+    LEXICAL_FAST_PATH,
+    LEXICAL_FAST_PATH_COVERAGE,
+    LEXICAL_FAST_PATH_MARGIN,
+    MIN_RELEVANCE_SCORE,
+    RETRIEVAL_TIMEOUT_SECONDS,
+    RETRIEVAL_TRANSLATION_TIMEOUT_SECONDS,
+    SCOPE_MIN_MARGIN_DEGREES,
+    SCOPE_PRECHECK,
+    SEARCH_MODE,
+)
+from lunbi.metrics import (
+    EMBEDDING_SECONDS,
+    GENERATION_SECONDS,
+    LEXICAL_SEARCH_SECONDS,
+    SCOPE_CHECKS_TOTAL,
+    SEARCHES_TOTAL,
+    TIME_TO_FIRST_TOKEN_SECONDS,
+    TOKENS_PER_SECOND,
+    VECTOR_SEARCH_SECONDS,
+)
+from lunbi.enums import PromptStatus
+from lunbi.services.answer_cache import AnswerCache, CachedAnswer, get_answer_cache
+from lunbi.services.lexical_index import LexicalHit
+from lunbi.services.vector_store import IndexGeneration, VectorStoreHandle, get_vector_store
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
 
 load_dotenv()
 
@@ -21,7 +50,12 @@ LANGUAGE_LABELS = {
     "pl": "Polish",
 }
 
-MIN_RELEVANCE_SCORE = 0.5
+SEARCH_K = 3
+SEARCH_MODES = ("dense", "hybrid")
+# Hybrid search fuses this many candidates from each ranking; 60 is the usual RRF constant.
+FUSION_CANDIDATES = 10
+RRF_K = 60
+REPLAY_CHUNK_WORDS = 8
 
 PROMPT_TEMPLATE = """
 You are Lunbi, a cheerful AI assistant inspired by Mooncake from the series Final Space.
@@ -61,6 +95,14 @@ SCOPE_HINTS = [
     "How are organoids used for space biology research?",
     "What are current NASA priorities in space biology?",
 ]
+# Explicit requests for the sample prompts, answered before any retrieval. Looser mentions ("an example
+# of ...") are still searched and only get the sample prompts when nothing relevant is found.
+_EXAMPLE_PROMPTS_PATTERN = re.compile(
+    r"\b(?:examples?|samples?)\s+(?:of\s+)?(?:prompts?|questions?)\b"
+    r"|\bwhat\s+(?:topics|subjects)\s+(?:can|do)\s+you\b"
+    r"|\bwhat\s+(?:can|should)\s+i\s+ask\b",
+    re.IGNORECASE,
+)
 FALLBACK_PROMPT_TEMPLATE = """
 You are Lunbi, a cheerful AI assistant inspired by Mooncake from the series Final Space.
 You searched NASA and Space Biology publications but did not find material that covers the user's question.
@@ -76,12 +118,97 @@ Answer (in {language_label}, Lunbi's style, acknowledging the missing sources):
 """
 
 
+def _format_prompt(template: str, **values: str) -> str:
+    # langchain_core.prompts pulls in the tracing stack (~0.4s to import); load it with the first prompt.
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_template(template).format(**values)
+
+
+def wants_example_prompts(query: str) -> bool:
+    """Whether `query` asks for the sample prompts rather than about a topic."""
+    return _EXAMPLE_PROMPTS_PATTERN.search(query) is not None
+
+
+def _result_key(doc: Any) -> Any:
+    return getattr(doc, "id", None) or (doc.metadata.get("source"), doc.metadata.get("start_index"), doc.page_content)
+
+
+def merge_results(*result_sets: list[tuple[Any, float]], k: int = SEARCH_K) -> list[tuple[Any, float]]:
+    """Union of several searches keeping each chunk's best score, best first."""
+    best: dict[Any, tuple[Any, float]] = {}
+    for results in result_sets:
+        for doc, score in results:
+            key = _result_key(doc)
+            if key not in best or score > best[key][1]:
+                best[key] = (doc, score)
+    return sorted(best.values(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def fuse_results(*rankings: list[tuple[Any, float]], k: int = SEARCH_K) -> list[tuple[Any, float]]:
+    """Reciprocal-rank fusion of ranked searches, best first.
+
+    Chunks are ordered by the sum of 1 / (RRF_K + rank) over the rankings they appear in,
+    but keep their best relevance score so MIN_RELEVANCE_SCORE still applies.
+    """
+    fused: dict[Any, tuple[Any, float, float]] = {}
+    for ranking in rankings:
+        for rank, (doc, score) in enumerate(ranking, start=1):
+            key = _result_key(doc)
+            _, best_score, rrf_score = fused.get(key, (doc, score, 0.0))
+            fused[key] = (doc, max(best_score, score), rrf_score + 1 / (RRF_K + rank))
+    ordered = sorted(fused.values(), key=lambda item: item[2], reverse=True)[:k]
+    return [(doc, score) for doc, score, _ in ordered]
+
+
+class _GenerationTimer:
+    """Time-to-first-token, duration and decode rate of one model stream (a chunk is a token)."""
+
+    __slots__ = ("_started", "_first_at", "_chunks")
+
+    def __init__(self) -> None:
+        self._started = time.perf_counter()
+        self._first_at: float | None = None
+        self._chunks = 0
+
+    def chunk(self) -> None:
+        if self._first_at is None:
+            self._first_at = time.perf_counter()
+            TIME_TO_FIRST_TOKEN_SECONDS.observe(self._first_at - self._started)
+        self._chunks += 1
+
+    def finish(self) -> None:
+        finished = time.perf_counter()
+        GENERATION_SECONDS.observe(finished - self._started)
+        if self._first_at is not None and self._chunks > 1 and finished > self._first_at:
+            TOKENS_PER_SECOND.observe((self._chunks - 1) / (finished - self._first_at))
+
+
 class AssistantService:
     """Handles retrieval-augmented generation for Lunbi persona."""
 
-    def __init__(self) -> None:
-        self._embedding_function = OpenAIEmbeddings(model="text-embedding-3-small")
-        self._model = ChatOpenAI(model="gpt-4o-mini", temperature=0.3, streaming=True)
+    def __init__(
+        self,
+        vector_store: VectorStoreHandle | None = None,
+        answer_cache: AnswerCache | None = None,
+        chat_model: BaseChatModel | None = None,
+        search_mode: str = SEARCH_MODE,
+        lexical_fast_path: bool = LEXICAL_FAST_PATH,
+        scope_precheck: bool = SCOPE_PRECHECK,
+    ) -> None:
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode: {search_mode}")
+        self._vector_store = vector_store or get_vector_store()
+        self._answer_cache = answer_cache if answer_cache is not None else get_answer_cache()
+        if chat_model is None:
+            from langchain_openai import ChatOpenAI
+
+            chat_model = ChatOpenAI(model="gpt-4o-mini", temperature=0.3, streaming=True)
+        self._model = chat_model
+        self._search_mode = search_mode
+        self._lexical_fast_path = search_mode == "hybrid" and lexical_fast_path
+        # The scope model only describes the vectors; in hybrid mode BM25 matches can still pass the cut-off.
+        self._scope_precheck = search_mode == "dense" and scope_precheck
 
     def _build_prompt(
         self,
@@ -89,26 +216,199 @@ class AssistantService:
         language: str,
         results: list[tuple[Any, float]],
     ) -> tuple[str, list[str], PromptStatus, float]:
-        top_score = results[0][1] if results else 0.0
+        # Fused results are ordered by rank, not score.
+        top_score = max((score for _, score in results), default=0.0)
         language_label = LANGUAGE_LABELS.get(language, LANGUAGE_LABELS["en"])
 
         if not results or top_score < MIN_RELEVANCE_SCORE:
-            template = ChatPromptTemplate.from_template(FALLBACK_PROMPT_TEMPLATE)
-            prompt = template.format(question=query, language_label=language_label)
+            prompt = _format_prompt(FALLBACK_PROMPT_TEMPLATE, question=query, language_label=language_label)
             return prompt, [], PromptStatus.OUT_OF_CONTEXT, top_score
 
         context = "\n\n---\n\n".join([doc.page_content for doc, _ in results])
-        template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
-        prompt = template.format(context=context, question=query, language_label=language_label)
+        prompt = _format_prompt(PROMPT_TEMPLATE, context=context, question=query, language_label=language_label)
         sources = [doc.metadata.get("source") for doc, _ in results if doc.metadata.get("source")]
         return prompt, sources, PromptStatus.SUCCESS, top_score
 
-    def stream_response(self, query: str, language: str = "en") -> Iterable[dict[str, Any]]:
-        logger.info("Assistant streaming response (query=%s, language=%s)", query, language)
-        db = Chroma(persist_directory=str(CHROMA_PATH), embedding_function=self._embedding_function)
-        results = db.similarity_search_with_relevance_scores(query, k=3)
-        logger.info("Vector search completed for '%s' (%s results)", query, len(results))
-
+    def _search_by_vector(
+        self, index: IndexGeneration, embedding: list[float], k: int = SEARCH_K
+    ) -> list[tuple[Any, float]]:
+        db = index.store
+        relevance_fn = db._select_relevance_score_fn()
+        with VECTOR_SEARCH_SECONDS.time():
+            results = db.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+        return [(doc, relevance_fn(distance)) for doc, distance in results]
+
+    @staticmethod
+    def _lexical_documents(index: IndexGeneration, hits: list[LexicalHit]) -> list[tuple[Any, float]]:
+        """Chunks for BM25 hits, scored by how much of the query they contain."""
+        if not hits:
+            return []
+        found = index.store._collection.get(
+            ids=[hit.chunk_id for hit in hits], include=["documents", "metadatas"]
+        )
+        documents = {
+            chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [(documents[hit.chunk_id], hit.coverage) for hit in hits if hit.chunk_id in documents]
+
+    def _search(self, index: IndexGeneration, query: str, embedding: list[float]) -> list[tuple[Any, float]]:
+        lexical = index.lexical() if self._search_mode == "hybrid" else None
+        if lexical is None:
+            results = self._search_by_vector(index, embedding)
+            SEARCHES_TOTAL.inc("dense")
+            logger.info("Vector search completed for '%s' (%s results)", query, len(results))
+            return results
+
+        dense = self._search_by_vector(index, embedding, k=FUSION_CANDIDATES)
+        with LEXICAL_SEARCH_SECONDS.time():
+            hits = lexical.search(query, FUSION_CANDIDATES)
+        results = fuse_results(dense, self._lexical_documents(index, hits))
+        SEARCHES_TOTAL.inc("hybrid")
+        logger.info(
+            "Hybrid search completed for '%s' (%s dense and %s lexical candidates, %s results)",
+            query,
+            len(dense),
+            len(hits),
+            len(results),
+        )
+        return results
+
+    def _search_lexical_fast_path(self, index: IndexGeneration, query: str) -> list[tuple[Any, float]] | None:
+        """BM25 results when `query` clearly names a keyword, so the embedding call can be skipped."""
+        lexical = index.lexical() if self._lexical_fast_path else None
+        if lexical is None:
+            return None
+        with LEXICAL_SEARCH_SECONDS.time():
+            hits = lexical.confident_search(query, SEARCH_K, LEXICAL_FAST_PATH_COVERAGE, LEXICAL_FAST_PATH_MARGIN)
+        results = self._lexical_documents(index, hits or [])
+        if not results:
+            return None
+        SEARCHES_TOTAL.inc("lexical")
+        logger.info("Lexical fast path for '%s' (%s results)", query, len(results))
+        return results
+
+    def _out_of_scope(self, index: IndexGeneration, query: str, embedding: list[float]) -> bool:
+        """Whether the scope model rules out any chunk reaching MIN_RELEVANCE_SCORE, so the search can be skipped."""
+        scope = index.scope() if self._scope_precheck else None
+        if scope is None:
+            return False
+        in_scope = scope.in_scope(embedding, MIN_RELEVANCE_SCORE, math.radians(SCOPE_MIN_MARGIN_DEGREES))
+        SCOPE_CHECKS_TOTAL.inc("in" if in_scope else "out")
+        if not in_scope:
+            logger.info("Query '%s' is outside the indexed corpus; skipping the search", query)
+        return not in_scope
+
+    @staticmethod
+    def _embed_query(index: IndexGeneration, query: str) -> list[float]:
+        with EMBEDDING_SECONDS.time():
+            return index.store.embeddings.embed_query(query)
+
+    @staticmethod
+    async def _aembed_query(index: IndexGeneration, query: str) -> list[float]:
+        with EMBEDDING_SECONDS.time():
+            return await index.store.embeddings.aembed_query(query)
+
+    def retrieve(
+        self,
+        query: str,
+        translation: concurrent.futures.Future[str] | None = None,
+    ) -> list[tuple[Any, float]]:
+        """Search for `query`, merging in results for its translation when one is pending."""
+        with self._vector_store.lease() as index:
+            results = self._search_lexical_fast_path(index, query)
+            if results is not None:
+                if translation is not None:
+                    translation.cancel()
+                return results
+            results = self._search(index, query, self._embed_query(index, query))
+            return self._merge_translation(index, query, results, translation)
+
+    def _merge_translation(
+        self,
+        index: IndexGeneration,
+        query: str,
+        results: list[tuple[Any, float]],
+        translation: concurrent.futures.Future[str] | None,
+    ) -> list[tuple[Any, float]]:
+        if translation is None:
+            return results
+        try:
+            translated = translation.result(timeout=RETRIEVAL_TRANSLATION_TIMEOUT_SECONDS)
+        except Exception:
+            logger.warning("Translation unavailable for hybrid retrieval of '%s'", query, exc_info=True)
+            return results
+        if not translated.strip() or translated.strip() == query.strip():
+            return results
+        return merge_results(results, self._search(index, translated, self._embed_query(index, translated)))
+
+    async def _amerge_translation(
+        self,
+        index: IndexGeneration,
+        query: str,
+        results: list[tuple[Any, float]],
+        translation: asyncio.Future[str] | None,
+    ) -> list[tuple[Any, float]]:
+        if translation is None:
+            return results
+        try:
+            translated = await asyncio.wait_for(translation, RETRIEVAL_TRANSLATION_TIMEOUT_SECONDS)
+        except Exception:
+            logger.warning("Translation unavailable for hybrid retrieval of '%s'", query, exc_info=True)
+            return results
+        if not translated.strip() or translated.strip() == query.strip():
+            return results
+        embedding = await self._aembed_query(index, translated)
+        extra = await asyncio.to_thread(self._search, index, translated, embedding)
+        return merge_results(results, extra)
+
+    def _lookup_cached_answer(
+        self, index: IndexGeneration, query: str, language: str, embedding: list[float]
+    ) -> CachedAnswer | None:
+        if self._answer_cache is None:
+            return None
+        cached = self._answer_cache.lookup(query, language, embedding, index.version, index.generation)
+        if cached is not None:
+            logger.info("Answer cache hit for '%s' (cached query='%s')", query, cached.query)
+        return cached
+
+    def _remember_answer(
+        self,
+        index: IndexGeneration,
+        query: str,
+        language: str,
+        embedding: list[float] | None,
+        answer: str,
+        sources: list[str],
+        status: PromptStatus,
+    ) -> None:
+        # Answers found through the lexical fast path have no embedding to be cached under.
+        if self._answer_cache is None or embedding is None:
+            return
+        self._answer_cache.store(
+            query, language, embedding, index.version, answer, sources, status, index.generation
+        )
+
+    @staticmethod
+    def _retrieval_event(sources: list[str], status: PromptStatus) -> dict[str, Any]:
+        # Lets callers start work that depends only on the sources (e.g. metadata lookups) while the answer streams.
+        return {"type": "retrieval", "sources": list(sources), "status": status}
+
+    @classmethod
+    def _replay_cached_answer(cls, cached: CachedAnswer) -> Iterable[dict[str, Any]]:
+        yield cls._retrieval_event(list(cached.sources), cached.status)
+        words = re.findall(r"\S+\s*", cached.answer)
+        for start in range(0, len(words), REPLAY_CHUNK_WORDS):
+            yield {"type": "chunk", "content": "".join(words[start : start + REPLAY_CHUNK_WORDS])}
+        yield {"type": "final", "answer": cached.answer, "sources": list(cached.sources), "status": cached.status}
+
+    def _plan_generation(
+        self,
+        query: str,
+        language: str,
+        results: list[tuple[Any, float]],
+    ) -> tuple[str, list[str], PromptStatus, dict[str, Any] | None]:
+        """Build the LLM prompt, or return a final event when no generation is needed."""
         query_lower = query.lower()
         wants_examples = any(keyword in query_lower for keyword in ["example", "prompt", "topic"])
 
@@ -116,49 +416,203 @@ class AssistantService:
 
         if response_status is PromptStatus.OUT_OF_CONTEXT:
             if wants_examples:
-                logger.info("Providing example prompts for query '%s'", query)
-                examples = "\n".join(f"- {item}" for item in SCOPE_HINTS)
-                friendly_examples = (
-                    "Loo-loo! Here are some mission-ready questions you can ask me:\n"
-                    f"{examples}"
-                )
-                yield {"type": "final", "answer": friendly_examples, "sources": [], "status": PromptStatus.SUCCESS}
-                return
+                return prompt, sources, response_status, self._example_prompts_event(query)
 
             logger.warning(
                 "No relevant documents for query '%s' (top_score=%.3f)",
                 query,
                 top_score,
             )
+        return prompt, sources, response_status, None
+
+    @staticmethod
+    def _example_prompts_event(query: str) -> dict[str, Any]:
+        logger.info("Providing example prompts for query '%s'", query)
+        examples = "\n".join(f"- {item}" for item in SCOPE_HINTS)
+        friendly_examples = (
+            "Loo-loo! Here are some mission-ready questions you can ask me:\n"
+            f"{examples}"
+        )
+        return {"type": "final", "answer": friendly_examples, "sources": [], "status": PromptStatus.SUCCESS}
+
+    @staticmethod
+    def _chunk_content(chunk: Any) -> str:
+        return chunk.content if isinstance(chunk, AIMessageChunk) else getattr(chunk, "content", "")
+
+    @staticmethod
+    def _failure_event() -> dict[str, Any]:
+        failure_message = (
+            "Loo-loo! I hit a cosmic glitch while generating the answer. "
+            "Please try again in a moment."
+        )
+        return {"type": "final", "answer": failure_message, "sources": [], "status": PromptStatus.FAILED}
+
+    async def _aretrieve(
+        self,
+        index: IndexGeneration,
+        query: str,
+        language: str,
+        translation: asyncio.Future[str] | None,
+    ) -> tuple[list[float] | None, CachedAnswer | None, list[tuple[Any, float]]]:
+        """Embed, check the answer cache and search; the retrieval stage of `astream_response`."""
+        if self._lexical_fast_path:
+            results = await asyncio.to_thread(self._search_lexical_fast_path, index, query)
+            if results is not None:
+                if translation is not None:
+                    translation.cancel()
+                return None, None, results
+        embedding = await self._aembed_query(index, query)
+        cached = await asyncio.to_thread(self._lookup_cached_answer, index, query, language, embedding)
+        if cached is not None:
+            return embedding, cached, []
+        # A pending translation may still land in scope, so only translated or direct queries are pre-checked.
+        if translation is None and self._out_of_scope(index, query, embedding):
+            return embedding, None, []
+        results = await asyncio.to_thread(self._search, index, query, embedding)
+        results = await self._amerge_translation(index, query, results, translation)
+        return embedding, None, results
+
+    def stream_response(
+        self,
+        query: str,
+        language: str = "en",
+        translation: concurrent.futures.Future[str] | None = None,
+    ) -> Iterable[dict[str, Any]]:
+        """Stream chunk events and a final event for `query`.
+
+        `translation`, when given, resolves to an English rendering of the query that is
+        searched as well (hybrid retrieval); the answer itself is generated for `query`.
+        """
+        logger.info("Assistant streaming response (query=%s, language=%s)", query, language)
+        if wants_example_prompts(query):
+            if translation is not None:
+                translation.cancel()
+            yield self._example_prompts_event(query)
+            return
+        # The whole request uses one index version, even if a reload switches versions meanwhile.
+        with self._vector_store.lease() as index:
+            embedding: list[float] | None = None
+            results = self._search_lexical_fast_path(index, query)
+            if results is not None:
+                if translation is not None:
+                    translation.cancel()
+            else:
+                embedding = self._embed_query(index, query)
+                cached = self._lookup_cached_answer(index, query, language, embedding)
+                if cached is not None:
+                    if translation is not None:
+                        translation.cancel()
+                    yield from self._replay_cached_answer(cached)
+                    return
+                if translation is None and self._out_of_scope(index, query, embedding):
+                    results = []
+                else:
+                    results = self._merge_translation(index, query, self._search(index, query, embedding), translation)
+            prompt, sources, response_status, final_event = self._plan_generation(query, language, results)
+            if final_event is not None:
+                yield final_event
+                return
 
-        answer_parts: list[str] = []
-        try:
-            for chunk in self._model.stream(prompt):
-                content = chunk.content if isinstance(chunk, AIMessageChunk) else getattr(chunk, "content", "")
-                if not content:
-                    continue
-                answer_parts.append(content)
-                yield {"type": "chunk", "content": content}
-        except Exception:  # pragma: no cover - network failure path
-            logger.exception("Model invocation failed for query '%s'", query)
-            failure_message = (
-                "Loo-loo! I hit a cosmic glitch while generating the answer. "
-                "Please try again in a moment."
-            )
-            yield {"type": "final", "answer": failure_message, "sources": [], "status": PromptStatus.FAILED}
+            yield self._retrieval_event(sources, response_status)
+            answer_parts: list[str] = []
+            timer = _GenerationTimer()
+            try:
+                for chunk in self._model.stream(prompt):
+                    content = self._chunk_content(chunk)
+                    if not content:
+                        continue
+                    timer.chunk()
+                    answer_parts.append(content)
+                    yield {"type": "chunk", "content": content}
+            except Exception:  # pragma: no cover - network failure path
+                logger.exception("Model invocation failed for query '%s'", query)
+                yield self._failure_event()
+                return
+
+            timer.finish()
+            answer_text = "".join(answer_parts)
+            logger.info("Model stream finished for '%s' (tokens=%s)", query, len(answer_text))
+            self._remember_answer(index, query, language, embedding, answer_text, sources, response_status)
+            yield {"type": "final", "answer": answer_text, "sources": sources, "status": response_status}
+
+    async def astream_response(
+        self,
+        query: str,
+        language: str = "en",
+        translation: asyncio.Future[str] | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Async twin of `stream_response`; yields the same events without holding a worker thread."""
+        logger.info("Assistant streaming response (query=%s, language=%s)", query, language)
+        if wants_example_prompts(query):
+            if translation is not None:
+                translation.cancel()
+            yield self._example_prompts_event(query)
             return
+        # Opening the index on the first request blocks, so the lease is taken on a worker thread.
+        index = await asyncio.to_thread(self._vector_store.acquire)
+        try:
+            try:
+                embedding, cached, results = await asyncio.wait_for(
+                    self._aretrieve(index, query, language, translation),
+                    RETRIEVAL_TIMEOUT_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                logger.error("Retrieval for '%s' exceeded %.1fs", query, RETRIEVAL_TIMEOUT_SECONDS)
+                if translation is not None:
+                    translation.cancel()
+                yield self._failure_event()
+                return
+
+            if cached is not None:
+                if translation is not None:
+                    translation.cancel()
+                for event in self._replay_cached_answer(cached):
+                    yield event
+                return
 
-        answer_text = "".join(answer_parts)
-        logger.info("Model stream finished for '%s' (tokens=%s)", query, len(answer_text))
-        yield {"type": "final", "answer": answer_text, "sources": sources, "status": response_status}
+            prompt, sources, response_status, final_event = self._plan_generation(query, language, results)
+            if final_event is not None:
+                yield final_event
+                return
 
-    def generate_response(self, query: str, language: str = "en") -> dict[str, Any]:
+            yield self._retrieval_event(sources, response_status)
+            answer_parts: list[str] = []
+            timer = _GenerationTimer()
+            try:
+                async for chunk in self._model.astream(prompt):
+                    content = self._chunk_content(chunk)
+                    if not content:
+                        continue
+                    timer.chunk()
+                    answer_parts.append(content)
+                    yield {"type": "chunk", "content": content}
+            except Exception:  # pragma: no cover - network failure path
+                logger.exception("Model invocation failed for query '%s'", query)
+                yield self._failure_event()
+                return
+
+            timer.finish()
+            answer_text = "".join(answer_parts)
+            logger.info("Model stream finished for '%s' (tokens=%s)", query, len(answer_text))
+            await asyncio.to_thread(
+                self._remember_answer, index, query, language, embedding, answer_text, sources, response_status
+            )
+            yield {"type": "final", "answer": answer_text, "sources": sources, "status": response_status}
+        finally:
+            self._vector_store.release(index)
+
+    def generate_response(
+        self,
+        query: str,
+        language: str = "en",
+        translation: concurrent.futures.Future[str] | None = None,
+    ) -> dict[str, Any]:
         final_event: dict[str, Any] | None = None
         collected_chunks: list[str] = []
-        for event in self.stream_response(query, language=language):
+        for event in self.stream_response(query, language=language, translation=translation):
             if event.get("type") == "chunk":
                 collected_chunks.append(event.get("content", ""))
-            else:
+            elif event.get("type") == "final":
                 final_event = event
 
         if final_event is None:
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Any
+
+from langchain_core.embeddings import Embeddings
+
+from lunbi.config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_SIZE
+from lunbi.services.caching import LRUCache, SqliteCache
+from lunbi.services.embeddings import REMOTE_PROVIDERS, build_embeddings, current_embedding_spec
+
+logger = logging.getLogger("lunbi.embedding_cache")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """Memoises query embeddings in a bounded LRU with an optional on-disk SQLite tier.
+
+    Only `embed_query`/`aembed_query` are cached; document batches from index builds
+    pass straight through to the wrapped embeddings.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        max_entries: int = EMBEDDING_CACHE_SIZE,
+        store_path: Path | str | None = None,
+    ) -> None:
+        self._embeddings = embeddings
+        self._model_name = model_name
+        self._memory: LRUCache[str, list[float]] = LRUCache(max_entries)
+        self._store = SqliteCache(store_path, table="query_embeddings") if store_path else None
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+
+    @property
+    def wrapped(self) -> Embeddings:
+        return self._embeddings
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self._model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> list[float] | None:
+        vector = self._memory.get(key)
+        if vector is not None or self._store is None:
+            return vector
+        raw = self._store.get(key)
+        if raw is None:
+            return None
+        vector = array("f", raw).tolist()
+        self._memory.put(key, vector)
+        with self._lock:
+            self.disk_hits += 1
+        return vector
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        self._memory.put(key, vector)
+        if self._store is not None:
+            self._store.put(key, array("f", vector).tobytes())
+
+    def embed_query(self, text: str) -> list[float]:
+        normalized = normalize_text(text)
+        key = self._key(normalized)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = self._embeddings.embed_query(normalized)
+            self._remember(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        normalized = normalize_text(text)
+        key = self._key(normalized)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = await self._embeddings.aembed_query(normalized)
+            self._remember(key, vector)
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._embeddings.aembed_documents(texts)
+
+    def stats(self) -> dict[str, int]:
+        """Memory hits, disk hits and misses (a miss is a call to the wrapped model)."""
+        return {
+            "entries": len(self._memory),
+            "memory_hits": self._memory.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self._memory.misses - self.disk_hits,
+        }
+
+    def close(self) -> None:
+        if self._store is not None:
+            self._store.close()
+
+
+def build_query_embeddings(http_client: Any | None = None, http_async_client: Any | None = None) -> Embeddings:
+    """Query-time embeddings used by the API: the configured provider, cached when it is remote.
+
+    Local providers compute a vector faster than the cache could look one up.
+    """
+    spec = current_embedding_spec()
+    embeddings = build_embeddings(spec, http_client=http_client, http_async_client=http_async_client)
+    if spec.provider not in REMOTE_PROVIDERS:
+        return embeddings
+    return CachedEmbeddings(embeddings, model_name=spec.key, store_path=EMBEDDING_CACHE_PATH)
+
+
+__all__ = ["CachedEmbeddings", "build_query_embeddings", "normalize_text"]
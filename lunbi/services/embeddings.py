@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Mapping
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from lunbi.config import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL, EMBEDDING_PROVIDER
+
+HASHING_SCHEME = "hashing-v1"
+HASHING_DEFAULT_DIMENSIONS = 768
+# Vector size of each model when no dimension is requested
+NATIVE_DIMENSIONS = {
+    ("openai", "text-embedding-3-small"): 1536,
+    ("openai", "text-embedding-3-large"): 3072,
+    ("openai", "text-embedding-ada-002"): 1536,
+    ("hashing", HASHING_SCHEME): HASHING_DEFAULT_DIMENSIONS,
+}
+
+_WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+@dataclass(frozen=True)
+class EmbeddingSpec:
+    """Which embeddings produced (or may query) an index: provider, model and vector size."""
+
+    provider: str
+    model: str
+    dimensions: int | None = None
+
+    @property
+    def key(self) -> str:
+        """Stable identifier for cache keys; vectors of different specs never mix."""
+        return f"{self.provider}:{self.model}:{self.dimensions or 'native'}"
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @property
+    def resolved_dimensions(self) -> int | None:
+        """The vector size these embeddings produce; None for a model of unknown native size."""
+        return self.dimensions or NATIVE_DIMENSIONS.get((self.provider, self.model))
+
+    def matches(self, recorded: Mapping[str, Any]) -> bool:
+        """Whether an index built with `recorded` can be queried with these embeddings.
+
+        A recorded dimension of None (indexes built before it was recorded) means the
+        model's native size. Sizes are compared once both sides are resolved; only a model
+        missing from NATIVE_DIMENSIONS, queried at its native size, is taken on trust.
+        """
+        if recorded.get("provider") != self.provider or recorded.get("model") != self.model:
+            return False
+        dimensions = self.resolved_dimensions
+        recorded_dimensions = recorded.get("dimensions") or NATIVE_DIMENSIONS.get((self.provider, self.model))
+        if dimensions is None or recorded_dimensions is None:
+            return self.dimensions is None
+        return dimensions == recorded_dimensions
+
+    def describe(self) -> str:
+        return f"{self.provider}/{self.model} ({self.dimensions or 'native'} dimensions)"
+
+
+class HashingEmbeddings(Embeddings):
+    """Local embeddings from signed feature hashing of words, word pairs and character n-grams.
+
+    No model file and no network: a vector is a deterministic function of the text, so
+    a query embeds in a fraction of a millisecond. Character n-grams let inflected forms
+    (common in Polish) and typos share features. Quality is well below a trained model;
+    it is meant for on-prem deployments without an embeddings API and for tests.
+    """
+
+    def __init__(self, dimensions: int = HASHING_DEFAULT_DIMENSIONS, char_ngrams: tuple[int, int] = (3, 5)) -> None:
+        if dimensions <= 0:
+            raise ValueError("dimensions must be positive")
+        self.dimensions = dimensions
+        self._char_ngrams = char_ngrams
+
+    def _features(self, text: str) -> list[tuple[str, float]]:
+        words = _WORD_PATTERN.findall(unicodedata.normalize("NFKC", text).casefold())
+        features: list[tuple[str, float]] = [(f"w:{word}", 1.0) for word in words]
+        features.extend((f"b:{left} {right}", 0.5) for left, right in zip(words, words[1:]))
+        low, high = self._char_ngrams
+        for word in words:
+            padded = f"<{word}>"
+            grams = [padded[start : start + size] for size in range(low, high + 1) for start in range(len(padded) - size + 1)]
+            if grams:
+                # Spread one word's weight over its n-grams so long words do not dominate.
+                weight = 1.0 / math.sqrt(len(grams))
+                features.extend((f"c:{gram}", weight) for gram in grams)
+        return features
+
+    def _embed(self, text: str) -> list[float]:
+        dimensions = self.dimensions
+        buckets = [0.0] * dimensions
+        for feature, weight in self._features(text):
+            digest = zlib.crc32(feature.encode("utf-8"))
+            buckets[digest % dimensions] += weight if digest & 0x80000000 else -weight
+        # Sublinear term frequency, then unit length so L2 distance tracks cosine similarity.
+        vector = np.asarray(buckets)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        # Cheaper than the thread hop the default implementation would take.
+        return self._embed(text)
+
+
+def current_embedding_spec() -> EmbeddingSpec:
+    """The embeddings configured through LUNBI_EMBEDDING_PROVIDER/_MODEL/_DIMENSIONS."""
+    if EMBEDDING_PROVIDER == "hashing":
+        return EmbeddingSpec("hashing", HASHING_SCHEME, EMBEDDING_DIMENSIONS or HASHING_DEFAULT_DIMENSIONS)
+    return EmbeddingSpec(EMBEDDING_PROVIDER, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+
+
+def _build_openai(spec: EmbeddingSpec, **options: Any) -> Embeddings:
+    from langchain_openai import OpenAIEmbeddings
+
+    if spec.dimensions is not None:
+        options["dimensions"] = spec.dimensions
+    return OpenAIEmbeddings(model=spec.model, **options)
+
+
+def _build_hashing(spec: EmbeddingSpec, **options: Any) -> Embeddings:
+    return HashingEmbeddings(dimensions=spec.dimensions or HASHING_DEFAULT_DIMENSIONS)
+
+
+# Providers map a spec (plus client options that only remote providers use) to embeddings.
+EMBEDDING_PROVIDERS: dict[str, Callable[..., Embeddings]] = {
+    "openai": _build_openai,
+    "hashing": _build_hashing,
+}
+REMOTE_PROVIDERS = frozenset({"openai"})
+
+
+def build_embeddings(spec: EmbeddingSpec | None = None, **options: Any) -> Embeddings:
+    """Embeddings for `spec` (the configured one by default).
+
+    `options` (e.g. ``http_client`` or ``max_retries``) are passed to remote providers
+    and ignored by local ones.
+    """
+    spec = spec or current_embedding_spec()
+    try:
+        factory = EMBEDDING_PROVIDERS[spec.provider]
+    except KeyError:
+        raise ValueError(f"Unsupported embedding provider: {spec.provider}") from None
+    return factory(spec, **options)
+
+
+__all__ = [
+    "EMBEDDING_PROVIDERS",
+    "EmbeddingSpec",
+    "HashingEmbeddings",
+    "NATIVE_DIMENSIONS",
+    "REMOTE_PROVIDERS",
+    "build_embeddings",
+    "current_embedding_spec",
+]
@@ -0,0 +1,352 @@
+"""Versioned distribution of the Chroma index through S3.
+
+``publish_index`` uploads every file of a local index under ``<prefix>/<version>/`` and then
+``<prefix>/manifest.json``, which lists their sizes and SHA-256 digests. The manifest goes last,
+so a reader never sees a version whose files are still uploading. ``download_version`` fetches
+the files (large ones as parallel ranged parts) straight into a staging directory beside
+``versions/<version>`` under the index root, verifies them and renames the directory into place;
+``activate`` then swaps the ``current`` symlink the API opens, in a single atomic rename.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import os
+import re
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Any
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import BotoCoreError, ClientError
+
+from lunbi.config import (
+    AWS_ACCESS_KEY,
+    AWS_REGION,
+    AWS_SECRET_KEY,
+    INDEX_TRANSFER_CONCURRENCY,
+    INDEX_TRANSFER_PART_SIZE_MB,
+    S3_ENDPOINT_URL,
+)
+from lunbi.services.vector_store import (
+    CURRENT_LINK,
+    INDEX_FILENAME,
+    VERSIONS_DIRNAME,
+    read_index_version,
+    resolve_index_path,
+)
+
+DISTRIBUTION_MANIFEST = "manifest.json"
+MANIFEST_FORMAT = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+# Versions name directories; anything else in a manifest is refused.
+_VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+# A version downloaded again is installed as ``<version>+<n>``; "+" never occurs in version names.
+_REINSTALL_SEPARATOR = "+"
+
+
+class DistributionError(RuntimeError):
+    """The remote index is missing, malformed or does not match its manifest."""
+
+
+def s3_client() -> Any:
+    session = boto3.Session(
+        region_name=AWS_REGION,
+        aws_access_key_id=AWS_ACCESS_KEY,
+        aws_secret_access_key=AWS_SECRET_KEY,
+    )
+    return session.client("s3", endpoint_url=S3_ENDPOINT_URL)
+
+
+def transfer_config() -> TransferConfig:
+    part_size = INDEX_TRANSFER_PART_SIZE_MB * 1024 * 1024
+    return TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=INDEX_TRANSFER_CONCURRENCY,
+    )
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        while block := handle.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _object_key(prefix: str, *parts: str) -> str:
+    return "/".join(part for part in (prefix, *parts) if part)
+
+
+def _transfer_all(function: Any, items: list[Any]) -> None:
+    # Files transfer side by side; boto3 splits each large one into parallel ranged parts.
+    with ThreadPoolExecutor(max_workers=INDEX_TRANSFER_CONCURRENCY) as pool:
+        for _ in pool.map(function, items):
+            pass
+
+
+def build_manifest(index_dir: Path) -> dict[str, Any]:
+    """Describe every file of the index at `index_dir`; its version is the create_index_db marker."""
+    files = [
+        {"path": path.relative_to(index_dir).as_posix(), "size": path.stat().st_size, "sha256": sha256_file(path)}
+        for path in sorted(index_dir.rglob("*"))
+        if path.is_file()
+    ]
+    return {
+        "format": MANIFEST_FORMAT,
+        "version": read_index_version(index_dir),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "files": files,
+    }
+
+
+def validate_manifest(manifest: Any) -> None:
+    """Refuse anything but a complete manifest, so a damaged one fails before a download starts."""
+    if not isinstance(manifest, dict):
+        raise DistributionError("Manifest is not a JSON object")
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise DistributionError(f"Unsupported manifest format {manifest.get('format')!r}")
+    version = manifest.get("version")
+    if not isinstance(version, str) or not _VERSION_PATTERN.match(version):
+        raise DistributionError(f"Invalid index version {version!r}")
+    files = manifest.get("files")
+    if not isinstance(files, list):
+        raise DistributionError(f"Manifest for {version} has no file list")
+    paths = set()
+    for entry in files:
+        if not (
+            isinstance(entry, dict)
+            and isinstance(entry.get("path"), str)
+            and isinstance(entry.get("size"), int)
+            and isinstance(entry.get("sha256"), str)
+        ):
+            raise DistributionError(f"Malformed file entry {entry!r} in manifest for {version}")
+        path = PurePosixPath(entry["path"])
+        if path.is_absolute() or ".." in path.parts:
+            raise DistributionError(f"Unsafe path {entry['path']!r} in manifest")
+        paths.add(str(path))
+    if INDEX_FILENAME not in paths:
+        raise DistributionError(f"Manifest for {version} has no {INDEX_FILENAME}")
+
+
+def publish_index(index_dir: Path, client: Any, bucket: str, prefix: str) -> dict[str, Any]:
+    """Upload the index at `index_dir` as a new version and point the bucket's manifest at it."""
+    manifest = build_manifest(index_dir)
+    validate_manifest(manifest)
+    version = manifest["version"]
+    config = transfer_config()
+
+    def upload(entry: dict[str, Any]) -> None:
+        client.upload_file(str(index_dir / entry["path"]), bucket, _object_key(prefix, version, entry["path"]), Config=config)
+
+    try:
+        _transfer_all(upload, manifest["files"])
+        client.put_object(
+            Bucket=bucket,
+            Key=_object_key(prefix, DISTRIBUTION_MANIFEST),
+            Body=json.dumps(manifest, indent=2).encode("utf-8"),
+            ContentType="application/json",
+        )
+    except (BotoCoreError, ClientError) as error:
+        raise DistributionError(f"Failed to publish {index_dir} to s3://{bucket}/{prefix}: {error}") from error
+    return manifest
+
+
+def fetch_manifest(client: Any, bucket: str, prefix: str) -> dict[str, Any] | None:
+    """The bucket's current manifest, or None when nothing was published under `prefix`."""
+    key = _object_key(prefix, DISTRIBUTION_MANIFEST)
+    try:
+        body = client.get_object(Bucket=bucket, Key=key)["Body"].read()
+    except ClientError as error:
+        if error.response.get("Error", {}).get("Code") in {"NoSuchKey", "404"}:
+            return None
+        raise DistributionError(f"Failed to read s3://{bucket}/{key}: {error}") from error
+    except BotoCoreError as error:
+        raise DistributionError(f"Failed to read s3://{bucket}/{key}: {error}") from error
+    try:
+        manifest = json.loads(body)
+    except ValueError as error:
+        raise DistributionError(f"s3://{bucket}/{key} is not valid JSON: {error}") from error
+    validate_manifest(manifest)
+    return manifest
+
+
+def current_version_dir(root: Path) -> Path | None:
+    """The version directory ``current`` points to, or None for a flat or missing index."""
+    if not (root / CURRENT_LINK).exists():
+        return None
+    return resolve_index_path(root)
+
+
+def matches_manifest(index_dir: Path, manifest: dict[str, Any]) -> bool:
+    """Whether `index_dir` holds the manifest's version with all of its files.
+
+    Digests are checked when a version is downloaded, not here: Chroma writes to its SQLite file
+    once the index has been opened, so a served version no longer matches byte for byte.
+    """
+    if read_index_version(index_dir) != manifest["version"]:
+        return False
+    return all((index_dir / entry["path"]).is_file() for entry in manifest["files"])
+
+
+def _staging_dir(root: Path, version: str) -> Path:
+    staging = root / VERSIONS_DIRNAME / f".{version}.partial-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    return staging
+
+
+def _install(staging: Path, root: Path, version: str) -> Path:
+    # A directory of the same name may be the one workers are serving (a forced re-download), so it
+    # is never replaced: the copy goes to a fresh name and `activate` switches to it, which workers
+    # pick up as a reload. The old directory is left to prune_versions.
+    versions = root / VERSIONS_DIRNAME
+    target = versions / version
+    attempt = 1
+    while target.exists():
+        attempt += 1
+        target = versions / f"{version}{_REINSTALL_SEPARATOR}{attempt}"
+    os.rename(staging, target)
+    return target
+
+
+def installed_version(version_dir: Path) -> str:
+    """The version a directory under ``versions/`` was installed for."""
+    return version_dir.name.partition(_REINSTALL_SEPARATOR)[0]
+
+
+def download_version(manifest: dict[str, Any], root: Path, client: Any, bucket: str, prefix: str) -> Path:
+    """Download and verify the manifest's files into ``versions/<version>`` under `root`.
+
+    When that directory already exists (``--force``), the download goes to ``versions/<version>+<n>``.
+    """
+    version = manifest["version"]
+    staging = _staging_dir(root, version)
+    config = transfer_config()
+
+    def download(entry: dict[str, Any]) -> None:
+        path = staging / entry["path"]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        client.download_file(bucket, _object_key(prefix, version, entry["path"]), str(path), Config=config)
+        if path.stat().st_size != entry["size"] or sha256_file(path) != entry["sha256"]:
+            raise DistributionError(f"{entry['path']} of {version} does not match its manifest checksum")
+
+    try:
+        _transfer_all(download, manifest["files"])
+    except (BotoCoreError, ClientError) as error:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise DistributionError(f"Failed to download {version} from s3://{bucket}/{prefix}: {error}") from error
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return _install(staging, root, version)
+
+
+def archive_version(client: Any, bucket: str, key: str) -> str:
+    """Version name of a single-archive index, derived from the object's ETag."""
+    try:
+        etag = client.head_object(Bucket=bucket, Key=key)["ETag"].strip('"')
+    except (BotoCoreError, ClientError) as error:
+        raise DistributionError(f"Failed to read s3://{bucket}/{key}: {error}") from error
+    return f"archive-{etag}"
+
+
+def download_archive(client: Any, bucket: str, key: str, root: Path, version: str) -> Path:
+    """Download a ``chroma.zip`` and extract it straight into ``versions/<version>``.
+
+    This is the layout from before manifests were published; a zip cannot be extracted before its
+    central directory at the end has arrived, so the archive is staged once next to the versions.
+    """
+    staging = _staging_dir(root, version)
+    archive_path = staging.with_name(f"{staging.name}.zip")
+    try:
+        client.download_file(bucket, key, str(archive_path), Config=transfer_config())
+        with zipfile.ZipFile(archive_path) as archive:
+            members = [info for info in archive.infolist() if not info.is_dir() and not info.filename.startswith("__MACOSX/")]
+            # Archives of a "chroma/" folder are unpacked without that top-level directory.
+            tops = {PurePosixPath(info.filename).parts[0] for info in members}
+            strip = 1 if len(tops) == 1 and all(len(PurePosixPath(info.filename).parts) > 1 for info in members) else 0
+            for info in members:
+                relative = PurePosixPath(*PurePosixPath(info.filename).parts[strip:])
+                if relative.is_absolute() or ".." in relative.parts:
+                    raise DistributionError(f"Unsafe path {info.filename!r} in {key}")
+                path = staging / relative
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with archive.open(info) as source, path.open("wb") as destination:
+                    shutil.copyfileobj(source, destination, HASH_BLOCK_SIZE)
+        if not (staging / INDEX_FILENAME).exists():
+            raise DistributionError(f"{key} does not contain {INDEX_FILENAME}")
+    except (BotoCoreError, ClientError) as error:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise DistributionError(f"Failed to download s3://{bucket}/{key}: {error}") from error
+    except zipfile.BadZipFile as error:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise DistributionError(f"Invalid zip archive s3://{bucket}/{key}") from error
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    finally:
+        archive_path.unlink(missing_ok=True)
+    return _install(staging, root, version)
+
+
+def activate(root: Path, version_dir: Path) -> None:
+    """Point ``current`` at `version_dir` with an atomic rename over the old symlink."""
+    link = root / CURRENT_LINK
+    if link.exists() and not link.is_symlink():
+        raise DistributionError(f"{link} is not a symlink; move it away to switch to versioned indexes")
+    temporary = root / f".{CURRENT_LINK}.{os.getpid()}"
+    temporary.unlink(missing_ok=True)
+    # Relative, so the tree keeps working when the root is mounted elsewhere (e.g. in Docker).
+    os.symlink(Path(VERSIONS_DIRNAME) / version_dir.name, temporary, target_is_directory=True)
+    os.replace(temporary, link)
+
+
+def prune_versions(root: Path, keep: int) -> list[str]:
+    """Delete all but the `keep` most recent version directories; the current one is always kept."""
+    versions = root / VERSIONS_DIRNAME
+    if not versions.exists():
+        return []
+    current = current_version_dir(root)
+    candidates = sorted(
+        (path for path in versions.iterdir() if path.is_dir() and not path.name.startswith(".")),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    kept = {current} if current is not None else set()
+    removed = []
+    for path in candidates:
+        if path.resolve() in kept:
+            continue
+        if len(kept) < keep:
+            kept.add(path.resolve())
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(path.name)
+    return removed
+
+
+__all__ = [
+    "DISTRIBUTION_MANIFEST",
+    "DistributionError",
+    "activate",
+    "archive_version",
+    "build_manifest",
+    "current_version_dir",
+    "download_archive",
+    "download_version",
+    "fetch_manifest",
+    "installed_version",
+    "matches_manifest",
+    "prune_versions",
+    "publish_index",
+    "s3_client",
+    "sha256_file",
+    "validate_manifest",
+]
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import re
+from typing import Literal
+
+POLISH_LETTERS = frozenset("ąćęłńóśźż")
+
+POLISH_STOPWORDS = frozenset(
+    """
+    a aby albo ale bez bo by być był była było co czy dla do gdy gdzie i ich jak jaka jaki jakie
+    jakim jako jest już kiedy który która które ma mają może na nad nie niż o od oraz po pod przez
+    przy się są ta tak te tego to ten też u w we więc z za ze że
+    opisz podaj porównaj wyjaśnij wymień
+    """.split()
+)
+
+ENGLISH_STOPWORDS = frozenset(
+    """
+    a about after an and are as at be been by can could do does did for from has have how in into
+    is it its of on or should than that the their there these this to was were what when where
+    which who why will with would
+    compare define describe explain give list me show summarise summarize tell we you your
+    """.split()
+)
+
+# Words such as "a", "to" and "do" are function words in both languages and carry no signal.
+_AMBIGUOUS = POLISH_STOPWORDS & ENGLISH_STOPWORDS
+_POLISH_ONLY = POLISH_STOPWORDS - _AMBIGUOUS
+_ENGLISH_ONLY = ENGLISH_STOPWORDS - _AMBIGUOUS
+
+_WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+
+def detect_language(text: str) -> Literal["en", "pl"] | None:
+    """Guess whether `text` is English or Polish from diacritics and function words.
+
+    Returns None when the evidence is too thin to decide (very short or mixed text), so
+    callers should treat None as "unknown" and fall back to their default behaviour.
+    """
+    words = _WORD_PATTERN.findall(text.casefold())
+    if not words:
+        return None
+
+    diacritic_words = sum(1 for word in words if POLISH_LETTERS.intersection(word))
+    polish = sum(1 for word in words if word in _POLISH_ONLY) + 2 * diacritic_words
+    english = sum(1 for word in words if word in _ENGLISH_ONLY)
+
+    if diacritic_words == 0 and english and (polish == 0 or english > 2 * polish):
+        return "en"
+    if polish >= 2 and polish > 2 * english:
+        return "pl"
+    return None
+
+
+__all__ = ["detect_language"]
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+logger = logging.getLogger("lunbi.lexical_index")
+
+LEXICAL_INDEX_FILENAME = "lexical_index.npz"
+TOKENIZER_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+# A query term found in at most this share of chunks counts as a keyword (ids, gene or species names).
+KEYWORD_DOCUMENT_FREQUENCY = 0.01
+
+# Words joined by "-", "." or "/" stay together as well as being split, so "OSD-48" matches as a unit.
+_TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-./][^\W_]+)*")
+_PART_PATTERN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens: list[str] = []
+    for match in _TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).casefold()):
+        tokens.append(match)
+        parts = _PART_PATTERN.findall(match)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+@dataclass(frozen=True)
+class LexicalHit:
+    chunk_id: str
+    score: float
+    # Share of the query's IDF mass this chunk contains; used as its relevance score.
+    coverage: float
+
+
+class LexicalIndex:
+    """Okapi BM25 over the indexed chunks, stored as flat numpy arrays next to the Chroma index.
+
+    Postings for term ``i`` are ``postings[offsets[i]:offsets[i + 1]]`` (chunk positions,
+    ascending) with matching ``frequencies``. Only chunk ids are stored; texts and
+    metadata stay in Chroma.
+    """
+
+    def __init__(
+        self,
+        terms: list[str],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        frequencies: np.ndarray,
+        doc_lengths: np.ndarray,
+        chunk_ids: list[str],
+    ) -> None:
+        self._term_ids = {term: index for index, term in enumerate(terms)}
+        self._terms = terms
+        self._offsets = offsets
+        self._postings = postings
+        self._frequencies = frequencies
+        self._doc_lengths = doc_lengths
+        self._chunk_ids = chunk_ids
+        self._avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        document_frequencies = np.diff(offsets).astype(np.float64)
+        count = len(chunk_ids)
+        self._idf = np.log1p((count - document_frequencies + 0.5) / (document_frequencies + 0.5))
+        # Terms absent from the index weigh as much as a term found in a single chunk.
+        self._unknown_idf = math.log1p((count - 0.5) / 1.5) if count else 0.0
+        self._keyword_df = max(1, int(KEYWORD_DOCUMENT_FREQUENCY * count))
+
+    def __len__(self) -> int:
+        return len(self._chunk_ids)
+
+    @classmethod
+    def build(cls, chunks: Iterable[tuple[str, str]]) -> LexicalIndex:
+        """Index ``(chunk_id, text)`` pairs."""
+        chunk_ids: list[str] = []
+        lengths: list[int] = []
+        term_postings: dict[str, list[tuple[int, int]]] = {}
+        for position, (chunk_id, text) in enumerate(chunks):
+            tokens = tokenize(text)
+            chunk_ids.append(chunk_id)
+            lengths.append(len(tokens))
+            counts: dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, frequency in counts.items():
+                term_postings.setdefault(token, []).append((position, frequency))
+
+        terms = sorted(term_postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        postings: list[int] = []
+        frequencies: list[int] = []
+        for index, term in enumerate(terms):
+            entries = term_postings[term]
+            postings.extend(position for position, _ in entries)
+            frequencies.extend(frequency for _, frequency in entries)
+            offsets[index + 1] = len(postings)
+        return cls(
+            terms=terms,
+            offsets=offsets,
+            postings=np.asarray(postings, dtype=np.int32),
+            frequencies=np.asarray(frequencies, dtype=np.int32),
+            doc_lengths=np.asarray(lengths, dtype=np.int32),
+            chunk_ids=chunk_ids,
+        )
+
+    def save(self, path: Path | str) -> None:
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez_compressed(
+            tmp_path,
+            meta=np.asarray(json.dumps({"tokenizer": TOKENIZER_VERSION})),
+            terms=np.asarray(self._terms, dtype=str),
+            offsets=self._offsets,
+            postings=self._postings,
+            frequencies=self._frequencies,
+            doc_lengths=self._doc_lengths,
+            chunk_ids=np.asarray(self._chunk_ids, dtype=str),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path | str) -> LexicalIndex | None:
+        """The index at `path`, or None when it is missing or was built by another tokenizer."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("tokenizer") != TOKENIZER_VERSION:
+                logger.warning("Ignoring lexical index at %s built by tokenizer %s", path, meta.get("tokenizer"))
+                return None
+            return cls(
+                terms=data["terms"].tolist(),
+                offsets=data["offsets"],
+                postings=data["postings"],
+                frequencies=data["frequencies"],
+                doc_lengths=data["doc_lengths"],
+                chunk_ids=data["chunk_ids"].tolist(),
+            )
+
+    def _query_terms(self, query: str) -> tuple[list[int], float]:
+        """Known term ids of `query` and the IDF mass of all its distinct terms."""
+        known: list[int] = []
+        mass = 0.0
+        for token in dict.fromkeys(tokenize(query)):
+            term_id = self._term_ids.get(token)
+            if term_id is None:
+                mass += self._unknown_idf
+            else:
+                known.append(term_id)
+                mass += float(self._idf[term_id])
+        return known, mass
+
+    def _postings_for(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self._offsets[term_id], self._offsets[term_id + 1]
+        return self._postings[start:end], self._frequencies[start:end]
+
+    def _score(self, term_ids: list[int]) -> np.ndarray:
+        scores = np.zeros(len(self._chunk_ids), dtype=np.float64)
+        for term_id in term_ids:
+            positions, frequencies = self._postings_for(term_id)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[positions] / self._avg_length)
+            scores[positions] += self._idf[term_id] * frequencies * (BM25_K1 + 1) / (frequencies + norm)
+        return scores
+
+    def _coverage(self, positions: np.ndarray, term_ids: list[int], mass: float) -> np.ndarray:
+        matched = np.zeros(len(positions), dtype=np.float64)
+        for term_id in term_ids:
+            term_positions, _ = self._postings_for(term_id)
+            matched += np.isin(positions, term_positions, assume_unique=True) * self._idf[term_id]
+        return matched / mass if mass else matched
+
+    def search(self, query: str, k: int) -> list[LexicalHit]:
+        term_ids, mass = self._query_terms(query)
+        if not term_ids or not self._chunk_ids:
+            return []
+        scores = self._score(term_ids)
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(scores[matched])[::-1][:k]]
+        coverage = self._coverage(top, term_ids, mass)
+        return [
+            LexicalHit(self._chunk_ids[position], float(scores[position]), float(share))
+            for position, share in zip(top, coverage)
+        ]
+
+    def confident_search(self, query: str, k: int, min_coverage: float, margin: float) -> list[LexicalHit] | None:
+        """Hits when the query names a keyword and one chunk clearly matches it, else None.
+
+        Confident means: some query term is rare enough to be a keyword, the best chunk
+        holds at least `min_coverage` of the query's IDF mass, and it outscores the
+        runner-up by `margin`.
+        """
+        term_ids, _ = self._query_terms(query)
+        if not any(self._offsets[term_id + 1] - self._offsets[term_id] <= self._keyword_df for term_id in term_ids):
+            return None
+        hits = self.search(query, k)
+        if not hits or hits[0].coverage < min_coverage:
+            return None
+        if len(hits) > 1 and hits[0].score < margin * hits[1].score:
+            return None
+        return hits
+
+
+__all__ = ["LEXICAL_INDEX_FILENAME", "LexicalHit", "LexicalIndex", "tokenize"]
@@ -1,20 +1,29 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
 import json
 import logging
-from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, AsyncIterator, Iterable
 from uuid import uuid4
 
-from lunbi.models import Prompt, PromptStatus, Source
+from lunbi.config import RETRIEVAL_MODE, SOURCE_RESOLUTION_TIMEOUT_SECONDS, TRANSLATION_TIMEOUT_SECONDS
+from lunbi.metrics import PERSIST_SECONDS, PROMPTS_TOTAL, SOURCE_RESOLUTION_SECONDS, STREAMS_IN_FLIGHT
+from lunbi.models import Prompt, PromptStatus
 from lunbi.repositories.prompt_repository import PromptRepository
-from lunbi.repositories.source_repository import SourceRepository
 from lunbi.services.article_metadata_service import ArticleMetadataService
 from lunbi.services.assistant_service import AssistantService
+from lunbi.services.prompt_writer import PendingPrompt, PromptWriter, get_prompt_writer
 from lunbi.services.translation_service import TranslationService
 
 logger = logging.getLogger("lunbi.prompt_service")
 
+STREAM_TERMINATOR = "data: [DONE]\n\n"
+RETRIEVAL_MODES = ("translate", "direct", "hybrid")
+
+# Runs hybrid-mode translations for the synchronous endpoints alongside the vector search.
+_translation_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="translate")
+
 
 class PromptService:
     """Handles prompt answering and persistence."""
@@ -23,18 +32,20 @@ class PromptService:
         self,
         prompt_repository: PromptRepository,
         assistant_service: AssistantService,
-        source_repository: SourceRepository | None = None,
         metadata_service: ArticleMetadataService | None = None,
         translation_service: TranslationService | None = None,
+        prompt_writer: PromptWriter | None = None,
+        retrieval_mode: str = RETRIEVAL_MODE,
     ) -> None:
-        if source_repository is None and metadata_service is None:
-            raise ValueError("Source repository is required")
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unsupported retrieval mode: {retrieval_mode}")
 
         self._prompt_repository = prompt_repository
         self._assistant_service = assistant_service
-        self._source_repository = source_repository
-        self._metadata_service = metadata_service or ArticleMetadataService(repository=source_repository)  # type: ignore[arg-type]
+        self._metadata_service = metadata_service or ArticleMetadataService()
         self._translation_service = translation_service or TranslationService()
+        self._prompt_writer = prompt_writer if prompt_writer is not None else get_prompt_writer()
+        self._retrieval_mode = retrieval_mode
 
     def _prepare_query(self, query: str, language: str) -> tuple[str, str]:
         if language == "en":
@@ -51,29 +62,72 @@ class PromptService:
             logger.exception("Failed to translate query from %s", language)
             return query, "en"
 
+    async def _aprepare_query(self, query: str, language: str) -> tuple[str, str]:
+        if language == "en":
+            return query, language
+        try:
+            translated = await asyncio.wait_for(
+                self._translation_service.atranslate(
+                    query,
+                    target_language="en",
+                    source_language=language,  # type: ignore[arg-type]
+                ),
+                TRANSLATION_TIMEOUT_SECONDS,
+            )
+            logger.info("Translated query from %s to English", language)
+            return translated, language
+        except Exception:
+            logger.exception("Failed to translate query from %s", language)
+            return query, "en"
+
+    def _plan_query(self, query: str, language: str) -> tuple[str, str, concurrent.futures.Future[str] | None]:
+        """Return the query to answer, its language and, in hybrid mode, a pending translation."""
+        if language == "en" or self._retrieval_mode == "translate":
+            return (*self._prepare_query(query, language), None)
+        if self._retrieval_mode == "direct":
+            return query, language, None
+        translation = _translation_pool.submit(self._translation_service.translate, query, "en", language)  # type: ignore[arg-type]
+        return query, language, translation
+
+    async def _aplan_query(self, query: str, language: str) -> tuple[str, str, asyncio.Task[str] | None]:
+        if language == "en" or self._retrieval_mode == "translate":
+            return (*await self._aprepare_query(query, language), None)
+        if self._retrieval_mode == "direct":
+            return query, language, None
+        translation = asyncio.create_task(
+            self._translation_service.atranslate(query, target_language="en", source_language=language)  # type: ignore[arg-type]
+        )
+        return query, language, translation
+
     def process_prompt(self, query: str, language: str) -> dict[str, Any]:
-        effective_query, effective_language = self._prepare_query(query, language)
+        effective_query, effective_language, translation = self._plan_query(query, language)
 
         message_id = f"msg_{uuid4().hex}"
-        result = self._assistant_service.generate_response(effective_query, language=effective_language)
+        result = self._assistant_service.generate_response(
+            effective_query,
+            language=effective_language,
+            translation=translation,
+        )
         status_enum = self._normalize_status(result.get("status"))
         raw_sources = result.get("sources", [])
-        source_record, source_payload = self._prepare_source(raw_sources)
+        source_id, source_payload = self._prepare_source(raw_sources)
         logger.info("Prompt generation completed for '%s' (status=%s)", query, status_enum.value)
+        PROMPTS_TOTAL.inc(status_enum.value)
         if source_payload:
             logger.info("Resolved source for '%s' -> %s", query, source_payload.get("title"))
 
-        saved = self._persist_prompt_record(
-            query=query,
-            answer=result.get("answer"),
-            status=status_enum,
-            source_record=source_record,
-        )
+        with PERSIST_SECONDS.time():
+            prompt_id = self._persist_prompt_record(
+                query=query,
+                answer=result.get("answer"),
+                status=status_enum,
+                source_id=source_id,
+            )
 
         response: dict[str, Any] = {
             "id": message_id,
             "role": "assistant",
-            "prompt_id": saved.id,
+            "prompt_id": prompt_id,
             "answer": result.get("answer"),
             "status": status_enum.value,
             "language": effective_language,
@@ -83,31 +137,137 @@ class PromptService:
         return response
 
     def stream_prompt(self, query: str, language: str) -> Iterable[str]:
-        effective_query, effective_language = self._prepare_query(query, language)
+        effective_query, effective_language, translation = self._plan_query(query, language)
 
         answer_chunks: list[str] = []
         final_event: dict[str, Any] | None = None
         message_id = f"msg_{uuid4().hex}"
 
-        def _sse(data: dict[str, Any]) -> str:
-            return json.dumps(data, ensure_ascii=False) + "\n"
-
-        for event in self._assistant_service.stream_response(effective_query, language=effective_language):
-            if event.get("type") == "chunk":
-                chunk = event.get("content", "")
-                if not chunk:
-                    continue
-                answer_chunks.append(chunk)
-                yield _sse(
-                    {
-                        "id": message_id,
-                        "role": "assistant",
-                        "content": chunk,
-                    }
-                )
+        events = self._assistant_service.stream_response(
+            effective_query,
+            language=effective_language,
+            translation=translation,
+        )
+        try:
+            for event in events:
+                if event.get("type") == "chunk":
+                    chunk = event.get("content", "")
+                    if not chunk:
+                        continue
+                    answer_chunks.append(chunk)
+                    yield self._sse_chunk(message_id, chunk)
+                elif event.get("type") == "final":
+                    final_event = event
+        finally:
+            if translation is not None:
+                translation.cancel()
+
+        answer_text, raw_sources, status_enum = self._resolve_final_event(query, final_event, answer_chunks)
+        if not answer_chunks and answer_text:
+            yield self._sse_chunk(message_id, answer_text)
+
+        self._finish_stream(query, answer_text, raw_sources, status_enum)
+
+        # Client expects only incremental content frames and a final terminator
+        yield STREAM_TERMINATOR
+
+    async def astream_prompt(self, query: str, language: str) -> AsyncIterator[str]:
+        """Async twin of `stream_prompt` that overlaps independent stages.
+
+        The DB connection is checked out while retrieval runs and the source is resolved
+        while the answer streams, so the client waits for the longest chain of dependent
+        stages rather than for their sum. Blocking DB work stays off the event loop.
+        """
+        connection_task = self._start_connection_warmup()
+        translation: asyncio.Task[str] | None = None
+        source_task: asyncio.Task[tuple[int | None, dict[str, str] | None]] | None = None
+        source_candidates: list[str] | None = None
+
+        answer_chunks: list[str] = []
+        final_event: dict[str, Any] | None = None
+        message_id = f"msg_{uuid4().hex}"
+
+        STREAMS_IN_FLIGHT.inc()
+        try:
+            effective_query, effective_language, translation = await self._aplan_query(query, language)
+            events = self._assistant_service.astream_response(
+                effective_query,
+                language=effective_language,
+                translation=translation,
+            )
+            async for event in events:
+                event_type = event.get("type")
+                if event_type == "chunk":
+                    chunk = event.get("content", "")
+                    if not chunk:
+                        continue
+                    answer_chunks.append(chunk)
+                    yield self._sse_chunk(message_id, chunk)
+                elif event_type == "retrieval":
+                    source_candidates = event.get("sources") or []
+                    source_task = asyncio.create_task(self._aresolve_source(source_candidates))
+                else:
+                    final_event = event
+
+            answer_text, raw_sources, status_enum = self._resolve_final_event(query, final_event, answer_chunks)
+            if not answer_chunks and answer_text:
+                yield self._sse_chunk(message_id, answer_text)
+
+            if source_task is not None and raw_sources == source_candidates:
+                resolved = await source_task
             else:
-                final_event = event
+                resolved = await self._aresolve_source(raw_sources)
+            if connection_task is not None:
+                await asyncio.wait({connection_task})
+            await asyncio.to_thread(self._finish_stream, query, answer_text, raw_sources, status_enum, resolved)
+
+            # Client expects only incremental content frames and a final terminator
+            yield STREAM_TERMINATOR
+        finally:
+            STREAMS_IN_FLIGHT.dec()
+            # Cancellation reaches here when the client disconnects; drop work nobody will read.
+            for task in (translation, source_task):
+                if task is not None:
+                    task.cancel()
+            if connection_task is not None and not connection_task.done():
+                # A checkout running in a worker thread cannot be interrupted; let it finish before
+                # the request session is closed underneath it.
+                await asyncio.wait({connection_task})
+
+    def _start_connection_warmup(self) -> asyncio.Task[None] | None:
+        if self._prompt_writer is not None:
+            # Write-behind persistence never touches the request session on the stream path.
+            return None
+        task = asyncio.create_task(asyncio.to_thread(self._prompt_repository.connect))
+        task.add_done_callback(self._log_connection_failure)
+        return task
+
+    @staticmethod
+    def _log_connection_failure(task: asyncio.Task[None]) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Early database connection failed", exc_info=task.exception())
+
+    async def _aresolve_source(self, sources: list[str] | str | None) -> tuple[int | None, dict[str, str] | None]:
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(self._prepare_source, sources),
+                SOURCE_RESOLUTION_TIMEOUT_SECONDS,
+            )
+        except Exception:
+            logger.warning("Source resolution failed for %s", sources, exc_info=True)
+            return None, None
+
+    @staticmethod
+    def _sse_chunk(message_id: str, content: str) -> str:
+        data = {"id": message_id, "role": "assistant", "content": content}
+        return json.dumps(data, ensure_ascii=False) + "\n"
 
+    def _resolve_final_event(
+        self,
+        query: str,
+        final_event: dict[str, Any] | None,
+        answer_chunks: list[str],
+    ) -> tuple[str, list[str] | str | None, PromptStatus]:
         if final_event is None:
             logger.warning("Stream finished without final event for query '%s'", query)
             final_event = {
@@ -120,24 +280,23 @@ class PromptService:
         answer_text = final_event.get("answer", "".join(answer_chunks))
         raw_sources = final_event.get("sources", [])
         status_enum = self._normalize_status(final_event.get("status", PromptStatus.SUCCESS))
+        return answer_text, raw_sources, status_enum
 
-        if not answer_chunks and answer_text:
-            yield _sse(
-                {
-                    "id": message_id,
-                    "role": "assistant",
-                    "content": answer_text,
-                }
-            )
-
-        source_record, source_payload = self._prepare_source(raw_sources)
+    def _finish_stream(
+        self,
+        query: str,
+        answer_text: str,
+        raw_sources: list[str] | str | None,
+        status: PromptStatus,
+        resolved: tuple[int | None, dict[str, str] | None] | None = None,
+    ) -> int | None:
+        source_id, source_payload = resolved if resolved is not None else self._prepare_source(raw_sources)
         if source_payload:
             logger.info("Resolved source for streamed prompt '%s' -> %s", query, source_payload.get("title"))
-
-        saved = self._persist_prompt_record(query, answer_text, status_enum, source_record)
-
-        # Client expects only incremental content frames and a final terminator
-        yield "data: [DONE]\n\n"
+        PROMPTS_TOTAL.inc(status.value)
+        # The stream never reports the prompt id, so the record can be written behind.
+        with PERSIST_SECONDS.time():
+            return self._persist_prompt_record(query, answer_text, status, source_id, need_id=False)
 
     def answer_prompt(self, query: str, language: str = "en") -> dict[str, Any]:
         return self._assistant_service.generate_response(query, language=language)
@@ -145,7 +304,7 @@ class PromptService:
     def get_sample_prompts(self) -> list[str]:
         return self._assistant_service.get_scope_hints()
 
-    def _prepare_source(self, sources: list[str] | str | None) -> tuple[Source | None, dict[str, str] | None]:
+    def _prepare_source(self, sources: list[str] | str | None) -> tuple[int | None, dict[str, str] | None]:
         if not sources:
             return None, None
 
@@ -156,48 +315,39 @@ class PromptService:
         if not candidates:
             return None, None
 
-        for raw in candidates:
-            md_filename = Path(raw).name
-            if self._source_repository is None:
-                break
-            record = self._source_repository.get_by_md_filename(md_filename)
-            if record:
-                logger.info("Source lookup succeeded for %s", md_filename)
-                return record, {"title": record.title, "url": record.url}
-            logger.debug("Source lookup missed for %s", md_filename)
-
-        metadata = self._metadata_service.get_metadata_for_path(candidates[0])
-        if not metadata:
+        with SOURCE_RESOLUTION_SECONDS.time():
+            metadata = self._metadata_service.resolve(candidates)
+        if metadata is None:
             logger.debug("Unable to resolve source from candidates: %s", candidates)
             return None, None
-
-        logger.info("Metadata resolved for %s", candidates[0])
-        record = None
-        if self._source_repository is not None:
-            record = self._source_repository.upsert(
-                title=metadata.title,
-                url=metadata.url,
-                md_filename=candidates[0],
-            )
-            logger.info("Source upserted for %s", candidates[0])
-        return record, {"title": metadata.title, "url": metadata.url}
+        return metadata.source_id, {"title": metadata.title, "url": metadata.url}
 
     def _persist_prompt_record(
         self,
         query: str,
         answer: str | None,
         status: PromptStatus,
-        source_record: Source | None,
-    ) -> Prompt:
+        source_id: int | None,
+        need_id: bool = True,
+    ) -> int | None:
+        if self._prompt_writer is not None:
+            prompt_id = self._prompt_writer.reserve_id() if need_id else None
+            if prompt_id is not None or not need_id:
+                self._prompt_writer.submit(
+                    PendingPrompt(query=query, answer=answer, status=status, source_id=source_id, id=prompt_id)
+                )
+                logger.info("Prompt queued with id=%s and status=%s", prompt_id, status.value)
+                return prompt_id
+
         record = Prompt(
             query=query,
             answer=answer,
             status=status,
-            source_id=source_record.id if isinstance(source_record, Source) else None,
+            source_id=source_id,
         )
         saved = self._prompt_repository.add(record)
         logger.info("Prompt persisted with id=%s and status=%s", saved.id, saved.status.value)
-        return saved
+        return saved.id
     @staticmethod
     def _normalize_status(raw_status: str | PromptStatus) -> PromptStatus:
         if isinstance(raw_status, PromptStatus):
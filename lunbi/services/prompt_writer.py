@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import datetime
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from lunbi.config import (
+    PROMPT_ID_PREFETCH,
+    PROMPT_WRITE_BEHIND,
+    PROMPT_WRITER_BATCH_SIZE,
+    PROMPT_WRITER_FLUSH_SECONDS,
+    PROMPT_WRITER_MAX_QUEUE,
+)
+from lunbi.database import session_scope
+from lunbi.models import Prompt, PromptStatus
+from lunbi.repositories.prompt_repository import PromptRepository
+
+logger = logging.getLogger("lunbi.prompt_writer")
+
+_STOP = object()
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+@dataclass(frozen=True)
+class PendingPrompt:
+    query: str
+    answer: str | None
+    status: PromptStatus
+    source_id: int | None = None
+    id: int | None = None
+    created_at: datetime.datetime = field(default_factory=_utcnow)
+
+    def to_model(self) -> Prompt:
+        return Prompt(
+            id=self.id,
+            query=self.query,
+            answer=self.answer,
+            status=self.status,
+            source_id=self.source_id,
+            created_at=self.created_at,
+        )
+
+
+class PromptWriter:
+    """Queues prompt records in memory and inserts them in batches from a background thread.
+
+    A batch is flushed once it holds `batch_size` records or `flush_seconds` after its first
+    record arrived, whichever comes first. `close` drains everything still queued. Callers that
+    must return the prompt id immediately take one from `reserve_id`, which hands out ids
+    prefetched from the ``prompts`` sequence.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = PROMPT_WRITER_BATCH_SIZE,
+        flush_seconds: float = PROMPT_WRITER_FLUSH_SECONDS,
+        max_queue: int = PROMPT_WRITER_MAX_QUEUE,
+        id_prefetch: int = PROMPT_ID_PREFETCH,
+        session_factory: Callable[[], AbstractContextManager[Session]] = session_scope,
+    ) -> None:
+        self._batch_size = max(1, batch_size)
+        self._flush_seconds = flush_seconds
+        self._id_prefetch = id_prefetch
+        self._session_factory = session_factory
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max_queue)
+        self._ids: deque[int] = deque()
+        self._id_lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._closed = False
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.inline_writes = 0
+        self.batches = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self._flush_seconds_total = 0.0
+        self._thread = threading.Thread(target=self._run, name="prompt-writer", daemon=True)
+        self._thread.start()
+
+    def reserve_id(self) -> int | None:
+        """Return a prompt id that is safe to use before the row is written, or None if unsupported."""
+        with self._id_lock:
+            if not self._ids:
+                if self._id_prefetch <= 0:
+                    return None
+                try:
+                    with self._session_factory() as session:
+                        repository = PromptRepository(session)
+                        if not repository.supports_id_reservation():
+                            logger.info("Prompt id prefetch needs PostgreSQL; ids will be assigned on write")
+                            self._id_prefetch = 0
+                            return None
+                        self._ids.extend(repository.reserve_ids(self._id_prefetch))
+                except Exception:
+                    logger.warning("Prompt id prefetch failed", exc_info=True)
+                    return None
+            return self._ids.popleft()
+
+    def submit(self, record: PendingPrompt) -> None:
+        with self._submit_lock:
+            if not self._closed:
+                try:
+                    self._queue.put_nowait(record)
+                    with self._stats_lock:
+                        self.enqueued += 1
+                    return
+                except queue.Full:
+                    logger.warning("Prompt write queue is full; writing record inline")
+        # The writer is gone or saturated: persist on the caller's thread rather than drop the record.
+        with self._stats_lock:
+            self.inline_writes += 1
+        self._flush([record])
+
+    def stats(self) -> dict[str, float]:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "failed": self.failed,
+                "inline_writes": self.inline_writes,
+                "batches": self.batches,
+                "last_flush_ms": self.last_flush_seconds * 1000,
+                "max_flush_ms": self.max_flush_seconds * 1000,
+                "mean_flush_ms": self._flush_seconds_total / self.batches * 1000 if self.batches else 0.0,
+            }
+
+    def close(self, timeout: float | None = None) -> None:
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Prompt writer did not drain within %.1fs (%s queued)", timeout, self._queue.qsize())
+        else:
+            logger.info("Prompt writer drained: %s", self.stats())
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self._flush_seconds
+            while len(batch) < self._batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: list[PendingPrompt]) -> None:
+        started = time.perf_counter()
+        try:
+            self._insert(batch)
+            written, failed = len(batch), 0
+        except Exception:
+            logger.warning("Batch insert of %s prompts failed; retrying one by one", len(batch), exc_info=True)
+            written, failed = self._insert_individually(batch)
+        elapsed = time.perf_counter() - started
+
+        with self._stats_lock:
+            self.written += written
+            self.failed += failed
+            self.batches += 1
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self._flush_seconds_total += elapsed
+        logger.debug("Flushed %s prompts in %.1fms", written, elapsed * 1000)
+
+    def _insert(self, batch: list[PendingPrompt]) -> None:
+        with self._session_factory() as session:
+            PromptRepository(session).add_many([record.to_model() for record in batch])
+
+    def _insert_individually(self, batch: list[PendingPrompt]) -> tuple[int, int]:
+        written = failed = 0
+        for record in batch:
+            try:
+                self._insert([record])
+                written += 1
+            except Exception:
+                failed += 1
+                logger.exception("Dropping prompt record for query '%s'", record.query)
+        return written, failed
+
+
+_shared_writer: PromptWriter | None = None
+_shared_lock = threading.Lock()
+
+
+def get_prompt_writer() -> PromptWriter | None:
+    """Return the process-wide prompt writer, or None when write-behind is disabled."""
+    global _shared_writer
+    if not PROMPT_WRITE_BEHIND:
+        return None
+    if _shared_writer is None:
+        with _shared_lock:
+            if _shared_writer is None:
+                _shared_writer = PromptWriter()
+    return _shared_writer
+
+
+def close_prompt_writer(timeout: float | None = None) -> None:
+    global _shared_writer
+    with _shared_lock:
+        writer, _shared_writer = _shared_writer, None
+    if writer is not None:
+        writer.close(timeout)
+
+
+__all__ = ["PendingPrompt", "PromptWriter", "close_prompt_writer", "get_prompt_writer"]
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+SCOPE_MODEL_FILENAME = "scope_model.npz"
+KMEANS_ITERATIONS = 25
+MIN_CLUSTERS = 8
+MAX_CLUSTERS = 256
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def relevance_to_angle(relevance: float) -> float:
+    """Angle (radians) between unit vectors at which Chroma's l2 relevance equals `relevance`.
+
+    Chroma reports squared L2 distance d = 2 - 2cos and scores it as 1 - d / sqrt(2).
+    """
+    cosine = 1 - (1 - relevance) * math.sqrt(2) / 2
+    return math.acos(max(-1.0, min(1.0, cosine)))
+
+
+class ScopeModel:
+    """Spherical k-means summary of the indexed chunk vectors.
+
+    Each cluster keeps a unit centroid and an angular radius that reaches its farthest chunk.
+    If a query is further than ``radius + angle(MIN_RELEVANCE_SCORE)`` from every centroid (a
+    negative margin), then by the triangle inequality no chunk can reach the relevance cut-off,
+    so the search would end on the fallback prompt anyway. Centroids may be fitted on a sample,
+    but the radii must then be widened over every chunk with `covering`, or the bound no longer
+    holds. The bound is loose; a positive minimum margin, calibrated with ``evaluate_scope``,
+    turns away far more off-topic queries at the risk of turning away answerable ones.
+    """
+
+    def __init__(self, centroids: np.ndarray, radii: np.ndarray, chunks: int) -> None:
+        self._centroids = centroids
+        self._radii = radii
+        self.chunks = chunks
+
+    @property
+    def clusters(self) -> int:
+        return len(self._centroids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, clusters: int | None = None, seed: int = 0) -> ScopeModel:
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        count = len(vectors)
+        if clusters is None:
+            clusters = min(MAX_CLUSTERS, max(MIN_CLUSTERS, round(math.sqrt(count / 2))))
+        clusters = min(clusters, count)
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(count, size=clusters, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            # Empty clusters keep their previous centroid.
+            updated = np.where(np.linalg.norm(sums, axis=1, keepdims=True) > 0, _normalize(sums), centroids)
+            if np.allclose(updated, centroids):
+                break
+            centroids = updated
+
+        empty = cls(centroids.astype(np.float32), np.zeros(clusters, dtype=np.float32), 0)
+        return empty.covering([vectors])
+
+    def covering(self, batches: Iterable[np.ndarray]) -> ScopeModel:
+        """The same clusters, with radii widened to reach every vector in `batches` from its nearest centroid.
+
+        The returned model counts the vectors of `batches` as its chunks; pass every stored vector when
+        the centroids were fitted on a sample of them.
+        """
+        radii = self._radii.copy()
+        chunks = 0
+        for batch in batches:
+            vectors = _normalize(np.asarray(batch, dtype=np.float32))
+            if not len(vectors):
+                continue
+            similarities = vectors @ self._centroids.T
+            assignment = np.argmax(similarities, axis=1)
+            angles = np.arccos(np.clip(similarities[np.arange(len(vectors)), assignment], -1.0, 1.0))
+            np.maximum.at(radii, assignment, angles.astype(np.float32))
+            chunks += len(vectors)
+        return ScopeModel(self._centroids, radii, chunks)
+
+    def save(self, path: Path | str) -> None:
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+        meta = {"chunks": self.chunks, "radius": "max"}
+        np.savez_compressed(tmp_path, meta=np.asarray(json.dumps(meta)), centroids=self._centroids, radii=self._radii)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path | str) -> ScopeModel | None:
+        path = Path(path)
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(data["centroids"], data["radii"], meta["chunks"])
+
+    def margin(self, embedding: list[float], min_relevance: float) -> float:
+        """Radians by which the query falls inside the closest widened cluster (negative: outside all)."""
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        if query.shape[0] != self._centroids.shape[1]:
+            raise ValueError(f"Query has {query.shape[0]} dimensions, the scope model {self._centroids.shape[1]}")
+        angles = np.arccos(np.clip(self._centroids @ query, -1.0, 1.0))
+        return float(np.max(self._radii + relevance_to_angle(min_relevance) - angles))
+
+    def in_scope(self, embedding: list[float], min_relevance: float, min_margin: float = 0.0) -> bool:
+        """Whether the query may have a chunk at or above `min_relevance`; `min_margin` is in radians."""
+        return self.margin(embedding, min_relevance) >= min_margin
+
+
+__all__ = ["SCOPE_MODEL_FILENAME", "ScopeModel", "relevance_to_angle"]
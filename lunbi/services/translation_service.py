@@ -1,9 +1,19 @@
 from __future__ import annotations
 
+import hashlib
 import logging
-from typing import Literal
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
 
-from langchain_openai import ChatOpenAI
+from lunbi.config import TRANSLATION_CACHE_PATH, TRANSLATION_CACHE_SIZE
+from lunbi.metrics import TRANSLATION_SECONDS
+from lunbi.services.caching import LRUCache, SqliteCache
+from lunbi.services.embedding_cache import normalize_text
+from lunbi.services.language_detection import detect_language
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
 
 logger = logging.getLogger("lunbi.translation")
 
@@ -12,38 +22,137 @@ LANGUAGE_NAMES = {"en": "English", "pl": "Polish"}
 
 
 class TranslationService:
-    """Minimal helper that translates text using ChatOpenAI."""
+    """Minimal helper that translates text using ChatOpenAI.
 
-    def __init__(self, model: str = "gpt-4o-mini") -> None:
-        self._model = ChatOpenAI(model=model, temperature=0)
+    Text that is detected locally as already being in the target language is returned
+    untouched. Translations are memoised in a bounded LRU backed by an optional SQLite
+    file, keyed by model, source language, target language and normalised text.
+    """
 
-    def translate(
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        chat_model: BaseChatModel | None = None,
+        cache_size: int = TRANSLATION_CACHE_SIZE,
+        cache_path: Path | str | None = TRANSLATION_CACHE_PATH,
+    ) -> None:
+        self._model_name = model
+        if chat_model is None:
+            from langchain_openai import ChatOpenAI
+
+            chat_model = ChatOpenAI(model=model, temperature=0)
+        self._model = chat_model
+        self._memory: LRUCache[str, str] = LRUCache(cache_size)
+        self._store = SqliteCache(cache_path, table="translations") if cache_path else None
+        self._lock = threading.Lock()
+        self.detected_skips = 0
+        self.disk_hits = 0
+
+    def _build_prompt(
         self,
         text: str,
         target_language: Literal["en", "pl"],
-        source_language: Literal["en", "pl"] | None = None,
-    ) -> str:
-        text = text or ""
+        source_language: Literal["en", "pl"] | None,
+    ) -> str | None:
+        """Return the translation prompt, or None when the text can be returned as-is."""
         if not text.strip():
-            return text
+            return None
         if target_language not in SUPPORTED_LANGUAGES:
             raise ValueError(f"Unsupported language: {target_language}")
 
         source_language = source_language or ("en" if target_language == "pl" else "pl")
         if source_language == target_language:
-            return text
+            return None
 
         if source_language not in SUPPORTED_LANGUAGES:
             raise ValueError(f"Unsupported language: {source_language}")
 
-        prompt = (
+        if detect_language(text) == target_language:
+            logger.debug("Text already in %s; skipping translation", LANGUAGE_NAMES[target_language])
+            with self._lock:
+                self.detected_skips += 1
+            return None
+
+        logger.debug(
+            "Translating content from %s to %s", LANGUAGE_NAMES[source_language], LANGUAGE_NAMES[target_language]
+        )
+        return (
             "Translate the following content from "
             f"{LANGUAGE_NAMES[source_language]} to {LANGUAGE_NAMES[target_language]}. "
             "Preserve technical terminology and keep the tone formal.\n\n"
             f"Content:\n{text}"
         )
-        logger.debug(
-            "Translating content from %s to %s", LANGUAGE_NAMES[source_language], LANGUAGE_NAMES[target_language]
-        )
-        response = self._model.invoke(prompt)
-        return getattr(response, "content", str(response))
+
+    def _key(self, text: str, target_language: str, source_language: str | None) -> str:
+        raw = f"{self._model_name}\0{source_language or ''}\0{target_language}\0{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> str | None:
+        translated = self._memory.get(key)
+        if translated is not None or self._store is None:
+            return translated
+        raw = self._store.get(key)
+        if raw is None:
+            return None
+        translated = raw.decode("utf-8")
+        self._memory.put(key, translated)
+        with self._lock:
+            self.disk_hits += 1
+        return translated
+
+    def _remember(self, key: str, translated: str) -> None:
+        self._memory.put(key, translated)
+        if self._store is not None:
+            self._store.put(key, translated.encode("utf-8"))
+
+    def translate(
+        self,
+        text: str,
+        target_language: Literal["en", "pl"],
+        source_language: Literal["en", "pl"] | None = None,
+    ) -> str:
+        with TRANSLATION_SECONDS.time():
+            text = text or ""
+            prompt = self._build_prompt(text, target_language, source_language)
+            if prompt is None:
+                return text
+            key = self._key(normalize_text(text), target_language, source_language)
+            translated = self._lookup(key)
+            if translated is None:
+                response = self._model.invoke(prompt)
+                translated = getattr(response, "content", str(response))
+                self._remember(key, translated)
+            return translated
+
+    async def atranslate(
+        self,
+        text: str,
+        target_language: Literal["en", "pl"],
+        source_language: Literal["en", "pl"] | None = None,
+    ) -> str:
+        with TRANSLATION_SECONDS.time():
+            text = text or ""
+            prompt = self._build_prompt(text, target_language, source_language)
+            if prompt is None:
+                return text
+            key = self._key(normalize_text(text), target_language, source_language)
+            translated = self._lookup(key)
+            if translated is None:
+                response = await self._model.ainvoke(prompt)
+                translated = getattr(response, "content", str(response))
+                self._remember(key, translated)
+            return translated
+
+    def stats(self) -> dict[str, int]:
+        """Detector skips, memory hits, disk hits and misses (a miss is a model call)."""
+        return {
+            "entries": len(self._memory),
+            "detected_skips": self.detected_skips,
+            "memory_hits": self._memory.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self._memory.misses - self.disk_hits,
+        }
+
+    def close(self) -> None:
+        if self._store is not None:
+            self._store.close()
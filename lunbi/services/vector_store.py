@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import datetime
+import itertools
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+from uuid import uuid4
+
+from langchain_core.embeddings import Embeddings
+
+from lunbi.config import CHROMA_PATH
+from lunbi.metrics import INDEX_GENERATIONS_OPEN, INDEX_RELOADS_TOTAL
+from lunbi.services.embedding_cache import CachedEmbeddings, build_query_embeddings
+from lunbi.services.embeddings import EmbeddingSpec, build_embeddings, current_embedding_spec
+from lunbi.services.lexical_index import LEXICAL_INDEX_FILENAME, LexicalIndex
+from lunbi.services.scope_model import SCOPE_MODEL_FILENAME, ScopeModel
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+logger = logging.getLogger("lunbi.vector_store")
+
+INDEX_VERSION_FILENAME = "index_version"
+INDEX_FILENAME = "chroma.sqlite3"
+MANIFEST_FILENAME = "index_manifest.json"
+VERSIONS_DIRNAME = "versions"
+CURRENT_LINK = "current"
+
+
+class IndexMismatchError(RuntimeError):
+    """The index was built with different embeddings than the ones configured to query it."""
+
+
+def resolve_index_path(root: Path | str) -> Path:
+    """Directory holding the index files: the version the ``current`` symlink points to, else `root`.
+
+    create_index_db and download_s3_file write each version into ``versions/<version>`` and swap
+    ``current``; an index built before versions were used lives directly in `root`.
+    """
+    root = Path(root)
+    current = root / CURRENT_LINK
+    if current.exists():
+        return current.resolve()
+    return root
+
+
+def read_index_manifest(path: Path | str) -> dict[str, Any] | None:
+    manifest = Path(path) / MANIFEST_FILENAME
+    if not manifest.exists():
+        return None
+    return json.loads(manifest.read_text(encoding="utf-8"))
+
+
+def recorded_embedding(manifest: dict[str, Any]) -> dict[str, Any]:
+    """Embedding provenance of a manifest; older manifests only name an OpenAI model."""
+    return manifest.get("embedding") or {"provider": "openai", "model": manifest.get("embedding_model"), "dimensions": None}
+
+
+def verify_index_embedding(path: Path | str, spec: EmbeddingSpec) -> None:
+    manifest = read_index_manifest(path)
+    if manifest is None:
+        logger.warning("No manifest at %s; cannot verify which embeddings built the index", path)
+        return
+    recorded = recorded_embedding(manifest)
+    if not spec.matches(recorded):
+        raise IndexMismatchError(
+            f"Index at {path} was built with {EmbeddingSpec(**recorded).describe()} embeddings but "
+            f"{spec.describe()} is configured; rebuild it with create_index_db or set LUNBI_EMBEDDING_* to match"
+        )
+
+
+def read_index_version(path: Path | str) -> str:
+    """Return the version marker written by `create_index_db`, or a file-stat fallback."""
+    path = Path(path)
+    marker = path / INDEX_VERSION_FILENAME
+    if marker.exists():
+        return marker.read_text(encoding="utf-8").strip()
+    index = path / INDEX_FILENAME
+    if index.exists():
+        stat = index.stat()
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+    return "empty"
+
+
+def write_index_version(path: Path | str) -> str:
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d%H%M%S")
+    version = f"{timestamp}-{uuid4().hex[:8]}"
+    (Path(path) / INDEX_VERSION_FILENAME).write_text(version, encoding="utf-8")
+    return version
+
+
+class IndexGeneration:
+    """One opened version of the index: the Chroma store, its sidecars and the requests leasing it.
+
+    The BM25 index and scope model stored beside the Chroma files are loaded on first use of
+    `lexical()` and `scope()`. `leases` and `retired` are guarded by the owning handle's lock.
+    `generation` numbers the versions a handle opened, increasing with every reload.
+    """
+
+    def __init__(self, path: Path, version: str, store: Chroma, generation: int = 0) -> None:
+        self.path = path
+        self.version = version
+        self.store = store
+        self.generation = generation
+        self.leases = 0
+        self.retired = False
+        self._sidecars: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        INDEX_GENERATIONS_OPEN.inc()
+
+    def lexical(self) -> LexicalIndex | None:
+        """The BM25 index built alongside the vectors, or None when the index has none."""
+        return self._sidecar(LEXICAL_INDEX_FILENAME, LexicalIndex.load)
+
+    def scope(self) -> ScopeModel | None:
+        """The corpus scope model built alongside the vectors, or None when the index has none."""
+        return self._sidecar(SCOPE_MODEL_FILENAME, ScopeModel.load)
+
+    def _sidecar(self, filename: str, loader: Callable[[Path], Any]) -> Any:
+        sidecars = self._sidecars
+        if filename in sidecars:
+            return sidecars[filename]
+        with self._lock:
+            if filename not in self._sidecars:
+                path = self.path / filename
+                loaded = loader(path)
+                if loaded is None:
+                    logger.info("No %s next to the index at %s; run create_index_db to build it", filename, self.path)
+                else:
+                    logger.info("Loaded %s", path)
+                self._sidecars[filename] = loaded
+            return self._sidecars[filename]
+
+    def warm(self) -> int:
+        """Load the vector segment with one search and the sidecars; returns the number of chunks."""
+        stored = self.store._collection.get(limit=1, include=["embeddings"])
+        if len(stored["ids"]):
+            self.store.similarity_search_by_vector(list(stored["embeddings"][0]), k=1)
+        self.lexical()
+        self.scope()
+        return self.store._collection.count()
+
+    def close(self) -> None:
+        client = getattr(self.store, "_client", None)
+        close = getattr(client, "close", None)
+        if callable(close):
+            close()
+        INDEX_GENERATIONS_OPEN.dec()
+        logger.info("Closed Chroma index at %s (version=%s)", self.path, self.version)
+
+
+class VectorStoreHandle:
+    """Opens the Chroma index once and shares it between all requests of a worker.
+
+    With an `embedding_spec`, the index manifest is checked first and an index built by
+    other embeddings is refused with `IndexMismatchError`. Requests `lease()` the current
+    `IndexGeneration` and use it throughout, so `reload()` can open the version ``current``
+    points to next to the old one and switch over without a request seeing both; the old
+    generation is closed when its last lease is released.
+    """
+
+    def __init__(
+        self,
+        persist_directory: Path | str = CHROMA_PATH,
+        embedding_function: Embeddings | None = None,
+        embedding_spec: EmbeddingSpec | None = None,
+    ) -> None:
+        self._persist_directory = Path(persist_directory)
+        self._embedding_function = embedding_function
+        self._embedding_spec = embedding_spec
+        self._generation: IndexGeneration | None = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        # Last in-place change reload() warned about, so the watcher does not repeat it.
+        self._unswitchable: tuple[Path, str] | None = None
+        self._generations = itertools.count(1)
+
+    @property
+    def persist_directory(self) -> Path:
+        return self._persist_directory
+
+    @property
+    def index_path(self) -> Path:
+        """Directory of the index version this handle serves."""
+        return self._current().path
+
+    @property
+    def embedding_function(self) -> Embeddings | None:
+        return self._embedding_function
+
+    @property
+    def is_open(self) -> bool:
+        return self._generation is not None
+
+    @property
+    def version(self) -> str:
+        """Version of the index this handle serves; answer caches are keyed on it."""
+        return self._current().version
+
+    def get(self) -> Chroma:
+        return self._current().store
+
+    def lexical(self) -> LexicalIndex | None:
+        return self._current().lexical()
+
+    def scope(self) -> ScopeModel | None:
+        return self._current().scope()
+
+    def acquire(self) -> IndexGeneration:
+        """Lease the current generation, opening it on first use; pair with `release`."""
+        while True:
+            generation = self._current()
+            with self._lock:
+                # A reload or close may have replaced it in between.
+                if generation is self._generation:
+                    generation.leases += 1
+                    return generation
+
+    def release(self, generation: IndexGeneration) -> None:
+        with self._lock:
+            generation.leases -= 1
+            drained = generation.retired and generation.leases == 0
+        if drained:
+            generation.close()
+
+    @contextmanager
+    def lease(self) -> Iterator[IndexGeneration]:
+        generation = self.acquire()
+        try:
+            yield generation
+        finally:
+            self.release(generation)
+
+    def reload(self) -> bool:
+        """Switch to the version ``current`` points to when it differs from the one being served.
+
+        The new version is opened and warmed before the switch, so no request waits for it; if
+        it cannot be opened, the error propagates and the old version keeps serving. Returns
+        whether the handle switched. Nothing happens before the index was first opened, and an
+        index rewritten in its own directory is left alone: Chroma cannot open a directory twice.
+        """
+        with self._reload_lock:
+            serving = self._generation
+            if serving is None:
+                return False
+            path = resolve_index_path(self._persist_directory)
+            version = read_index_version(path)
+            if path == serving.path:
+                if version != serving.version and self._unswitchable != (path, version):
+                    self._unswitchable = (path, version)
+                    logger.warning(
+                        "Index at %s changed in place (%s -> %s); restart the workers to serve it, or "
+                        "distribute it as a new version directory to reload without a restart",
+                        path,
+                        serving.version,
+                        version,
+                    )
+                return False
+
+            try:
+                generation = self._open(path)
+                try:
+                    chunks = generation.warm()
+                except Exception:
+                    generation.close()
+                    raise
+            except Exception:
+                INDEX_RELOADS_TOTAL.inc("failed")
+                raise
+            with self._lock:
+                previous, self._generation = self._generation, generation
+                drained = False
+                if previous is not None:
+                    previous.retired = True
+                    drained = previous.leases == 0
+            if drained:
+                previous.close()  # type: ignore[union-attr]
+            INDEX_RELOADS_TOTAL.inc("switched")
+            logger.info(
+                "Switched index from %s to %s (%s chunks)%s",
+                serving.version,
+                generation.version,
+                chunks,
+                "" if drained else "; the previous version closes once its requests finish",
+            )
+            return True
+
+    def close(self) -> None:
+        """Close the served generation now; used at shutdown, when no request is in flight."""
+        with self._lock:
+            generation, self._generation = self._generation, None
+            if generation is not None:
+                generation.retired = True
+        if generation is not None:
+            generation.close()
+
+    def _current(self) -> IndexGeneration:
+        generation = self._generation
+        if generation is not None:
+            return generation
+        with self._lock:
+            if self._generation is None:
+                self._generation = self._open(resolve_index_path(self._persist_directory))
+            return self._generation
+
+    def _open(self, path: Path) -> IndexGeneration:
+        # chromadb takes about half a second to import; only pay for it when the index is opened.
+        from langchain_chroma import Chroma
+
+        if self._embedding_spec is not None:
+            verify_index_embedding(path, self._embedding_spec)
+        version = read_index_version(path)
+        embedding_function = self._embedding_function or build_embeddings(self._embedding_spec)
+        store = Chroma(persist_directory=str(path), embedding_function=embedding_function)
+        logger.info("Opened Chroma index at %s (version=%s)", path, version)
+        return IndexGeneration(path, version, store, next(self._generations))
+
+
+class IndexWatcher:
+    """Checks the index root every `interval` seconds and hot-reloads the handle when it changed.
+
+    Runs on a daemon thread; a failed reload is logged and retried on the next check.
+    """
+
+    def __init__(self, handle: VectorStoreHandle, interval: float) -> None:
+        self._handle = handle
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self._handle.reload()
+            except Exception:
+                logger.exception("Index reload failed; still serving the previous version")
+
+    def close(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        self._thread.join(timeout)
+
+
+_shared_handle: VectorStoreHandle | None = None
+_shared_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStoreHandle:
+    """Return the process-wide handle, creating it on first use."""
+    global _shared_handle
+    if _shared_handle is None:
+        with _shared_lock:
+            if _shared_handle is None:
+                _shared_handle = VectorStoreHandle(
+                    embedding_function=build_query_embeddings(),
+                    embedding_spec=current_embedding_spec(),
+                )
+    return _shared_handle
+
+
+def close_vector_store() -> None:
+    global _shared_handle
+    with _shared_lock:
+        handle, _shared_handle = _shared_handle, None
+    if handle is not None:
+        handle.close()
+        if isinstance(handle.embedding_function, CachedEmbeddings):
+            handle.embedding_function.close()
+
+
+__all__ = [
+    "CURRENT_LINK",
+    "IndexGeneration",
+    "IndexMismatchError",
+    "IndexWatcher",
+    "MANIFEST_FILENAME",
+    "VERSIONS_DIRNAME",
+    "VectorStoreHandle",
+    "close_vector_store",
+    "get_vector_store",
+    "read_index_manifest",
+    "read_index_version",
+    "recorded_embedding",
+    "resolve_index_path",
+    "verify_index_embedding",
+    "write_index_version",
+]
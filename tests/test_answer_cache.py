@@ -0,0 +1,242 @@
+import datetime
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from lunbi.database import Base
+from lunbi.enums import PromptStatus
+from lunbi.models import AnswerCacheEntry
+from lunbi.services.answer_cache import AnswerCache, hash_query
+
+QUERY = "How do mice lose bone in space?"
+VECTOR = [1.0, 0.0, 0.0]
+NEAR = [0.99, 0.1, 0.0]  # cosine 0.995
+FAR = [0.8, 0.6, 0.0]  # cosine 0.8
+
+
+@pytest.fixture
+def sessions() -> sessionmaker:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[AnswerCacheEntry.__table__])
+    return sessionmaker(bind=engine, future=True)
+
+
+def session_factory(sessions: sessionmaker):
+    @contextmanager
+    def scope() -> Iterator[Session]:
+        with sessions() as session:
+            yield session
+            session.commit()
+
+    return scope
+
+
+def make_cache(sessions: sessionmaker | None = None, **options) -> AnswerCache:
+    options.setdefault("similarity_threshold", 0.95)
+    if sessions is None:
+        return AnswerCache(persistent=False, **options)
+    return AnswerCache(persistent=True, session_factory=session_factory(sessions), **options)
+
+
+def store(
+    cache: AnswerCache,
+    query: str = QUERY,
+    vector: list[float] = VECTOR,
+    version: str = "v1",
+    generation: int = 1,
+    language: str = "en",
+    answer: str = "Unloading.",
+    status: PromptStatus = PromptStatus.SUCCESS,
+) -> None:
+    cache.store(query, language, vector, version, answer, ["a.md"], status, generation)
+
+
+def lookup(
+    cache: AnswerCache,
+    query: str = QUERY,
+    vector: list[float] = VECTOR,
+    version: str = "v1",
+    generation: int = 1,
+    language: str = "en",
+):
+    return cache.lookup(query, language, vector, version, generation)
+
+
+def flush(cache: AnswerCache) -> None:
+    """Wait for the shared-tier writes queued so far; the writer runs them in order."""
+    cache._writer.submit(lambda: None).result()
+
+
+def rows(sessions: sessionmaker) -> list[tuple[str, str]]:
+    with sessions() as session:
+        entries = session.execute(select(AnswerCacheEntry)).scalars()
+        return sorted((entry.index_version, entry.query) for entry in entries)
+
+
+def test_similar_query_hits_memory() -> None:
+    cache = make_cache()
+    store(cache)
+
+    hit = lookup(cache, "how do MICE lose bone in space", NEAR)
+    assert hit is not None and hit.answer == "Unloading." and hit.sources == ("a.md",)
+    assert lookup(cache, "Why do plants bend?", FAR) is None
+    assert cache.stats() == {"entries": 1, "memory_hits": 1, "shared_hits": 0, "misses": 1}
+
+
+def test_languages_are_matched_separately() -> None:
+    cache = make_cache()
+    store(cache, language="en", answer="english")
+    assert lookup(cache, language="pl") is None
+
+    store(cache, language="pl", answer="polski")
+    assert lookup(cache, language="pl").answer == "polski"
+    assert lookup(cache, language="en").answer == "english"
+
+
+def test_only_answered_statuses_are_stored() -> None:
+    cache = make_cache()
+    store(cache, status=PromptStatus.FAILED)
+    store(cache, query="other", answer="")
+    assert cache.stats()["entries"] == 0
+
+    store(cache, status=PromptStatus.OUT_OF_CONTEXT, answer="Ask me about space biology.")
+    assert lookup(cache).status is PromptStatus.OUT_OF_CONTEXT
+
+
+def test_expired_entries_are_dropped() -> None:
+    cache = make_cache(ttl_seconds=0)
+    store(cache)
+    time.sleep(0.01)
+
+    assert lookup(cache) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache = make_cache(max_entries=2)
+    store(cache, query="a", vector=[1.0, 0.0, 0.0], answer="a")
+    store(cache, query="b", vector=[0.0, 1.0, 0.0], answer="b")
+    assert lookup(cache, "a", [1.0, 0.0, 0.0]).answer == "a"
+
+    store(cache, query="c", vector=[0.0, 0.0, 1.0], answer="c")
+
+    assert lookup(cache, "b", [0.0, 1.0, 0.0]) is None
+    assert lookup(cache, "a", [1.0, 0.0, 0.0]).answer == "a"
+    assert lookup(cache, "c", [0.0, 0.0, 1.0]).answer == "c"
+
+
+def test_storing_the_same_query_replaces_it() -> None:
+    cache = make_cache()
+    store(cache, answer="first")
+    store(cache, answer="second")
+    assert lookup(cache).answer == "second"
+    assert cache.stats()["entries"] == 1
+
+
+def test_newer_index_version_drops_memory() -> None:
+    cache = make_cache()
+    store(cache, version="v1", generation=1)
+
+    assert lookup(cache, version="v2", generation=2) is None
+    store(cache, version="v2", generation=2, answer="from v2")
+    assert lookup(cache, version="v2", generation=2).answer == "from v2"
+
+
+def test_older_generation_cannot_rewind_the_version() -> None:
+    cache = make_cache()
+    store(cache, version="v2", generation=2, answer="from v2")
+
+    assert lookup(cache, version="v1", generation=1) is None
+    store(cache, version="v1", generation=1, answer="from v1")
+    assert lookup(cache, version="v2", generation=2).answer == "from v2"
+
+
+def test_same_version_from_a_later_generation_keeps_entries() -> None:
+    # Reopening the version already cached (e.g. after a rollback) keeps its answers.
+    cache = make_cache()
+    store(cache, version="v1", generation=1)
+    assert lookup(cache, version="v1", generation=3) is not None
+    # The generation moved forward with it, so generation 2 is now the older one.
+    assert lookup(cache, version="v2", generation=2) is None
+
+
+def test_shared_tier_serves_another_replica(sessions: sessionmaker) -> None:
+    writer = make_cache(sessions)
+    store(writer)
+    flush(writer)
+    assert rows(sessions) == [("v1", QUERY)]
+
+    replica = make_cache(sessions)
+    # Matched by the normalised query text, not by similarity.
+    hit = lookup(replica, "  how do mice LOSE bone in space? ", FAR)
+    assert hit is not None and hit.answer == "Unloading." and hit.sources == ("a.md",)
+    assert replica.stats()["shared_hits"] == 1
+    # The shared hit is copied into memory, under the stored vector.
+    assert lookup(replica, "paraphrase", NEAR).answer == "Unloading."
+    assert replica.stats()["memory_hits"] == 1
+
+    assert lookup(make_cache(sessions), language="pl") is None
+    assert lookup(make_cache(sessions), version="v2") is None
+    writer.close()
+    replica.close()
+
+
+def test_shared_tier_honours_the_ttl(sessions: sessionmaker) -> None:
+    writer = make_cache(sessions)
+    store(writer)
+    flush(writer)
+    writer.close()
+
+    assert lookup(make_cache(sessions, ttl_seconds=0)) is None
+    assert lookup(make_cache(sessions, ttl_seconds=60)) is not None
+
+
+def test_switching_versions_prunes_only_stale_shared_entries(sessions: sessionmaker) -> None:
+    cache = make_cache(sessions, ttl_seconds=3600)
+    store(cache, query="retired", version="v1", generation=1)
+    flush(cache)
+    other = make_cache(sessions, ttl_seconds=3600)
+    # Versions other workers may still serve (or have moved to), one of them past the TTL.
+    store(other, query="fresh", version="v0", generation=1)
+    store(other, query="expired", version="v0", generation=1)
+    flush(other)
+    other.close()
+    with sessions() as session:
+        session.execute(
+            update(AnswerCacheEntry)
+            .where(AnswerCacheEntry.query_hash == hash_query("expired"))
+            .values(created_at=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=2))
+        )
+        session.commit()
+
+    store(cache, query="current", version="v2", generation=2)
+    flush(cache)
+
+    assert rows(sessions) == [("v0", "fresh"), ("v2", "current")]
+    cache.close()
+
+
+def test_shared_tier_failures_fall_back_to_memory() -> None:
+    @contextmanager
+    def broken() -> Iterator[Session]:
+        raise RuntimeError("database down")
+        yield
+
+    cache = AnswerCache(persistent=True, session_factory=broken, similarity_threshold=0.95)
+    store(cache)
+    flush(cache)
+    assert lookup(cache).answer == "Unloading."
+    assert lookup(cache, "unrelated", FAR) is None
+    cache.close()
+
+
+def test_vectors_are_compared_at_unit_length() -> None:
+    cache = make_cache()
+    store(cache, vector=list(np.asarray(VECTOR) * 10))
+    assert lookup(cache, vector=list(np.asarray(NEAR) * 0.1)) is not None
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from lunbi.enums import PromptStatus
+from lunbi.services.answer_cache import AnswerCache
+from lunbi.services.assistant_service import SCOPE_HINTS, AssistantService, wants_example_prompts
+
+
+class UnusedVectorStore:
+    """Fails the test if the service touches the index."""
+
+    def acquire(self):
+        raise AssertionError("the index was opened")
+
+    def lease(self):
+        raise AssertionError("the index was opened")
+
+
+@pytest.fixture
+def service() -> AssistantService:
+    return AssistantService(
+        vector_store=UnusedVectorStore(), answer_cache=AnswerCache(persistent=False), chat_model=object()
+    )
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "Show me some example prompts",
+        "Can you give me sample questions?",
+        "What topics can you help with?",
+        "what should I ask you",
+    ],
+)
+def test_example_prompt_requests(query: str) -> None:
+    assert wants_example_prompts(query)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "Give an example of bone loss in mice",
+        "What topics does OSD-48 cover?",
+        "How is a prompt response measured in plants?",
+    ],
+)
+def test_questions_mentioning_examples_are_searched(query: str) -> None:
+    assert not wants_example_prompts(query)
+
+
+def test_example_prompts_are_answered_before_retrieval(service: AssistantService) -> None:
+    [event] = list(service.stream_response("Show me some example prompts"))
+
+    assert event["type"] == "final"
+    assert event["status"] is PromptStatus.SUCCESS
+    assert event["sources"] == []
+    assert all(hint in event["answer"] for hint in SCOPE_HINTS)
+
+
+def test_async_example_prompts_are_answered_before_retrieval(service: AssistantService) -> None:
+    async def collect() -> list[dict]:
+        return [event async for event in service.astream_response("What topics can you help with?")]
+
+    [event] = asyncio.run(collect())
+    assert event["type"] == "final" and event["status"] is PromptStatus.SUCCESS
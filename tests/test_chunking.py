@@ -0,0 +1,170 @@
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+
+from lunbi.scripts import create_index_db
+from lunbi.scripts.chunking import ChunkingSettings, MarkdownChunker, split_sections
+from lunbi.scripts.create_index_db import (
+    assign_chunk_ids,
+    build_full,
+    build_incremental,
+    build_index_embeddings,
+    iter_stored_chunks,
+    open_chroma,
+    release_chroma,
+    with_dependents,
+)
+from lunbi.scripts.embedding_scheduler import EmbeddingScheduler
+from lunbi.services.embeddings import HASHING_SCHEME, EmbeddingSpec
+from lunbi.services.vector_store import read_index_manifest, resolve_index_path
+
+ARTICLE = (
+    "# Bone loss in space\n"
+    "Mice flew for 30 days.\n"
+    "## Methods\n"
+    "### Animals\n"
+    "Female C57BL/6 mice.\n"
+    "#### Housing\n"
+    "Rodent habitats.\n"
+    "## Results\n"
+    "Femur density dropped.\n"
+)
+DIGESTS = {"a.md": "a" * 64, "b.md": "b" * 64}
+
+
+def chunk(source: str, text: str) -> Document:
+    return Document(page_content=text, metadata={"source": f"/data/articles/{source}"})
+
+
+def test_split_sections_offsets_and_breadcrumbs() -> None:
+    sections = split_sections(ARTICLE, heading_levels=3)
+
+    assert [section.headings for section in sections] == [
+        ("Bone loss in space",),
+        ("Bone loss in space", "Methods", "Animals"),
+        ("Bone loss in space", "Results"),
+    ]
+    for section in sections:
+        assert ARTICLE[section.start : section.start + len(section.text)] == section.text
+    # "#### Housing" is below heading_levels, so it stays inside "Animals".
+    assert sections[1].text == "### Animals\nFemale C57BL/6 mice.\n#### Housing\nRodent habitats.\n"
+    assert sections[2].text.startswith("## Results\n")
+
+
+def test_split_sections_keeps_text_before_the_first_heading() -> None:
+    text = "Preprint notice.\n# Title\nBody.\n"
+    sections = split_sections(text, heading_levels=1)
+
+    assert [(section.start, section.headings) for section in sections] == [(0, ()), (17, ("Title",))]
+    assert sections[0].text == "Preprint notice.\n"
+
+
+def test_split_sections_drops_heading_only_sections() -> None:
+    sections = split_sections("# Title\n## Empty\n## Full\nText.\n", heading_levels=2)
+    assert [section.headings for section in sections] == [("Title", "Full")]
+
+
+def test_chunks_point_back_into_the_article() -> None:
+    body = " ".join(f"word{number}" for number in range(40))
+    text = f"# Title\nIntro.\n## Long\n{body}\n"
+    chunker = MarkdownChunker(ChunkingSettings(chunk_size=60, chunk_overlap=10, heading_levels=2))
+
+    chunks = chunker.split_document(Document(page_content=text, metadata={"source": "a.md"}))
+
+    assert len(chunks) > 2
+    for piece in chunks:
+        start = piece.metadata["start_index"]
+        assert text[start : start + len(piece.page_content)] == piece.page_content
+    assert chunks[0].metadata["headings"] == "Title"
+    assert chunks[1].page_content.startswith("## Long\n")
+    assert {piece.metadata["headings"] for piece in chunks[1:]} == {"Title > Long"}
+
+
+def test_duplicate_within_one_file_is_dropped_without_a_dependency() -> None:
+    chunks = [chunk("a.md", "Shared text."), chunk("a.md", "Other text."), chunk("a.md", "  Shared text.\n")]
+
+    kept, ids, files = assign_chunk_ids(chunks, DIGESTS)
+
+    assert [piece.page_content for piece in kept] == ["Shared text.", "Other text."]
+    assert ids == ["a.md:aaaaaaaaaaaaaaaa:0", "a.md:aaaaaaaaaaaaaaaa:1"]
+    assert files["a.md"] == {"sha256": DIGESTS["a.md"], "chunk_ids": ids}
+    assert files["b.md"] == {"sha256": DIGESTS["b.md"], "chunk_ids": []}
+
+
+def test_duplicate_across_files_records_the_kept_copy() -> None:
+    chunks = [chunk("a.md", "Shared text."), chunk("b.md", "Own text."), chunk("b.md", "Shared text.")]
+
+    kept, ids, files = assign_chunk_ids(chunks, DIGESTS)
+
+    assert ids == ["a.md:aaaaaaaaaaaaaaaa:0", "b.md:bbbbbbbbbbbbbbbb:0"]
+    assert files["b.md"]["chunk_ids"] == ["b.md:bbbbbbbbbbbbbbbb:0"]
+    assert files["b.md"]["duplicate_of"] == ["a.md:aaaaaaaaaaaaaaaa:0"]
+    assert "duplicate_of" not in files["a.md"]
+
+
+def test_duplicate_of_a_stored_chunk() -> None:
+    stored = {create_index_db.chunk_digest("Shared text."): "c.md:cccccccccccccccc:3"}
+
+    kept, ids, files = assign_chunk_ids([chunk("b.md", "Shared text.")], {"b.md": DIGESTS["b.md"]}, stored)
+
+    assert kept == [] and ids == []
+    assert files["b.md"] == {"sha256": DIGESTS["b.md"], "chunk_ids": [], "duplicate_of": ["c.md:cccccccccccccccc:3"]}
+
+
+def test_with_dependents_follows_duplicates_transitively() -> None:
+    previous = {
+        "a.md": {"chunk_ids": ["a.md:0"]},
+        "b.md": {"chunk_ids": ["b.md:0"], "duplicate_of": ["a.md:0"]},
+        "c.md": {"chunk_ids": [], "duplicate_of": ["b.md:0"]},
+        "d.md": {"chunk_ids": ["d.md:0"]},
+    }
+    digests = {name: "x" * 64 for name in previous}
+
+    assert with_dependents(previous, digests, {"a.md"}) == {"a.md", "b.md", "c.md"}
+    assert with_dependents(previous, digests, {"d.md"}) == {"d.md"}
+    # A dependent that is itself deleted is not re-chunked.
+    del digests["b.md"]
+    assert with_dependents(previous, digests, {"a.md"}) == {"a.md"}
+
+
+@pytest.fixture
+def index_paths(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> tuple[Path, Path]:
+    data, chroma = tmp_path / "articles", tmp_path / "chroma"
+    data.mkdir()
+    monkeypatch.setattr(create_index_db, "DATA_PATH", data)
+    monkeypatch.setattr(create_index_db, "CHROMA_PATH", chroma)
+    return data, chroma
+
+
+def stored_texts(chroma: Path, spec: EmbeddingSpec) -> dict[str, str]:
+    db = open_chroma(resolve_index_path(chroma), spec)
+    try:
+        return dict(iter_stored_chunks(db))
+    finally:
+        release_chroma(db)
+
+
+def test_deleting_the_kept_copy_rechunks_the_duplicate(index_paths: tuple[Path, Path]) -> None:
+    data, chroma = index_paths
+    spec = EmbeddingSpec("hashing", HASHING_SCHEME, 64)
+    scheduler = EmbeddingScheduler(build_index_embeddings(spec))
+    chunker = MarkdownChunker(ChunkingSettings(chunk_size=200, chunk_overlap=20, heading_levels=2))
+    shared = "## Shared\nFemur density dropped after 30 days."
+    (data / "a.md").write_text(f"# Study A\nHindlimb unloading.\n{shared}\n", encoding="utf-8")
+    (data / "b.md").write_text(f"# Study B\nSpaceflight.\n{shared}\n", encoding="utf-8")
+
+    build_full(spec, scheduler, chunker)
+    files = read_index_manifest(resolve_index_path(chroma))["files"]
+    assert [chunk_id.split(":")[0] for chunk_id in files["b.md"]["duplicate_of"]] == ["a.md"]
+    assert list(stored_texts(chroma, spec).values()).count(shared) == 1
+
+    (data / "a.md").unlink()
+    build_incremental(spec, scheduler, chunker)
+
+    texts = stored_texts(chroma, spec)
+    assert sorted(texts.values()) == sorted(["# Study B\nSpaceflight.", shared])
+    assert all(chunk_id.startswith("b.md:") for chunk_id in texts)
+    files = read_index_manifest(resolve_index_path(chroma))["files"]
+    assert sorted(files) == ["b.md"]
+    assert "duplicate_of" not in files["b.md"]
@@ -0,0 +1,153 @@
+import logging
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from lunbi.scripts import embedding_scheduler
+from lunbi.scripts.embedding_scheduler import EmbeddingCheckpoint, EmbeddingScheduler
+from lunbi.scripts.fake_embeddings_server import build_handler, fake_vector
+from lunbi.services.embeddings import EmbeddingSpec, build_embeddings
+
+DIMENSIONS = 8
+TEXTS = [f"chunk {number}" for number in range(10)]
+IDS = [f"a.md:{number}" for number in range(10)]
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ScriptedEmbeddings(Embeddings):
+    """Raises the scripted errors in turn, then embeds; records every batch it was sent."""
+
+    def __init__(self, *errors: Exception) -> None:
+        self.errors = list(errors)
+        self.batches: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.batches.append(list(texts))
+        if self.errors:
+            raise self.errors.pop(0)
+        return [fake_vector(text, DIMENSIONS) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class InterruptedEmbeddings(Embeddings):
+    """Passes batches through to `inner`, raising KeyboardInterrupt once `batches` of them went through."""
+
+    def __init__(self, inner: Embeddings, batches: int | None = None) -> None:
+        self.inner = inner
+        self.limit = batches
+        self.batches: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.limit is not None and len(self.batches) >= self.limit:
+            raise KeyboardInterrupt
+        vectors = self.inner.embed_documents(texts)
+        self.batches.append(list(texts))
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(embedding_scheduler, "BACKOFF_BASE_SECONDS", 0.001)
+
+
+@pytest.fixture
+def fake_server(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """fake_embeddings_server on a free port, answering every second request with 429 and Retry-After: 0.2."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), build_handler(DIMENSIONS, latency=0, rate_limit_every=2))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_BASE", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+def server_embeddings() -> Embeddings:
+    # As create_index_db builds them: the scheduler owns retries, raw text is sent.
+    spec = EmbeddingSpec("openai", "text-embedding-3-small")
+    return build_embeddings(spec, max_retries=0, check_embedding_ctx_length=False)
+
+
+def scheduler(embeddings: Embeddings, **options) -> EmbeddingScheduler:
+    options.setdefault("batch_size", 3)
+    options.setdefault("concurrency", 1)
+    return EmbeddingScheduler(embeddings, **options)
+
+
+def assert_embedded(vectors: list[list[float]], texts: list[str] = TEXTS) -> None:
+    assert len(vectors) == len(texts)
+    for vector, text in zip(vectors, texts):
+        assert vector == pytest.approx(fake_vector(text, DIMENSIONS), abs=1e-6)
+
+
+def test_rate_limited_batches_are_retried_after_retry_after(
+    fake_server: None, caplog: pytest.LogCaptureFixture
+) -> None:
+    with caplog.at_level(logging.WARNING, logger="lunbi.embedding_scheduler"):
+        vectors = scheduler(server_embeddings(), concurrency=2).embed(IDS, TEXTS)
+
+    assert_embedded(vectors)
+    retries = [record.getMessage() for record in caplog.records if "retrying" in record.getMessage()]
+    assert retries and all(message.endswith("retrying in 0.2s") for message in retries)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [StatusError(429), StatusError(503), ConnectionError("reset by peer"), TimeoutError("read timed out")],
+)
+def test_transient_errors_are_retried(error: Exception) -> None:
+    embeddings = ScriptedEmbeddings(error, error)
+    assert_embedded(scheduler(embeddings, batch_size=10).embed(IDS, TEXTS))
+    assert len(embeddings.batches) == 3
+
+
+@pytest.mark.parametrize(
+    "error",
+    [StatusError(400), StatusError(401), ValueError("bad vector"), KeyError("data")],
+)
+def test_other_errors_fail_at_once(error: Exception) -> None:
+    embeddings = ScriptedEmbeddings(error)
+    with pytest.raises(type(error)):
+        scheduler(embeddings, batch_size=10).embed(IDS, TEXTS)
+    assert len(embeddings.batches) == 1
+
+
+def test_gives_up_after_max_retries() -> None:
+    embeddings = ScriptedEmbeddings(*[StatusError(503)] * 5)
+    with pytest.raises(StatusError):
+        scheduler(embeddings, batch_size=10, max_retries=2).embed(IDS, TEXTS)
+    assert len(embeddings.batches) == 3
+
+
+def test_resumes_from_the_checkpoint(tmp_path: Path, fake_server: None) -> None:
+    checkpoint_path = tmp_path / "checkpoint.sqlite3"
+    # The first run is interrupted on its third batch, after two batches were checkpointed.
+    interrupted = InterruptedEmbeddings(server_embeddings(), batches=2)
+    with pytest.raises(KeyboardInterrupt):
+        scheduler(interrupted, checkpoint=EmbeddingCheckpoint(checkpoint_path, "fake")).embed(IDS, TEXTS)
+
+    resumed = InterruptedEmbeddings(server_embeddings())
+    run = scheduler(resumed, checkpoint=EmbeddingCheckpoint(checkpoint_path, "fake"))
+    vectors = run.embed(IDS, TEXTS)
+
+    assert_embedded(vectors)
+    assert {text for batch in resumed.batches for text in batch} == set(TEXTS[6:])
+    # Vectors of another model are not reused.
+    assert EmbeddingCheckpoint(checkpoint_path, "other").get(IDS[0]) is None
+    run.discard_checkpoint()
+    assert not checkpoint_path.exists()
@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from lunbi.services.embeddings import HASHING_SCHEME, EmbeddingSpec, HashingEmbeddings
+from lunbi.services.vector_store import MANIFEST_FILENAME, IndexMismatchError, verify_index_embedding
+
+SMALL = "text-embedding-3-small"
+
+
+def recorded(dimensions: int | None, model: str = SMALL) -> dict:
+    return {"provider": "openai", "model": model, "dimensions": dimensions}
+
+
+@pytest.mark.parametrize(
+    "spec, dimensions, expected",
+    [
+        # The model's native size, requested or not, matches an index built at that size.
+        (EmbeddingSpec("openai", SMALL), 1536, True),
+        (EmbeddingSpec("openai", SMALL, 1536), 1536, True),
+        # A shortened index cannot be queried at the native size, nor the other way round.
+        (EmbeddingSpec("openai", SMALL), 512, False),
+        (EmbeddingSpec("openai", SMALL, 512), 1536, False),
+        (EmbeddingSpec("openai", SMALL, 512), 512, True),
+        (EmbeddingSpec("openai", SMALL, 256), 512, False),
+    ],
+)
+def test_matches_compares_resolved_dimensions(spec: EmbeddingSpec, dimensions: int, expected: bool) -> None:
+    assert spec.matches(recorded(dimensions)) is expected
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        (EmbeddingSpec("openai", SMALL), True),
+        (EmbeddingSpec("openai", SMALL, 1536), True),
+        (EmbeddingSpec("openai", SMALL, 512), False),
+    ],
+)
+def test_legacy_manifest_without_dimensions_means_the_native_size(spec: EmbeddingSpec, expected: bool) -> None:
+    assert spec.matches(recorded(None)) is expected
+
+
+def test_unknown_model_only_matches_an_explicit_size_exactly() -> None:
+    assert EmbeddingSpec("openai", "custom").matches(recorded(None, "custom"))
+    assert EmbeddingSpec("openai", "custom", 256).matches(recorded(256, "custom"))
+    assert not EmbeddingSpec("openai", "custom", 256).matches(recorded(None, "custom"))
+    assert not EmbeddingSpec("openai", "custom", 256).matches(recorded(512, "custom"))
+
+
+def test_provider_and_model_must_match() -> None:
+    assert not EmbeddingSpec("openai", "text-embedding-3-large").matches(recorded(None))
+    assert not EmbeddingSpec("hashing", HASHING_SCHEME).matches({"provider": "hashing", "model": "hashing-v0"})
+
+
+def test_hashing_native_size_is_the_default_vector_length() -> None:
+    spec = EmbeddingSpec("hashing", HASHING_SCHEME)
+    assert spec.resolved_dimensions == len(HashingEmbeddings().embed_query("bone loss"))
+    assert spec.matches({"provider": "hashing", "model": HASHING_SCHEME, "dimensions": spec.resolved_dimensions})
+
+
+def test_verify_index_embedding_refuses_a_shortened_index(tmp_path: Path) -> None:
+    (tmp_path / MANIFEST_FILENAME).write_text(json.dumps({"embedding": recorded(512)}), encoding="utf-8")
+
+    with pytest.raises(IndexMismatchError, match="512"):
+        verify_index_embedding(tmp_path, EmbeddingSpec("openai", SMALL))
+    verify_index_embedding(tmp_path, EmbeddingSpec("openai", SMALL, 512))
@@ -0,0 +1,30 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from lunbi.scripts.check_import_time import BUDGETS, check
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+# Wall-clock budgets depend on the machine, so they are only checked on request (as check_import_time
+# does); LUNBI_IMPORT_TIME_SCALE stretches them like its --scale.
+TIMED = os.getenv("LUNBI_IMPORT_TIME_BUDGETS", "").strip().lower() in {"1", "true", "yes", "on"}
+SCALE = float(os.getenv("LUNBI_IMPORT_TIME_SCALE", "1"))
+
+
+@pytest.fixture(autouse=True)
+def project_on_path(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("PYTHONPATH", str(PROJECT_ROOT))
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS))
+def test_heavy_modules_stay_deferred(module: str) -> None:
+    result = check(module, runs=1)
+    assert not result.eager, f"{module} imports {', '.join(result.eager)} eagerly"
+
+
+@pytest.mark.skipif(not TIMED, reason="set LUNBI_IMPORT_TIME_BUDGETS=1 to check import times")
+@pytest.mark.parametrize("module", sorted(BUDGETS))
+def test_import_stays_within_budget(module: str) -> None:
+    result = check(module, runs=3, scale=SCALE)
+    assert result.within_budget, f"{module} imports in {result.milliseconds:.0f}ms (budget {result.limit:.0f}ms)"
@@ -0,0 +1,189 @@
+import io
+import json
+import os
+from pathlib import Path
+
+import pytest
+from botocore.exceptions import ClientError
+
+from lunbi.scripts import download_s3_file
+from lunbi.services.index_distribution import (
+    DISTRIBUTION_MANIFEST,
+    DistributionError,
+    activate,
+    current_version_dir,
+    download_version,
+    fetch_manifest,
+    installed_version,
+    prune_versions,
+    publish_index,
+)
+from lunbi.services.vector_store import (
+    CURRENT_LINK,
+    INDEX_FILENAME,
+    VERSIONS_DIRNAME,
+    resolve_index_path,
+    write_index_version,
+)
+
+BUCKET = "lunbi"
+PREFIX = "chroma"
+
+
+class FakeS3:
+    """In-memory stand-in for the boto3 S3 client calls index_distribution makes."""
+
+    def __init__(self) -> None:
+        self.objects: dict[str, bytes] = {}
+        self.downloads: list[str] = []
+
+    @staticmethod
+    def _missing(operation: str) -> ClientError:
+        return ClientError({"Error": {"Code": "NoSuchKey", "Message": "Not Found"}}, operation)
+
+    def upload_file(self, filename: str, bucket: str, key: str, Config=None) -> None:
+        self.objects[key] = Path(filename).read_bytes()
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs) -> None:
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        if Key not in self.objects:
+            raise self._missing("GetObject")
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def download_file(self, bucket: str, key: str, filename: str, Config=None) -> None:
+        if key not in self.objects:
+            raise self._missing("GetObject")
+        self.downloads.append(key)
+        Path(filename).write_bytes(self.objects[key])
+
+
+def build_index(path: Path, content: bytes) -> str:
+    """A stand-in index: the SQLite file, one segment file and the version marker."""
+    (path / "segment").mkdir(parents=True, exist_ok=True)
+    (path / INDEX_FILENAME).write_bytes(content)
+    (path / "segment" / "data_level0.bin").write_bytes(content[::-1])
+    return write_index_version(path)
+
+
+@pytest.fixture
+def s3() -> FakeS3:
+    return FakeS3()
+
+
+def test_publish_download_activate(tmp_path: Path, s3: FakeS3) -> None:
+    version = build_index(tmp_path / "build", b"vectors-v1")
+    manifest = publish_index(tmp_path / "build", s3, BUCKET, PREFIX)
+
+    assert manifest["version"] == version
+    assert f"{PREFIX}/{DISTRIBUTION_MANIFEST}" in s3.objects
+    assert fetch_manifest(s3, BUCKET, PREFIX) == manifest
+
+    root = tmp_path / "served"
+    target = download_version(manifest, root, s3, BUCKET, PREFIX)
+    activate(root, target)
+
+    assert target == root / VERSIONS_DIRNAME / version
+    assert os.readlink(root / CURRENT_LINK) == f"{VERSIONS_DIRNAME}/{version}"
+    assert resolve_index_path(root) == target.resolve()
+    assert (target / INDEX_FILENAME).read_bytes() == b"vectors-v1"
+    assert (target / "segment" / "data_level0.bin").read_bytes() == b"1v-srotcev"
+
+
+def test_fetch_manifest_when_nothing_was_published(s3: FakeS3) -> None:
+    assert fetch_manifest(s3, BUCKET, PREFIX) is None
+
+
+def test_sync_skips_the_current_version(tmp_path: Path, s3: FakeS3, monkeypatch: pytest.MonkeyPatch) -> None:
+    root = tmp_path / "served"
+    monkeypatch.setattr(download_s3_file, "CHROMA_PATH", root)
+    monkeypatch.setattr(download_s3_file, "s3_client", lambda: s3)
+    build_index(tmp_path / "build", b"vectors-v1")
+    publish_index(tmp_path / "build", s3, BUCKET, PREFIX)
+
+    assert "Downloaded" in download_s3_file.sync(force=False, keep=3)
+    downloads = len(s3.downloads)
+    assert "skipping download" in download_s3_file.sync(force=False, keep=3)
+    assert len(s3.downloads) == downloads
+
+    version = build_index(tmp_path / "build", b"vectors-v2")
+    publish_index(tmp_path / "build", s3, BUCKET, PREFIX)
+    assert "Downloaded" in download_s3_file.sync(force=False, keep=3)
+    assert current_version_dir(root).name == version
+
+
+def test_checksum_mismatch_keeps_the_current_version(tmp_path: Path, s3: FakeS3) -> None:
+    root = tmp_path / "served"
+    build_index(tmp_path / "build", b"vectors-v1")
+    first = publish_index(tmp_path / "build", s3, BUCKET, PREFIX)
+    activate(root, download_version(first, root, s3, BUCKET, PREFIX))
+
+    version = build_index(tmp_path / "build", b"vectors-v2")
+    second = publish_index(tmp_path / "build", s3, BUCKET, PREFIX)
+    s3.objects[f"{PREFIX}/{version}/{INDEX_FILENAME}"] = b"truncated"
+
+    with pytest.raises(DistributionError, match="checksum"):
+        download_version(second, root, s3, BUCKET, PREFIX)
+    assert sorted(path.name for path in (root / VERSIONS_DIRNAME).iterdir()) == [first["version"]]
+    assert current_version_dir(root).name == first["version"]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"{not json",
+        b"[]",
+        json.dumps({"format": 1, "version": "v1"}).encode(),
+        json.dumps({"format": 1, "version": "v1", "files": [{"size": 1, "sha256": "x"}]}).encode(),
+        json.dumps({"format": 1, "version": "v1", "files": [{"path": "../x", "size": 1, "sha256": "x"}]}).encode(),
+        json.dumps({"format": 1, "version": "../v1", "files": []}).encode(),
+    ],
+)
+def test_malformed_manifest_raises_distribution_error(s3: FakeS3, body: bytes) -> None:
+    s3.objects[f"{PREFIX}/{DISTRIBUTION_MANIFEST}"] = body
+    with pytest.raises(DistributionError):
+        fetch_manifest(s3, BUCKET, PREFIX)
+
+
+def test_prune_keeps_the_current_and_newest_versions(tmp_path: Path) -> None:
+    root = tmp_path / "served"
+    for age, name in enumerate(["v4", "v3", "v2", "v1"]):
+        path = root / VERSIONS_DIRNAME / name
+        path.mkdir(parents=True)
+        os.utime(path, (1_000_000 - age * 100, 1_000_000 - age * 100))
+    (root / VERSIONS_DIRNAME / ".v5.partial-1").mkdir()
+    activate(root, root / VERSIONS_DIRNAME / "v1")
+
+    removed = prune_versions(root, keep=2)
+
+    assert sorted(removed) == ["v2", "v3"]
+    assert sorted(path.name for path in (root / VERSIONS_DIRNAME).iterdir()) == [".v5.partial-1", "v1", "v4"]
+    assert current_version_dir(root).name == "v1"
+
+
+def test_forced_download_never_replaces_the_served_directory(
+    tmp_path: Path, s3: FakeS3, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    root = tmp_path / "served"
+    monkeypatch.setattr(download_s3_file, "CHROMA_PATH", root)
+    monkeypatch.setattr(download_s3_file, "s3_client", lambda: s3)
+    version = build_index(tmp_path / "build", b"vectors-v1")
+    publish_index(tmp_path / "build", s3, BUCKET, PREFIX)
+    download_s3_file.sync(force=False, keep=3)
+    served = current_version_dir(root)
+    (served / "opened-by-a-worker").touch()
+
+    download_s3_file.sync(force=True, keep=3)
+
+    reinstalled = current_version_dir(root)
+    assert reinstalled == (root / VERSIONS_DIRNAME / f"{version}+2").resolve()
+    assert resolve_index_path(root) != served
+    assert (served / "opened-by-a-worker").exists()
+    assert (reinstalled / INDEX_FILENAME).read_bytes() == b"vectors-v1"
+    assert installed_version(reinstalled) == version
+    assert "skipping download" in download_s3_file.sync(force=False, keep=3)
+
+    download_s3_file.sync(force=True, keep=2)
+    assert current_version_dir(root).name == f"{version}+3"
+    assert sorted(path.name for path in (root / VERSIONS_DIRNAME).iterdir()) == [f"{version}+2", f"{version}+3"]
@@ -0,0 +1,113 @@
+import math
+
+import pytest
+from langchain_core.documents import Document
+
+from lunbi.services.assistant_service import fuse_results
+from lunbi.services.lexical_index import BM25_B, BM25_K1, LexicalIndex, tokenize
+
+CHUNKS = [
+    ("osd", "OSD-48 measured bone loss in mice during spaceflight"),
+    ("bone", "Bone loss in mice was measured after spaceflight"),
+    ("plants", "Plants grown on the station showed root changes"),
+    ("muscle", "Mice on the station lost muscle mass"),
+]
+
+
+@pytest.fixture
+def index() -> LexicalIndex:
+    return LexicalIndex.build(CHUNKS)
+
+
+@pytest.mark.parametrize(
+    "text, tokens",
+    [
+        ("OSD-48", ["osd-48", "osd", "48"]),
+        ("GLDS-12.v2", ["glds-12.v2", "glds", "12", "v2"]),
+        ("Rodent Research (RR-1)", ["rodent", "research", "rr-1", "rr", "1"]),
+        ("ＯＳＤ＿48 mice", ["osd", "48", "mice"]),
+    ],
+)
+def test_tokenize_keeps_joined_ids_and_their_parts(text: str, tokens: list[str]) -> None:
+    assert tokenize(text) == tokens
+
+
+def test_accession_id_matches_as_a_unit(index: LexicalIndex) -> None:
+    assert [hit.chunk_id for hit in index.search("osd-48", k=4)] == ["osd"]
+    assert index.search("glds-7", k=4) == []
+
+
+def test_bm25_score_matches_the_formula() -> None:
+    index = LexicalIndex.build([("a", "bone bone loss"), ("b", "muscle loss"), ("c", "root growth")])
+    [hit] = index.search("bone", k=3)
+
+    idf = math.log1p((3 - 1 + 0.5) / (1 + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * 3 / (7 / 3))
+    assert hit.chunk_id == "a"
+    assert hit.score == pytest.approx(idf * 2 * (BM25_K1 + 1) / (2 + norm))
+    assert hit.coverage == pytest.approx(1.0)
+
+
+def test_bm25_ranks_by_frequency_then_length() -> None:
+    index = LexicalIndex.build(
+        [
+            ("once-long", "bone loss was measured in the hind limbs of mice"),
+            ("twice", "bone density and bone loss in mice"),
+            ("once-short", "bone loss in mice"),
+            ("other", "plants grown on the station"),
+        ]
+    )
+    assert [hit.chunk_id for hit in index.search("bone", k=4)] == ["twice", "once-short", "once-long"]
+
+
+def test_coverage_is_the_share_of_query_idf(index: LexicalIndex) -> None:
+    hits = {hit.chunk_id: hit for hit in index.search("OSD-48 plants", k=4)}
+    assert hits["osd"].coverage + hits["plants"].coverage == pytest.approx(1.0)
+    assert 0 < hits["plants"].coverage < hits["osd"].coverage
+
+
+def test_confident_search_answers_a_clear_keyword_match(index: LexicalIndex) -> None:
+    hits = index.confident_search("OSD-48 bone loss", k=4, min_coverage=0.8, margin=1.5)
+    assert hits is not None
+    assert hits[0].chunk_id == "osd"
+
+
+def test_confident_search_needs_a_keyword(index: LexicalIndex) -> None:
+    assert index.search("mice spaceflight", k=4)
+    assert index.confident_search("mice spaceflight", k=4, min_coverage=0.0, margin=1.0) is None
+
+
+def test_confident_search_needs_coverage(index: LexicalIndex) -> None:
+    assert index.confident_search("OSD-48 plants", k=4, min_coverage=0.0, margin=1.0) is not None
+    assert index.confident_search("OSD-48 plants", k=4, min_coverage=0.8, margin=1.0) is None
+
+
+def test_confident_search_needs_a_margin_over_the_runner_up(index: LexicalIndex) -> None:
+    hits = index.search("OSD-48 bone loss", k=4)
+    ratio = hits[0].score / hits[1].score
+    assert index.confident_search("OSD-48 bone loss", k=4, min_coverage=0.0, margin=ratio * 0.99) is not None
+    assert index.confident_search("OSD-48 bone loss", k=4, min_coverage=0.0, margin=ratio * 1.01) is None
+
+
+def test_search_on_an_empty_index() -> None:
+    index = LexicalIndex.build([])
+    assert index.search("OSD-48", k=4) == []
+    assert index.confident_search("OSD-48", k=4, min_coverage=0.0, margin=1.0) is None
+
+
+def chunk(chunk_id: str) -> Document:
+    return Document(page_content=chunk_id, id=chunk_id)
+
+
+def test_fuse_results_orders_by_reciprocal_rank() -> None:
+    dense = [(chunk("x"), 0.9), (chunk("y"), 0.8), (chunk("w"), 0.7)]
+    lexical = [(chunk("y"), 0.5), (chunk("z"), 0.6)]
+
+    fused = fuse_results(dense, lexical, k=10)
+
+    assert [(doc.id, score) for doc, score in fused] == [("y", 0.8), ("x", 0.9), ("z", 0.6), ("w", 0.7)]
+
+
+def test_fuse_results_keeps_the_best_score_and_truncates() -> None:
+    fused = fuse_results([(chunk("a"), 0.2), (chunk("b"), 0.3)], [(chunk("a"), 0.7)], k=1)
+    assert [(doc.id, score) for doc, score in fused] == [("a", 0.7)]
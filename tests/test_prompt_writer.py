@@ -0,0 +1,157 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from lunbi.database import Base
+from lunbi.models import Prompt, PromptStatus
+from lunbi.repositories.prompt_repository import PromptRepository
+from lunbi.services.prompt_writer import PendingPrompt, PromptWriter
+
+
+@pytest.fixture
+def sessions() -> sessionmaker:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, future=True)
+
+
+def session_factory(sessions: sessionmaker, before: Callable[[], None] = lambda: None):
+    @contextmanager
+    def scope() -> Iterator[Session]:
+        before()
+        with sessions() as session:
+            yield session
+            session.commit()
+
+    return scope
+
+
+def record(query: str, **fields) -> PendingPrompt:
+    return PendingPrompt(query=query, answer=f"answer to {query}", status=PromptStatus.SUCCESS, **fields)
+
+
+def stored(sessions: sessionmaker) -> list[tuple[int, str]]:
+    with sessions() as session:
+        return [tuple(row) for row in session.execute(select(Prompt.id, Prompt.query).order_by(Prompt.id))]
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_full_batch_is_written_without_waiting_for_the_deadline(sessions: sessionmaker) -> None:
+    writer = PromptWriter(batch_size=3, flush_seconds=60, id_prefetch=0, session_factory=session_factory(sessions))
+    for query in ("a", "b", "c"):
+        writer.submit(record(query))
+
+    assert wait_for(lambda: writer.stats()["written"] == 3)
+    assert writer.stats()["batches"] == 1
+    assert [query for _, query in stored(sessions)] == ["a", "b", "c"]
+    writer.close()
+
+
+def test_partial_batch_is_written_after_flush_seconds(sessions: sessionmaker) -> None:
+    writer = PromptWriter(batch_size=100, flush_seconds=0.05, id_prefetch=0, session_factory=session_factory(sessions))
+    writer.submit(record("a"))
+
+    assert wait_for(lambda: writer.stats()["written"] == 1)
+    assert stored(sessions) == [(1, "a")]
+    writer.close()
+
+
+def test_close_drains_the_queue(sessions: sessionmaker) -> None:
+    writer = PromptWriter(batch_size=2, flush_seconds=60, id_prefetch=0, session_factory=session_factory(sessions))
+    for query in ("a", "b", "c", "d", "e"):
+        writer.submit(record(query))
+
+    writer.close(timeout=5)
+
+    assert [query for _, query in stored(sessions)] == ["a", "b", "c", "d", "e"]
+    assert writer.stats()["written"] == 5 and writer.stats()["queue_depth"] == 0
+
+
+def test_submit_after_close_writes_inline(sessions: sessionmaker) -> None:
+    writer = PromptWriter(id_prefetch=0, session_factory=session_factory(sessions))
+    writer.close()
+
+    writer.submit(record("late"))
+
+    assert stored(sessions) == [(1, "late")]
+    assert writer.stats()["inline_writes"] == 1
+
+
+def test_full_queue_writes_inline(sessions: sessionmaker) -> None:
+    release = threading.Event()
+
+    def hold_the_writer_thread() -> None:
+        if threading.current_thread().name == "prompt-writer":
+            release.wait(5)
+
+    writer = PromptWriter(
+        batch_size=1,
+        flush_seconds=0,
+        max_queue=1,
+        id_prefetch=0,
+        session_factory=session_factory(sessions, hold_the_writer_thread),
+    )
+    writer.submit(record("taken by the writer"))
+    assert wait_for(lambda: writer.stats()["queue_depth"] == 0)
+    writer.submit(record("queued"))
+    writer.submit(record("inline"))
+
+    assert [query for _, query in stored(sessions)] == ["inline"]
+    release.set()
+    writer.close(timeout=5)
+    assert sorted(query for _, query in stored(sessions)) == ["inline", "queued", "taken by the writer"]
+    assert writer.stats()["inline_writes"] == 1
+
+
+def test_failed_batch_is_retried_row_by_row(sessions: sessionmaker) -> None:
+    writer = PromptWriter(batch_size=3, flush_seconds=60, id_prefetch=0, session_factory=session_factory(sessions))
+    writer.submit(record("a"))
+    writer.submit(PendingPrompt(query=None, answer=None, status=PromptStatus.FAILED))  # violates NOT NULL
+    writer.submit(record("c"))
+    writer.close(timeout=5)
+
+    assert [query for _, query in stored(sessions)] == ["a", "c"]
+    assert writer.stats()["written"] == 2 and writer.stats()["failed"] == 1
+
+
+def test_id_reservation_needs_postgres(sessions: sessionmaker) -> None:
+    writer = PromptWriter(id_prefetch=5, session_factory=session_factory(sessions))
+    assert writer.reserve_id() is None
+    # The check is not repeated for every request.
+    assert writer._id_prefetch == 0
+    writer.close()
+
+
+def test_reserved_ids_are_handed_out_in_order_and_kept_on_write(
+    sessions: sessionmaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # SQLite has no sequences; stand in for the prompts sequence with a counter.
+    sequence = iter(range(100, 1000))
+    monkeypatch.setattr(PromptRepository, "supports_id_reservation", lambda repository: True)
+    monkeypatch.setattr(
+        PromptRepository, "reserve_ids", lambda repository, count: [next(sequence) for _ in range(count)]
+    )
+    writer = PromptWriter(batch_size=10, flush_seconds=60, id_prefetch=2, session_factory=session_factory(sessions))
+
+    ids = [writer.reserve_id() for _ in range(5)]
+    assert ids == [100, 101, 102, 103, 104]
+    # Records may be written in another order than their ids were reserved.
+    for prompt_id in reversed(ids):
+        writer.submit(record(f"q{prompt_id}", id=prompt_id))
+    writer.close(timeout=5)
+
+    assert stored(sessions) == [(prompt_id, f"q{prompt_id}") for prompt_id in ids]
@@ -0,0 +1,180 @@
+import os
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from lunbi.database import Base
+from lunbi.models import Source
+from lunbi.repositories.source_repository import SourceRepository, SourceRow
+from lunbi.services import article_metadata_service
+from lunbi.services.article_metadata_service import (
+    ArticleMetadataService,
+    SourceIndex,
+    SourceRef,
+    bump_source_index_version,
+)
+
+BONE = SourceRef(1, "Bone loss in mice", "https://example.org/bone")
+ROOTS = SourceRef(2, "Roots in microgravity", "https://example.org/roots")
+
+
+class Loader:
+    def __init__(self, *maps: dict[str, SourceRef]) -> None:
+        self.maps = list(maps)
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self) -> dict[str, SourceRef]:
+        if self.fail:
+            raise RuntimeError("database down")
+        self.calls += 1
+        return self.maps[min(self.calls, len(self.maps)) - 1]
+
+
+@pytest.fixture(autouse=True)
+def check_version_every_lookup(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(article_metadata_service, "VERSION_CHECK_SECONDS", 0.0)
+
+
+@pytest.fixture
+def version_path(tmp_path: Path) -> Path:
+    return tmp_path / "cache" / "source_index_version"
+
+
+def test_loads_once_and_serves_from_memory(version_path: Path) -> None:
+    loader = Loader({"bone.md": BONE})
+    index = SourceIndex(loader, ttl_seconds=300, version_path=version_path)
+
+    assert index.get("bone.md") == BONE
+    assert index.get("missing.md") is None
+    assert dict(index.items()) == {"bone.md": BONE}
+    assert loader.calls == 1 and index.version == 0
+
+
+def test_version_bump_reloads(version_path: Path) -> None:
+    loader = Loader({"bone.md": BONE}, {"bone.md": BONE, "roots.md": ROOTS})
+    index = SourceIndex(loader, ttl_seconds=300, version_path=version_path)
+    assert index.get("roots.md") is None
+
+    assert bump_source_index_version(version_path) == 1
+    assert index.get("roots.md") == ROOTS
+    assert loader.calls == 2 and index.version == 1
+    assert bump_source_index_version(version_path) == 2
+
+
+def test_expired_map_reloads(version_path: Path) -> None:
+    loader = Loader({"bone.md": BONE})
+    index = SourceIndex(loader, ttl_seconds=0, version_path=version_path)
+    index.get("bone.md")
+    index.get("bone.md")
+    assert loader.calls == 2
+
+
+def test_invalidate_reloads(version_path: Path) -> None:
+    loader = Loader({"bone.md": BONE})
+    index = SourceIndex(loader, ttl_seconds=300, version_path=version_path)
+    index.get("bone.md")
+    index.invalidate()
+    index.get("bone.md")
+    assert loader.calls == 2
+
+
+def test_failed_reload_keeps_the_previous_map_and_backs_off(
+    version_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    loader = Loader({"bone.md": BONE})
+    index = SourceIndex(loader, ttl_seconds=300, version_path=version_path)
+    index.get("bone.md")
+    monkeypatch.setattr(article_metadata_service, "VERSION_CHECK_SECONDS", 60.0)
+    loader.fail = True
+    index.invalidate()
+
+    assert index.get("bone.md") == BONE
+    loader.fail = False
+    # Within the back-off window the database is not queried again.
+    assert index.get("bone.md") == BONE
+    assert loader.calls == 1
+
+
+def test_unreadable_version_file_counts_as_zero(version_path: Path) -> None:
+    version_path.parent.mkdir(parents=True)
+    version_path.write_text("garbage", encoding="utf-8")
+    assert bump_source_index_version(version_path) == 1
+    assert not [name for name in os.listdir(version_path.parent) if name.endswith(".tmp")]
+
+
+def test_metadata_service_resolves_the_first_known_path(version_path: Path) -> None:
+    service = ArticleMetadataService(SourceIndex(Loader({"roots.md": ROOTS}), version_path=version_path))
+
+    metadata = service.resolve(["data/articles/missing.md", "data/articles/roots.md"])
+
+    assert metadata is not None
+    assert (metadata.title, metadata.url, metadata.source_id, metadata.path) == (
+        ROOTS.title,
+        ROOTS.url,
+        ROOTS.id,
+        Path("roots.md"),
+    )
+    assert service.resolve(["missing.md"]) is None
+
+
+@pytest.fixture
+def sqlite_session() -> Iterator[Session]:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[Source.__table__])
+    with sessionmaker(bind=engine, future=True)() as session:
+        yield session
+
+
+def test_index_rows_and_row_by_row_upsert_on_sqlite(sqlite_session: Session) -> None:
+    repository = SourceRepository(sqlite_session)
+    assert not repository.supports_bulk_upsert()
+
+    first = repository.upsert("Bone loss", "https://example.org/bone", "bone.md")
+    # Same file, new title and URL: updated in place.
+    assert repository.upsert("Bone loss in mice", "https://example.org/bone-2", "bone.md").id == first.id
+    # Same URL under a new file name: renamed.
+    assert repository.upsert("Bone loss in mice", "https://example.org/bone-2", "bone-v2.md").id == first.id
+
+    assert repository.list_index_rows() == [("bone-v2.md", first.id, "Bone loss in mice", "https://example.org/bone-2")]
+
+
+# The created/updated counts come from PostgreSQL's `xmax = 0` and ON CONFLICT, which SQLite lacks.
+POSTGRES_URL = os.getenv("LUNBI_TEST_POSTGRES_URL")
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="set LUNBI_TEST_POSTGRES_URL to a scratch PostgreSQL database")
+def test_bulk_upsert_counts_on_postgres() -> None:
+    engine = create_engine(POSTGRES_URL, future=True)
+    Base.metadata.create_all(engine, tables=[Source.__table__])
+    with sessionmaker(bind=engine, future=True)() as session:
+        session.execute(delete(Source))
+        repository = SourceRepository(session)
+        assert repository.supports_bulk_upsert()
+
+        result = repository.bulk_upsert(
+            [
+                SourceRow("Bone", "https://example.org/bone", "bone.md"),
+                SourceRow("Roots", "https://example.org/roots", "roots.md"),
+            ]
+        )
+        assert (result.created, result.updated, result.unchanged) == (2, 0, 0)
+
+        result = repository.bulk_upsert(
+            [
+                SourceRow("Bone loss", "https://example.org/bone", "bone.md"),  # new title
+                SourceRow("Roots", "https://example.org/roots", "roots.md"),  # unchanged
+                SourceRow("Muscle", "https://example.org/muscle", "muscle.md"),  # new
+            ]
+        )
+        assert (result.created, result.updated, result.unchanged) == (1, 1, 1)
+
+        # The URL moved to a new file: renamed through upsert().
+        result = repository.bulk_upsert([SourceRow("Roots", "https://example.org/roots", "roots-v2.md")])
+        assert (result.created, result.updated, result.unchanged) == (0, 1, 0)
+        assert sorted(row[0] for row in repository.list_index_rows()) == ["bone.md", "muscle.md", "roots-v2.md"]
+        session.rollback()
@@ -0,0 +1,180 @@
+import logging
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pytest
+from langchain_chroma import Chroma
+
+from lunbi.enums import PromptStatus
+from lunbi.services.answer_cache import AnswerCache
+from lunbi.services.embeddings import HashingEmbeddings
+from lunbi.services.index_distribution import activate
+from lunbi.services.vector_store import (
+    INDEX_VERSION_FILENAME,
+    VERSIONS_DIRNAME,
+    IndexGeneration,
+    IndexWatcher,
+    VectorStoreHandle,
+    write_index_version,
+)
+
+EMBEDDINGS = HashingEmbeddings(dimensions=64)
+QUERY = "How do mice lose bone?"
+
+
+def build_version(root: Path, name: str, texts: list[str]) -> Path:
+    path = root / VERSIONS_DIRNAME / name
+    db = Chroma(persist_directory=str(path), embedding_function=EMBEDDINGS)
+    db.add_texts(texts)
+    db._client.clear_system_cache()
+    (path / INDEX_VERSION_FILENAME).write_text(name, encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def closed(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """Versions of the generations closed during the test, in order."""
+    versions: list[str] = []
+    close = IndexGeneration.close
+
+    def record(generation: IndexGeneration) -> None:
+        versions.append(generation.version)
+        close(generation)
+
+    monkeypatch.setattr(IndexGeneration, "close", record)
+    return versions
+
+
+@pytest.fixture
+def root(tmp_path: Path) -> Path:
+    root = tmp_path / "chroma"
+    activate(root, build_version(root, "v1", ["bone loss in mice"]))
+    return root
+
+
+@pytest.fixture
+def handle(root: Path) -> Iterator[VectorStoreHandle]:
+    handle = VectorStoreHandle(root, embedding_function=EMBEDDINGS)
+    yield handle
+    handle.close()
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_reload_without_a_new_version_keeps_the_generation(handle: VectorStoreHandle) -> None:
+    assert handle.reload() is False  # nothing opened yet
+    generation = handle.acquire()
+    handle.release(generation)
+
+    assert handle.reload() is False
+    assert handle.acquire() is generation
+
+
+def test_leased_generation_survives_reload_until_released(
+    root: Path, handle: VectorStoreHandle, closed: list[str]
+) -> None:
+    old = handle.acquire()
+    also_old = handle.acquire()
+    activate(root, build_version(root, "v2", ["plants on the station"]))
+
+    assert handle.reload() is True
+
+    assert handle.version == "v2"
+    assert old.retired and closed == []
+    assert old.store.similarity_search("bone", k=1)[0].page_content == "bone loss in mice"
+    with handle.lease() as new:
+        assert new.version == "v2" and new.generation > old.generation
+    handle.release(old)
+    assert closed == []
+    handle.release(also_old)
+    assert closed == ["v1"]
+    assert old.leases == 0
+
+
+def test_unleased_generation_closes_on_reload(root: Path, handle: VectorStoreHandle, closed: list[str]) -> None:
+    with handle.lease():
+        pass
+    activate(root, build_version(root, "v2", ["plants on the station"]))
+
+    assert handle.reload() is True
+    assert closed == ["v1"]
+
+
+def test_failed_reload_keeps_serving(root: Path, handle: VectorStoreHandle, monkeypatch: pytest.MonkeyPatch) -> None:
+    serving = handle.acquire()
+    handle.release(serving)
+    activate(root, build_version(root, "v2", ["plants on the station"]))
+    monkeypatch.setattr(IndexGeneration, "warm", lambda generation: 1 / 0)
+
+    with pytest.raises(ZeroDivisionError):
+        handle.reload()
+    assert handle.acquire() is serving and not serving.retired
+    handle.release(serving)
+
+
+def test_watcher_follows_the_current_link(root: Path, handle: VectorStoreHandle) -> None:
+    assert handle.version == "v1"
+    watcher = IndexWatcher(handle, interval=0.02)
+    try:
+        activate(root, build_version(root, "v2", ["plants on the station"]))
+        assert wait_for(lambda: handle.version == "v2")
+    finally:
+        watcher.close()
+
+
+def test_watcher_reports_an_index_changed_in_place(
+    tmp_path: Path, closed: list[str], caplog: pytest.LogCaptureFixture
+) -> None:
+    # A flat index from before versioned layouts: a new version file, but the same directory.
+    flat = build_version(tmp_path, "v1", ["bone loss in mice"])
+    handle = VectorStoreHandle(flat, embedding_function=EMBEDDINGS)
+    assert handle.version == "v1"
+    watcher = IndexWatcher(handle, interval=0.02)
+    try:
+        with caplog.at_level(logging.WARNING, logger="lunbi.vector_store"):
+            write_index_version(flat)
+            assert wait_for(lambda: "changed in place" in caplog.text)
+            time.sleep(0.1)
+    finally:
+        watcher.close()
+    assert caplog.text.count("changed in place") == 1
+    assert handle.version == "v1" and closed == []
+    handle.close()
+
+
+def test_draining_request_cannot_rewind_the_answer_cache(root: Path, handle: VectorStoreHandle) -> None:
+    cache = AnswerCache(persistent=False)
+    vector = EMBEDDINGS.embed_query(QUERY)
+
+    def store(generation: IndexGeneration, answer: str) -> None:
+        cache.store(
+            QUERY, "en", vector, generation.version, answer, ["a.md"], PromptStatus.SUCCESS, generation.generation
+        )
+
+    def lookup(generation: IndexGeneration):
+        return cache.lookup(QUERY, "en", vector, generation.version, generation.generation)
+
+    draining = handle.acquire()
+    store(draining, "from v1")
+    activate(root, build_version(root, "v2", ["plants on the station"]))
+    handle.reload()
+
+    with handle.lease() as current:
+        assert lookup(current) is None
+        store(current, "from v2")
+    # The request that started on v1 finishes after the switch.
+    store(draining, "late v1 answer")
+    assert lookup(draining) is None
+    handle.release(draining)
+
+    with handle.lease() as current:
+        assert lookup(current).answer == "from v2"
+    assert cache.stats()["entries"] == 1